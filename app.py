@@ -1,9 +1,25 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, make_response, g
+from flask import Flask, render_template, stream_template, request, redirect, url_for, flash, jsonify, session, make_response, g
 import sqlite3
 from datetime import datetime, timedelta
 from functools import wraps
 import os
-from contextlib import contextmanager
+from app.database import get_db_connection, close_db, init_db as init_core_db
+from app.models.budget import Budget
+from app.models.timeseries import ExpenseTimeSeries, MAX_CHART_POINTS, TIME_BUCKETS
+from app.models.report import ExpenseReport, REPORT_DIMENSIONS, REPORT_LABELS
+from app.models.rollup import ExpenseRollup
+from app.models.forecast import ExpenseForecast
+from app.models.dashboard import DashboardStats
+from app.models.expense import Expense, ExpenseStream
+from app.config import EXPENSES_PAGE_SIZE, DEBUG, DEFAULT_CURRENCY
+from app.exporters import export_response
+from app.importers import PARSERS, ImportFileError, detect_format, open_upload, import_expenses
+from app.cache import cached, get_cache_stats
+from app.conditional import conditional_get
+from app.profiling import init_profiling
+from app.metrics import init_metrics
+from app.money import Money, init_money, with_row_currency
+from app.fx import get_fx_rates, init_fx
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev_key_for_testing')
@@ -39,46 +55,19 @@ def before_request():
     g.currency_code = session.get('currency')
     g.currency = CURRENCIES[g.currency_code]
 
-# Database setup with context manager
-@contextmanager
-def get_db_connection():
-    conn = sqlite3.connect('expenses.db')
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
-        conn.close()
+# Database connections come from the shared per-request pool
+app.teardown_appcontext(close_db)
+init_profiling(app)
+init_metrics(app)
+init_money(app)
+init_fx(app)
 
 def init_db():
     """Initialize the database with tables if they don't exist."""
+    # Expenses, budgets, tags and their indexes/rollups are owned by the app package
+    init_core_db()
+    
     with get_db_connection() as conn:
-        # Create expenses table
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS expenses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                description TEXT NOT NULL,
-                amount REAL NOT NULL,
-                category TEXT,
-                date TEXT NOT NULL,
-                tags TEXT,
-                recurring INTEGER DEFAULT 0,
-                recurring_interval TEXT
-            )
-        ''')
-        
-        # Create budgets table
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS budgets (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                category TEXT NOT NULL,
-                amount REAL NOT NULL,
-                period TEXT NOT NULL,
-                start_date TEXT NOT NULL,
-                end_date TEXT,
-                notification_threshold REAL
-            )
-        ''')
-        
         # Create settings table if it doesn't exist
         conn.execute('''
             CREATE TABLE IF NOT EXISTS settings (
@@ -127,11 +116,12 @@ def init_db():
         ''')
         
         # Create income_entries table
-        conn.execute('''
+        conn.execute(f'''
             CREATE TABLE IF NOT EXISTS income_entries (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 source TEXT NOT NULL,
-                amount REAL NOT NULL,
+                amount MONEY NOT NULL,
+                currency TEXT NOT NULL DEFAULT '{DEFAULT_CURRENCY}',
                 date TEXT NOT NULL,
                 description TEXT,
                 recurring INTEGER DEFAULT 0,
@@ -151,20 +141,25 @@ def init_db():
         conn.commit()
 
 # Validation
-def validate_expense(form_data):
+def validate_expense(form_data, currency):
     errors = []
     
     # Description validation
     if not form_data.get('description') or len(form_data.get('description', '').strip()) < 2:
         errors.append('Description must be at least 2 characters long')
     
-    # Amount validation
-    try:
-        amount = float(form_data.get('amount', 0))
-        if amount <= 0:
-            errors.append('Amount must be greater than zero')
-    except ValueError:
-        errors.append('Amount must be a valid number')
+    # Currency validation, before the amount is parsed in it
+    currency = form_data.get('currency') or currency
+    if currency not in CURRENCIES:
+        errors.append('Unknown currency')
+    else:
+        # Amount validation, rounded to the minor units it will be stored in
+        try:
+            amount = Money.parse(form_data.get('amount', 0), currency)
+            if amount <= 0:
+                errors.append('Amount must be greater than zero')
+        except ValueError:
+            errors.append('Amount must be a valid number')
     
     # Category validation
     if not form_data.get('category'):
@@ -184,6 +179,7 @@ def validate_expense(form_data):
 
 # Home page
 @app.route('/')
+@conditional_get()
 def index():
     search_query = request.args.get('search', '')
     category_filter = request.args.get('category', '')
@@ -191,49 +187,35 @@ def index():
     from_date = request.args.get('from_date', '')
     to_date = request.args.get('to_date', '')
     
-    # Construct base query
-    if tag_filter:
-        # If tag filter is active, we need to join with tags
-        query = '''
-            SELECT e.* FROM expenses e
-            JOIN expense_tags et ON e.id = et.expense_id
-            JOIN tags t ON et.tag_id = t.id
-            WHERE t.name = ?
-        '''
-        params = [tag_filter]
-    else:
-        query = 'SELECT * FROM expenses WHERE 1=1'
-        params = []
+    filters = {
+        'search': search_query,
+        'category': category_filter,
+        'from_date': from_date,
+        'to_date': to_date
+    }
     
-    # Add search filter
-    if search_query:
-        query += ' AND description LIKE ?'
-        params.append(f'%{search_query}%')
+    cursor = request.args.get('cursor', '')
+    show_all = request.args.get('all') == '1'
     
-    # Add category filter
-    if category_filter:
-        query += ' AND category = ?'
-        params.append(category_filter)
+    # Page through expenses by keyset, or stream the whole history on request
+    if show_all:
+        expenses = ExpenseStream(filters, tag_filter)
+        next_cursor = None
+    else:
+        page = Expense.paginate(filters, tag_filter, cursor, EXPENSES_PAGE_SIZE)
+        expenses = page['expenses']
+        next_cursor = page['next_cursor']
     
-    # Add date range filters
-    if from_date:
-        query += ' AND date >= ?'
-        params.append(from_date)
+    query_args = request.args.to_dict()
+    query_args.pop('cursor', None)
+    next_url = url_for('index', **dict(query_args, cursor=next_cursor)) if next_cursor else None
+    full_history_url = None if show_all else url_for('index', **dict(query_args, all='1'))
     
-    if to_date:
-        query += ' AND date <= ?'
-        params.append(to_date)
+    # Get total expenses, converted into the display currency
+    total_expenses = Expense.get_total(g.currency_code)
     
-    query += ' ORDER BY date DESC'
-    
-    with get_db_connection() as conn:
-        expenses = conn.execute(query, params).fetchall()
-        # Get total expenses
-        total_expenses = conn.execute('SELECT SUM(amount) as total FROM expenses').fetchone()
-        
-        # Get available categories for the filter dropdown
-        categories = conn.execute('SELECT DISTINCT category FROM expenses').fetchall()
-        categories = [c['category'] for c in categories] + [c for c in EXPENSE_CATEGORIES if c not in categories]
+    # Get available categories for the filter dropdown
+    categories = Expense.get_categories() + EXPENSE_CATEGORIES
     
     # Get all available tags for the filter dropdown
     tags = []
@@ -242,39 +224,46 @@ def index():
         tags = [t['name'] for t in tag_rows]
     
     # Get current currency (default to USD)
-        currency_code = session.get('currency', 'HUF')
+    currency_code = session.get('currency', 'HUF')
     currency = CURRENCIES[currency_code]
     
-    return render_template('index.html', 
-                          expenses=expenses, 
-                          total=total_expenses['total'] if total_expenses['total'] else 0,
-                          categories=sorted(set(categories)),
-                          tags=tags,
-                          search_query=search_query,
-                          category_filter=category_filter,
-                          tag_filter=tag_filter,
-                          from_date=from_date,
-                          to_date=to_date,
-                          currency=currency,
-                          currency_code=currency_code)
+    # The full history is streamed so memory stays flat however large it is
+    render = stream_template if show_all else render_template
+    return render('index.html', 
+                  expenses=expenses, 
+                  total=total_expenses,
+                  categories=sorted(set(categories)),
+                  tags=tags,
+                  search_query=search_query,
+                  category_filter=category_filter,
+                  tag_filter=tag_filter,
+                  from_date=from_date,
+                  to_date=to_date,
+                  next_url=next_url,
+                  full_history_url=full_history_url,
+                  currency=currency,
+                  currency_code=currency_code)
 
 # Add expense
 @app.route('/add', methods=['GET', 'POST'])
 def add_expense():
     if request.method == 'POST':
         # Validate form data
-        errors = validate_expense(request.form)
+        errors = validate_expense(request.form, g.currency_code)
         
         if errors:
             for error in errors:
                 flash(error, 'danger')
             return render_template('add_expense.html', 
                                   form_data=request.form, 
-                                  categories=EXPENSE_CATEGORIES)
+                                  categories=EXPENSE_CATEGORIES,
+                                  currencies=CURRENCIES,
+                                  currency_code=g.currency_code)
         
         # Get form data
         description = request.form['description']
-        amount = float(request.form['amount'])
+        currency = request.form.get('currency') or g.currency_code
+        amount = Money.parse(request.form['amount'], currency)
         category = request.form['category']
         date = request.form['date']
         
@@ -289,41 +278,26 @@ def add_expense():
         with get_db_connection() as conn:
             # Insert expense
             cursor = conn.execute(
-                'INSERT INTO expenses (description, amount, category, date, recurring, recurring_interval) VALUES (?, ?, ?, ?, ?, ?)',
-                (description, amount, category, date, recurring, recurring_interval)
+                'INSERT INTO expenses (description, amount, currency, category, date, recurring, recurring_interval) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (description, amount, currency, category, date, recurring, recurring_interval)
             )
             
-            # Handle tags if provided
-            if tags:
-                expense_id = cursor.lastrowid
-                
-                for tag_name in tags:
-                    # Check if tag exists
-                    tag = conn.execute('SELECT id FROM tags WHERE name = ?', (tag_name,)).fetchone()
-                    
-                    if tag:
-                        tag_id = tag['id']
-                    else:
-                        # Create new tag
-                        cursor = conn.execute('INSERT INTO tags (name) VALUES (?)', (tag_name,))
-                        tag_id = cursor.lastrowid
-                    
-                    # Create relationship
-                    conn.execute('INSERT INTO expense_tags (expense_id, tag_id) VALUES (?, ?)', 
-                               (expense_id, tag_id))
+            # Handle tags if provided, batched in the same transaction
+            Expense.set_tags(cursor.lastrowid, tags, conn)
             
             conn.commit()
             flash('Expense added successfully!', 'success')
-            
+        
         return redirect(url_for('index'))
-
-    return render_template('add_expense.html', categories=EXPENSE_CATEGORIES)
+    
+    return render_template('add_expense.html', categories=EXPENSE_CATEGORIES, currencies=CURRENCIES,
+                           currency_code=g.currency_code)
 
 # Edit expense
 @app.route('/edit/<int:id>', methods=['GET', 'POST'])
 def edit_expense(id):
     with get_db_connection() as conn:
-        expense = conn.execute('SELECT * FROM expenses WHERE id = ?', (id,)).fetchone()
+        expense = Expense.get_by_id(id)
         
         if not expense:
             flash('Expense not found!', 'danger')
@@ -341,7 +315,7 @@ def edit_expense(id):
         
         if request.method == 'POST':
             # Validate form data
-            errors = validate_expense(request.form)
+            errors = validate_expense(request.form, expense['currency'])
             
             if errors:
                 for error in errors:
@@ -349,11 +323,13 @@ def edit_expense(id):
                 return render_template('edit_expense.html', 
                                       expense=expense, 
                                       tags=','.join(tags),
-                                      categories=EXPENSE_CATEGORIES)
+                                      categories=EXPENSE_CATEGORIES,
+                                      currencies=CURRENCIES)
             
             # Get form data
             description = request.form['description']
-            amount = float(request.form['amount'])
+            currency = request.form.get('currency') or expense['currency']
+            amount = Money.parse(request.form['amount'], currency)
             category = request.form['category']
             date = request.form['date']
             
@@ -364,9 +340,9 @@ def edit_expense(id):
             # Update expense
             conn.execute('''
                 UPDATE expenses
-                SET description = ?, amount = ?, category = ?, date = ?, recurring = ?, recurring_interval = ?
+                SET description = ?, amount = ?, currency = ?, category = ?, date = ?, recurring = ?, recurring_interval = ?
                 WHERE id = ?
-            ''', (description, amount, category, date, recurring, recurring_interval, id))
+            ''', (description, amount, currency, category, date, recurring, recurring_interval, id))
             
             # Handle tags
             new_tags = request.form.get('tags', '').split(',')
@@ -375,21 +351,8 @@ def edit_expense(id):
             # Remove existing tags
             conn.execute('DELETE FROM expense_tags WHERE expense_id = ?', (id,))
             
-            # Add new tags
-            for tag_name in new_tags:
-                # Check if tag exists
-                tag = conn.execute('SELECT id FROM tags WHERE name = ?', (tag_name,)).fetchone()
-                
-                if tag:
-                    tag_id = tag['id']
-                else:
-                    # Create new tag
-                    cursor = conn.execute('INSERT INTO tags (name) VALUES (?)', (tag_name,))
-                    tag_id = cursor.lastrowid
-                
-                # Create relationship
-                conn.execute('INSERT INTO expense_tags (expense_id, tag_id) VALUES (?, ?)', 
-                           (id, tag_id))
+            # Add new tags, batched in the same transaction
+            Expense.set_tags(id, new_tags, conn)
             
             conn.commit()
             flash('Expense updated successfully!', 'success')
@@ -398,7 +361,8 @@ def edit_expense(id):
         return render_template('edit_expense.html', 
                                expense=expense, 
                                tags=','.join(tags),
-                               categories=EXPENSE_CATEGORIES)
+                               categories=EXPENSE_CATEGORIES,
+                               currencies=CURRENCIES)
 
 # Delete expense
 @app.route('/delete/<int:id>', methods=['POST'])
@@ -412,137 +376,62 @@ def delete_expense(id):
     return redirect(url_for('index'))
 
 # Analytics page
+def _analytics_data(period, currency):
+    """Compute the analytics page data for a period ('week', 'month', 'year' or 'all'), amounts in currency."""
+    # Get current date and calculate time ranges
+    today = datetime.today()
+    
+    # Prepare date filters based on period
+    date_filters = {
+        'week': today - timedelta(days=7),
+        'month': today - timedelta(days=30),
+        'year': today - timedelta(days=365),
+        'all': None
+    }
+    
+    selected_date = date_filters.get(period)
+    filters = {'from_date': selected_date.strftime('%Y-%m-%d')} if selected_date else {}
+    filters['currency'] = currency
+    
+    # Stats, category breakdown and monthly series in one pass over the daily rollup
+    dashboard = DashboardStats.get(filters)
+    
+    # Get top expenses
+    top_expenses = Expense.top_n(filters, 5)
+    
+    return {
+        'category_totals': dashboard['category_totals'],
+        'monthly_spending': dashboard['monthly_spending'],
+        'top_expenses': [dict(row) for row in top_expenses],
+        'stats': dashboard['stats'],
+        # One grouped query, each budget over its own period
+        'budget_comparison': Budget.get_comparison(currency=currency)
+    }
+
 @app.route('/analytics')
+@conditional_get()
 def analytics():
     period = request.args.get('period', 'all')
     chart_type = request.args.get('chart_type', 'category')
     
-    with get_db_connection() as conn:
-        # Get current date and calculate time ranges
-        today = datetime.today()
-        
-        # Prepare date filters based on period
-        date_filters = {
-            'week': today - timedelta(days=7),
-            'month': today - timedelta(days=30),
-            'year': today - timedelta(days=365),
-            'all': None
-        }
-        
-        selected_date = date_filters.get(period)
-        date_clause = ''
-        params = []
-        
-        if selected_date:
-            date_clause = 'WHERE date >= ?'
-            params.append(selected_date.strftime('%Y-%m-%d'))
-        
-        # Category breakdown
-        category_totals = conn.execute(f'''
-            SELECT category, SUM(amount) as total
-            FROM expenses
-            {date_clause}
-            GROUP BY category
-            ORDER BY total DESC
-        ''', params).fetchall()
-        
-        # Monthly spending over time (for time-based charts)
-        monthly_spending = conn.execute(f'''
-            SELECT 
-                strftime('%Y-%m', date) as month,
-                SUM(amount) as total
-            FROM expenses
-            {date_clause}
-            GROUP BY month
-            ORDER BY month
-        ''', params).fetchall()
-        
-        # Get top expenses
-        top_expenses = conn.execute(f'''
-            SELECT *
-            FROM expenses
-            {date_clause}
-            ORDER BY amount DESC
-            LIMIT 5
-        ''', params).fetchall()
-        
-        # Get overall statistics
-        stats = {}
-        
-        # Total expenses
-        total_result = conn.execute(f'SELECT SUM(amount) as total FROM expenses {date_clause}', params).fetchone()
-        stats['total'] = total_result['total'] if total_result['total'] else 0
-        
-        # Average expense
-        avg_result = conn.execute(f'SELECT AVG(amount) as avg FROM expenses {date_clause}', params).fetchone()
-        stats['average'] = avg_result['avg'] if avg_result['avg'] else 0
-        
-        # Highest expense
-        max_result = conn.execute(f'SELECT MAX(amount) as max FROM expenses {date_clause}', params).fetchone()
-        stats['max'] = max_result['max'] if max_result['max'] else 0
-        
-        # Count of expenses
-        count_result = conn.execute(f'SELECT COUNT(*) as count FROM expenses {date_clause}', params).fetchone()
-        stats['count'] = count_result['count'] if count_result['count'] else 0
-        
-        # Get budget comparison
-        budgets = conn.execute('SELECT * FROM budgets').fetchall()
-        budget_comparison = []
-        
-        for budget in budgets:
-            category = budget['category']
-            budget_amount = budget['amount']
-            period = budget['period']
-            
-            # Calculate date range for budget period
-            if period == 'monthly':
-                start_date = today.replace(day=1).strftime('%Y-%m-%d')
-            elif period == 'weekly':
-                start_date = (today - timedelta(days=today.weekday())).strftime('%Y-%m-%d')
-            elif period == 'yearly':
-                start_date = today.replace(month=1, day=1).strftime('%Y-%m-%d')
-            else:
-                start_date = None
-            
-            # Get actual spending
-            if start_date:
-                spent_result = conn.execute('''
-                    SELECT SUM(amount) as spent
-                    FROM expenses
-                    WHERE category = ? AND date >= ?
-                ''', (category, start_date)).fetchone()
-            else:
-                spent_result = conn.execute('''
-                    SELECT SUM(amount) as spent
-                    FROM expenses
-                    WHERE category = ?
-                ''', (category,)).fetchone()
-            
-            spent = spent_result['spent'] if spent_result['spent'] else 0
-            
-            # Calculate percentage without limiting to 100%
-            percentage = round((spent / budget_amount) * 100) if budget_amount > 0 else 0
-            
-            budget_comparison.append({
-                'category': category,
-                'budget': budget_amount,
-                'spent': spent,
-                'percentage': percentage,
-                'period': period
-            })
+    # Periods are relative to today, so the date is part of the cache key. The
+    # namespace is not 'analytics': the blueprint app caches a different payload
+    # (and different periods) under that one, possibly in the same shared store
+    data = cached('legacy_analytics', {'period': period, 'currency': g.currency_code, 'today': datetime.today().date()},
+                  lambda: _analytics_data(period, g.currency_code))
     
     # Get current currency (default to USD)
     currency_code = session.get('currency', 'HUF')
     currency = CURRENCIES[currency_code]
     
     return render_template('analytics.html',
-                          category_totals=category_totals,
-                          monthly_spending=monthly_spending,
-                          top_expenses=top_expenses,
-                          stats=stats,
+                          category_totals=data['category_totals'],
+                          monthly_spending=data['monthly_spending'],
+                          top_expenses=data['top_expenses'],
+                          stats=data['stats'],
                           period=period,
                           chart_type=chart_type,
-                          budget_comparison=budget_comparison,
+                          budget_comparison=data['budget_comparison'],
                           currency=currency,
                           currency_code=currency_code)
 
@@ -561,7 +450,7 @@ def manage_budgets():
             errors.append('Category is required')
         
         try:
-            amount = float(amount)
+            amount = Money.parse(amount)
             if amount <= 0:
                 errors.append('Budget amount must be greater than zero')
         except (ValueError, TypeError):
@@ -621,39 +510,51 @@ def delete_budget(id):
     
     return redirect(url_for('manage_budgets'))
 
+# Import data
+@app.route('/import', methods=['POST'])
+def import_data():
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Please choose a file to import', 'danger')
+        return redirect(url_for('index'))
+    
+    # Parse the upload as a stream and insert it in batches within one transaction
+    parser = PARSERS[detect_format(upload.filename)]
+    try:
+        summary = import_expenses(parser(open_upload(upload)))
+    except ImportFileError as exc:
+        flash(f'Could not import {upload.filename}: {exc}', 'danger')
+        return redirect(url_for('index'))
+    
+    flash(f"Imported {summary['imported']} expenses", 'success')
+    if summary['skipped']:
+        flash(f"Skipped {summary['skipped']} invalid rows", 'warning')
+    
+    return redirect(url_for('index'))
+
 # Export data
 @app.route('/export', methods=['GET'])
 def export_data():
     format_type = request.args.get('format', 'json')
     
-    with get_db_connection() as conn:
-        # Get all expenses with their tags
-        expenses = conn.execute('''
-            SELECT e.*, GROUP_CONCAT(t.name) as tags
-            FROM expenses e
-            LEFT JOIN expense_tags et ON e.id = et.expense_id
-            LEFT JOIN tags t ON et.tag_id = t.id
-            GROUP BY e.id
-            ORDER BY e.date DESC
-        ''').fetchall()
-        
-        # Convert to list of dicts
-        result = []
-        for expense in expenses:
-            expense_dict = dict(expense)
-            # Split tags string into list
-            tags_str = expense_dict.pop('tags', None)
-            expense_dict['tags'] = tags_str.split(',') if tags_str else []
-            result.append(expense_dict)
-    
-    if format_type == 'json':
-        return jsonify(result)
-    else:
-        # Can implement CSV export here
+    filters = {
+        'category': request.args.get('category', ''),
+        'from_date': request.args.get('from_date', ''),
+        'to_date': request.args.get('to_date', '')
+    }
+    
+    # Stream rows straight from the database cursor, gzipped if the client allows
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    response = export_response(format_type, filters, use_gzip)
+    
+    if response is None:
         return jsonify({"error": "Format not supported"}), 400
+    
+    return response
 
 # Tags API
 @app.route('/api/tags', methods=['GET'])
+@conditional_get(personalized=False)
 def get_tags():
     with get_db_connection() as conn:
         tags = conn.execute('SELECT name FROM tags ORDER BY name').fetchall()
@@ -721,75 +622,22 @@ def set_currency():
 
 # Expense reports
 @app.route('/reports', methods=['GET'])
+@conditional_get()
 def reports():
     from_date = request.args.get('from_date', '')
     to_date = request.args.get('to_date', '')
     grouping = request.args.get('grouping', 'month')  # month, week, category
+    if grouping not in REPORT_DIMENSIONS:
+        grouping = 'month'
     
-    query_params = []
-    date_filter = ''
-    
-    # Apply date filters if provided
-    if from_date:
-        date_filter += ' AND date >= ?'
-        query_params.append(from_date)
-    
-    if to_date:
-        date_filter += ' AND date <= ?'
-        query_params.append(to_date)
+    filters = {'from_date': from_date, 'to_date': to_date, 'currency': g.currency_code}
+    report_type = REPORT_LABELS[grouping]
     
-    with get_db_connection() as conn:
-        if grouping == 'category':
-            # Group by category
-            report_data = conn.execute(f'''
-                SELECT category, SUM(amount) as total, COUNT(*) as count
-                FROM expenses
-                WHERE 1=1 {date_filter}
-                GROUP BY category
-                ORDER BY total DESC
-            ''', query_params).fetchall()
-            
-            report_type = 'Category'
-            
-        elif grouping == 'week':
-            # Group by week (using SQLite's strftime)
-            report_data = conn.execute(f'''
-                SELECT 
-                    strftime('%Y-W%W', date) as period,
-                    SUM(amount) as total,
-                    COUNT(*) as count
-                FROM expenses
-                WHERE 1=1 {date_filter}
-                GROUP BY period
-                ORDER BY period
-            ''', query_params).fetchall()
-            
-            report_type = 'Weekly'
-            
-        else:  # Default to month
-            # Group by month
-            report_data = conn.execute(f'''
-                SELECT 
-                    strftime('%Y-%m', date) as period,
-                    SUM(amount) as total,
-                    COUNT(*) as count
-                FROM expenses
-                WHERE 1=1 {date_filter}
-                GROUP BY period
-                ORDER BY period
-            ''', query_params).fetchall()
-            
-            report_type = 'Monthly'
-        
-        # Get overall summary
-        summary = conn.execute(f'''
-            SELECT 
-                SUM(amount) as grand_total,
-                COUNT(*) as total_count,
-                AVG(amount) as average
-            FROM expenses
-            WHERE 1=1 {date_filter}
-        ''', query_params).fetchone()
+    # One report query gives both the rows and the grand total
+    report = cached('report', {'dimensions': [grouping], 'filters': filters, 'subtotals': True},
+                    lambda: ExpenseReport.run([grouping], filters, subtotals=True))
+    report_data = ExpenseReport.rows(report, level=1)
+    summary = ExpenseReport.summary(report)
     
     return render_template('reports.html',
                           report_data=report_data,
@@ -895,153 +743,83 @@ def delete_savings_goal(id):
 
 # Spending Prediction
 @app.route('/forecasts', methods=['GET'])
+@conditional_get()
 def forecasts():
     # Get month filter from request, default to current month
-    current_date = datetime.today()
-    default_month = current_date.strftime('%Y-%m')
-    month_filter = request.args.get('month', default_month)
+    current_month = datetime.today().strftime('%Y-%m')
+    month_filter = request.args.get('month', current_month)
     category_filter = request.args.get('category', '')
     
     try:
-        # Parse year and month from filter
-        year, month = map(int, month_filter.split('-'))
-        # Get the current year-month
-        current_year = current_date.year
-        current_month = current_date.month
-        
-        # Calculate the previous 6 months for historical data analysis
-        months_data = []
-        for i in range(6):
-            prev_month = month - i - 1
-            prev_year = year
-            
-            if prev_month <= 0:
-                prev_month += 12
-                prev_year -= 1
-                
-            # Skip future months
-            if (prev_year > current_year) or (prev_year == current_year and prev_month > current_month):
-                continue
-                
-            months_data.append({'year': prev_year, 'month': prev_month})
+        datetime.strptime(month_filter, '%Y-%m')
     except ValueError:
         # If invalid month format, default to current month
-        year, month = current_date.year, current_date.month
-        month_filter = default_month
-        months_data = []
-        for i in range(6):
-            prev_month = current_month - i - 1
-            prev_year = current_year
-            
-            if prev_month <= 0:
-                prev_month += 12
-                prev_year -= 1
-                
-            months_data.append({'year': prev_year, 'month': prev_month})
+        month_filter = current_month
     
-    with get_db_connection() as conn:
-        # Get categories for filter
-        categories = conn.execute('SELECT DISTINCT category FROM expenses WHERE category IS NOT NULL').fetchall()
-        categories = [c['category'] for c in categories if c['category']] + [c for c in EXPENSE_CATEGORIES if c not in [c['category'] for c in categories if c['category']]]
-        
-        # Historical data analysis
-        historical_data = []
-        month_totals = []
-        
-        base_query = '''
-            SELECT category, SUM(amount) as total
-            FROM expenses
-            WHERE strftime('%Y', date) = ? AND strftime('%m', date) = ?
-        '''
-        
-        if category_filter:
-            base_query += ' AND category = ?'
-        
-        base_query += ' GROUP BY category ORDER BY total DESC'
-        
-        for month_data in months_data:
-            year_str = str(month_data['year'])
-            # Format month with leading zero
-            month_str = f"{month_data['month']:02d}"
-            
-            params = [year_str, month_str]
-            
-            if category_filter:
-                params.append(category_filter)
-            
-            month_expenses = conn.execute(base_query, params).fetchall()
-            
-            # Calculate month total - handle empty data
-            month_total = sum(expense['total'] for expense in month_expenses) if month_expenses else 0
-            
-            if month_total > 0:  # Only add months with actual expenses
-                month_totals.append(month_total)
-                
-                # Store data for analysis
-                historical_data.append({
-                    'year_month': f"{year_str}-{month_str}",
-                    'expenses': month_expenses,
-                    'total': month_total
-                })
-        
-        # Skip prediction if not enough data
-        prediction = None
-        predicted_categories = []
-        
-        if month_totals and len(month_totals) > 0:
-            # Simple prediction based on average of previous months
-            avg_total = sum(month_totals) / len(month_totals)
-            
-            # Get category breakdown from historical data
-            category_totals = {}
-            category_counts = {}
-            
-            for month in historical_data:
-                for expense in month['expenses']:
-                    cat = expense['category']
-                    if cat not in category_totals:
-                        category_totals[cat] = 0
-                        category_counts[cat] = 0
-                    
-                    category_totals[cat] += expense['total']
-                    category_counts[cat] += 1
-            
-            # Calculate predicted amounts per category
-            for cat in category_totals:
-                if category_counts[cat] > 0:
-                    avg_amount = category_totals[cat] / category_counts[cat]
-                    predicted_categories.append({
-                        'category': cat,
-                        'amount': avg_amount,
-                        'frequency': category_counts[cat] / len(historical_data) * 100
-                    })
-            
-            # Sort by frequency (most common first)
-            predicted_categories.sort(key=lambda x: x['frequency'], reverse=True)
-            
-            # Final prediction
-            prediction = {
-                'total': avg_total,
-                'categories': predicted_categories
-            }
-    
-    # Get next month for prediction
-    next_month = month + 1
-    next_year = year
-    
-    if next_month > 12:
-        next_month = 1
-        next_year += 1
-        
-    next_month_str = f"{next_year}-{next_month:02d}"
+    # The current month is still incomplete, so history ends the month before it
+    last_month = min(month_filter, ExpenseForecast.previous_month(current_month))
+    
+    # Fitted forecasts are cached per data version
+    data = cached('forecasts', {'last_month': last_month, 'category': category_filter, 'today': current_month,
+                                'currency': g.currency_code},
+                  lambda: ExpenseForecast.forecast(last_month, category_filter or None, g.currency_code))
+    
+    categories = set(ExpenseRollup.get_categories()) | set(EXPENSE_CATEGORIES)
     
     return render_template('forecasts.html',
-                          historical_data=historical_data,
-                          prediction=prediction,
+                          historical_data=data['history'],
+                          prediction=data['prediction'],
                           month_filter=month_filter,
-                          next_month=next_month_str,
+                          next_month=data['target_month'],
                           category_filter=category_filter,
-                          categories=sorted(set(categories)) if categories else [])
+                          categories=sorted(categories))
+
+# Columnar expense reports
+@app.route('/api/reports', methods=['GET'])
+@conditional_get(personalized=False)
+def report_api():
+    dimensions = [d.strip() for d in request.args.get('dimensions', 'month').split(',') if d.strip()]
+    filters = {
+        'from_date': request.args.get('from_date', ''),
+        'to_date': request.args.get('to_date', ''),
+        'category': request.args.get('category', ''),
+        'tag': request.args.get('tag', ''),
+        'currency': request.args.get('currency', '')
+    }
+    subtotals = request.args.get('subtotals') == '1'
+    
+    errors = ExpenseReport.validate(dimensions, filters)
+    if errors:
+        return jsonify({'errors': errors, 'dimensions': REPORT_DIMENSIONS, 'currencies': list(CURRENCIES)}), 400
+    
+    report = cached('report', {'dimensions': dimensions, 'filters': filters, 'subtotals': subtotals},
+                    lambda: ExpenseReport.run(dimensions, filters, subtotals))
+    return jsonify(report)
+
+# Expense time series for charts
+@app.route('/api/timeseries', methods=['GET'])
+@conditional_get(personalized=False)
+def timeseries():
+    filters = {
+        'from_date': request.args.get('from_date', ''),
+        'to_date': request.args.get('to_date', ''),
+        'category': request.args.get('category', ''),
+        'currency': request.args.get('currency', '')
+    }
+    bucket = request.args.get('bucket', 'month')
+    if bucket not in TIME_BUCKETS:
+        return jsonify({'error': f'Unknown bucket: {bucket}', 'buckets': TIME_BUCKETS}), 400
+    tag_name = request.args.get('tag', '')
+    max_points = min(request.args.get('max_points', MAX_CHART_POINTS, type=int), MAX_CHART_POINTS)
+    
+    data = cached('timeseries', {'filters': filters, 'bucket': bucket, 'tag': tag_name, 'max_points': max_points},
+                  lambda: ExpenseTimeSeries.get(filters, bucket, tag_name, max_points))
+    return jsonify(data)
+
+# Response cache counters
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify(get_cache_stats())
 
 # Income Tracking
 @app.route('/income', methods=['GET'])
@@ -1068,11 +846,15 @@ def income():
     
     query += ' ORDER BY date DESC'
     
+    # Totals are converted into the display currency inside SQLite
+    converted = get_fx_rates().convert_sql('income_entries.amount', 'income_entries.currency',
+                                              'substr(income_entries.date, 1, 7)', g.currency_code)
+    
     with get_db_connection() as conn:
-        income_entries = conn.execute(query, params).fetchall()
+        income_entries = [with_row_currency(entry) for entry in conn.execute(query, params)]
         
         # Get total income
-        total_query = 'SELECT SUM(amount) as total FROM income_entries WHERE 1=1'
+        total_query = f'SELECT SUM({converted}) as total FROM income_entries WHERE 1=1'
         total_params = []
         
         if from_date:
@@ -1087,18 +869,18 @@ def income():
             total_query += ' AND source = ?'
             total_params.append(source_filter)
         
-        total_income = conn.execute(total_query, total_params).fetchone()
+        total_income = Money(conn.execute(total_query, total_params).fetchone()['total'] or 0, g.currency_code)
         
         # Get recurring income
-        recurring_query = 'SELECT SUM(amount) as total FROM income_entries WHERE recurring = 1'
-        recurring_total = conn.execute(recurring_query).fetchone()
+        recurring_query = f'SELECT SUM({converted}) as total FROM income_entries WHERE recurring = 1'
+        recurring_total = Money(conn.execute(recurring_query).fetchone()['total'] or 0, g.currency_code)
         
         # Get monthly average (for the selected period)
         if from_date and to_date:
             start = datetime.strptime(from_date, '%Y-%m-%d')
             end = datetime.strptime(to_date, '%Y-%m-%d')
             months = (end.year - start.year) * 12 + end.month - start.month + 1
-            monthly_avg = total_income['total'] / months if total_income['total'] and months > 0 else 0
+            monthly_avg = total_income / months if total_income and months > 0 else 0
         else:
             monthly_avg = 0
         
@@ -1108,18 +890,23 @@ def income():
     
     return render_template('income.html',
                           income_entries=income_entries,
-                          total=total_income['total'] if total_income['total'] else 0,
-                          recurring_total=recurring_total['total'] if recurring_total['total'] else 0,
+                          total=total_income,
+                          recurring_total=recurring_total,
                           monthly_avg=monthly_avg,
                           sources=sources,
                           from_date=from_date,
                           to_date=to_date,
-                          source_filter=source_filter)
+                          source_filter=source_filter,
+                          currencies=CURRENCIES)
 
 @app.route('/income/add', methods=['POST'])
 def add_income():
     source = request.form.get('source')
-    amount = float(request.form.get('amount', 0))
+    currency = request.form.get('currency') or g.currency_code
+    if currency not in CURRENCIES:
+        flash('Unknown currency', 'danger')
+        return redirect(url_for('income'))
+    amount = Money.parse(request.form.get('amount', 0), currency)
     date = request.form.get('date')
     description = request.form.get('description', '')
     recurring = 1 if request.form.get('recurring') else 0
@@ -1133,9 +920,9 @@ def add_income():
     with get_db_connection() as conn:
         conn.execute('''
             INSERT INTO income_entries 
-            (source, amount, date, description, recurring, recurring_interval)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (source, amount, date, description, recurring, recurring_interval))
+            (source, amount, currency, date, description, recurring, recurring_interval)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (source, amount, currency, date, description, recurring, recurring_interval))
         conn.commit()
     
     flash('Income entry added successfully!', 'success')
@@ -1144,7 +931,11 @@ def add_income():
 @app.route('/income/edit/<int:id>', methods=['POST'])
 def edit_income(id):
     source = request.form.get('source')
-    amount = float(request.form.get('amount', 0))
+    currency = request.form.get('currency') or g.currency_code
+    if currency not in CURRENCIES:
+        flash('Unknown currency', 'danger')
+        return redirect(url_for('income'))
+    amount = Money.parse(request.form.get('amount', 0), currency)
     date = request.form.get('date')
     description = request.form.get('description', '')
     recurring = 1 if request.form.get('recurring') else 0
@@ -1158,10 +949,10 @@ def edit_income(id):
     with get_db_connection() as conn:
         conn.execute('''
             UPDATE income_entries
-            SET source = ?, amount = ?, date = ?, description = ?, 
+            SET source = ?, amount = ?, currency = ?, date = ?, description = ?, 
                 recurring = ?, recurring_interval = ?
             WHERE id = ?
-        ''', (source, amount, date, description, recurring, recurring_interval, id))
+        ''', (source, amount, currency, date, description, recurring, recurring_interval, id))
         conn.commit()
     
     flash('Income entry updated successfully!', 'success')
@@ -1176,7 +967,7 @@ def delete_income(id):
     flash('Income entry deleted successfully!', 'success')
     return redirect(url_for('income'))
 
-# Run the app
+# Run the app (development server; see wsgi.py for production)
 if __name__ == '__main__':
     init_db()
-    app.run(debug=True)
+    app.run(debug=DEBUG)
@@ -1,19 +1,34 @@
 from flask import Flask
-from app.config import SECRET_KEY, DEBUG
-from app.database import init_db
+from app.config import SECRET_KEY, DEBUG, RECURRING_SCHEDULER_INTERVAL
+from app.database import init_db, init_app as init_database
+from app.commands import register_commands
+from app.scheduler import start_recurring_scheduler
+from app.profiling import init_profiling
+from app.metrics import init_metrics
+from app.money import init_money
+from app.fx import init_fx
 from app.controllers.expense_controller import expense_bp
 from app.controllers.analytics_controller import analytics_bp
 from app.controllers.budget_controller import budget_bp
 from app.controllers.settings_controller import settings_bp
 
-def create_app():
-    """Initialize and configure the Flask application."""
+def create_app(start_scheduler=True):
+    """Initialize and configure the Flask application.
+    
+    Pass start_scheduler=False when the app is built before forking
+    workers; each worker then starts the recurring scheduler itself.
+    """
     app = Flask(__name__)
     app.secret_key = SECRET_KEY
     app.debug = DEBUG
     
     # Initialize database
     init_db()
+    init_database(app)
+    init_profiling(app)
+    init_metrics(app)
+    init_money(app)
+    init_fx(app)
     
     # Register blueprints
     app.register_blueprint(expense_bp)
@@ -21,4 +36,11 @@ def create_app():
     app.register_blueprint(budget_bp)
     app.register_blueprint(settings_bp)
     
+    # Register CLI commands
+    register_commands(app)
+    
+    # Materialize recurring expenses in the background if configured
+    if start_scheduler and RECURRING_SCHEDULER_INTERVAL > 0:
+        start_recurring_scheduler(RECURRING_SCHEDULER_INTERVAL)
+    
     return app 
\ No newline at end of file
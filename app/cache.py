@@ -0,0 +1,199 @@
+"""Response cache for the analytics, reports and forecast pages.
+
+Entries are keyed on (namespace, parameters, data version). The data
+version lives in the database and is bumped by triggers on every write to
+expenses, budgets and tags, so a write invalidates every cached entry in
+every process without any explicit purge; stale entries simply stop being
+looked up and age out of the LRU or their TTL.
+
+Each process keeps an in-memory LRU. When RESPONSE_CACHE_PATH is set, a
+shared SQLite file sits behind it so that several workers reuse each
+other's results. Cached values must be picklable (plain dicts and lists,
+not sqlite3.Row objects).
+"""
+import json
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from app.database import get_db_connection
+from app.config import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_PATH
+
+# Expired rows are purged from the shared store once every this many writes
+_PRUNE_EVERY = 100
+
+class SharedCacheStore:
+    """Cache entries in a SQLite file that several worker processes can share."""
+    
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=1)
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.execute('PRAGMA synchronous = OFF')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+    
+    def get(self, key):
+        """Get the unexpired value stored under key, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM response_cache WHERE key = ? AND expires_at > ?',
+                (key, time.time())
+            ).fetchone()
+        return pickle.loads(row[0]) if row else None
+    
+    def set(self, key, value, ttl):
+        """Store value under key for ttl seconds."""
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        
+        with self._lock:
+            try:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                    (key, blob, now + ttl)
+                )
+                self._writes += 1
+                if self._writes % _PRUNE_EVERY == 0:
+                    self._conn.execute('DELETE FROM response_cache WHERE expires_at <= ?', (now,))
+                self._conn.commit()
+            except sqlite3.OperationalError:
+                # Another worker holds the lock; the entry is just not shared this time
+                self._conn.rollback()
+    
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._conn.execute('DELETE FROM response_cache')
+            self._conn.commit()
+
+class ResponseCache:
+    """In-process LRU cache with a TTL, optionally backed by a shared store."""
+    
+    def __init__(self, max_entries, ttl, shared=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        """Get the cached value for key, or None on a miss."""
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+        
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self._store(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def set(self, key, value):
+        """Cache value under key locally and in the shared store."""
+        self._store(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value, self.ttl)
+    
+    def _store(self, key, value):
+        """Put an entry in the local LRU, evicting the least recently used if full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop every entry, locally and in the shared store."""
+        with self._lock:
+            self._entries.clear()
+        if self.shared is not None:
+            self.shared.clear()
+    
+    def stats(self):
+        """Get hit/miss counters for the cache."""
+        with self._lock:
+            hits, shared_hits, misses = self.hits, self.shared_hits, self.misses
+            entries = len(self._entries)
+        lookups = hits + shared_hits + misses
+        return {
+            'hits': hits,
+            'shared_hits': shared_hits,
+            'misses': misses,
+            'hit_ratio': round((hits + shared_hits) / lookups, 4) if lookups else 0,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'shared': self.shared is not None
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Get the process-wide response cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                shared = SharedCacheStore(RESPONSE_CACHE_PATH) if RESPONSE_CACHE_PATH else None
+                _cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, shared)
+    return _cache
+
+def get_cache_stats():
+    """Get hit/miss counters for the response cache."""
+    return get_cache().stats()
+
+def get_data_version():
+    """Get the current data version, bumped by every expense, budget or tag write."""
+    with get_db_connection() as conn:
+        row = conn.execute('SELECT version FROM data_version WHERE id = 1').fetchone()
+        return row['version'] if row else 0
+
+def get_data_stamp():
+    """Get (version, updated_at) for the data, updated_at being a Unix timestamp."""
+    with get_db_connection() as conn:
+        row = conn.execute('SELECT version, updated_at FROM data_version WHERE id = 1').fetchone()
+        return (row['version'], row['updated_at']) if row else (0, 0)
+
+def cached(namespace, params, compute):
+    """Get the result of compute() for (namespace, params) at the current data version.
+    
+    params must be JSON-serializable and include everything the result
+    depends on besides the data itself (filters, period, today's date for
+    relative periods). compute is only called on a miss.
+    """
+    key = json.dumps([namespace, params, get_data_version()], sort_keys=True, default=str)
+    cache = get_cache()
+    
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value)
+    return value
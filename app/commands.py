@@ -0,0 +1,47 @@
+import time
+import click
+from app.models.rollup import ExpenseRollup
+from app.models.recurring import RecurringExpense
+from app.importers import PARSERS, IMPORT_BATCH_SIZE, ImportFileError, detect_format, import_expenses
+
+def register_commands(app):
+    """Register maintenance commands on the Flask CLI."""
+    
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups():
+        """Recompute the daily and monthly expense rollup tables."""
+        counts = ExpenseRollup.rebuild()
+        click.echo(f"Rebuilt rollups: {counts['daily']} daily rows, {counts['monthly']} monthly rows")
+    
+    @app.cli.command('materialize-recurring')
+    @click.option('--today', type=click.DateTime(formats=['%Y-%m-%d']), help='Generate occurrences due by this date (default: today).')
+    def materialize_recurring(today):
+        """Create the expenses due from recurring series; safe to run from cron."""
+        start = time.perf_counter()
+        summary = RecurringExpense.materialize(today.date() if today else None)
+        click.echo(f"Generated {summary['generated']} expenses from {summary['templates']} recurring series "
+                   f"in {time.perf_counter() - start:.2f}s")
+    
+    @app.cli.command('import-expenses')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'format_type', type=click.Choice(sorted(PARSERS)), help='Input format (default: from file extension).')
+    @click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True, help='Rows per insert batch.')
+    def import_expenses_command(path, format_type, batch_size):
+        """Import expenses from a CSV or OFX file in a single transaction."""
+        parser = PARSERS[format_type or detect_format(path)]
+        start = time.perf_counter()
+        
+        def report(imported):
+            elapsed = time.perf_counter() - start
+            click.echo(f'  {imported} rows imported ({imported / elapsed:,.0f} rows/s)', err=True)
+        
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as handle:
+                summary = import_expenses(parser(handle), batch_size=batch_size, progress=report)
+        except ImportFileError as exc:
+            raise click.ClickException(f'{path}: {exc}')
+        
+        for error in summary['errors']:
+            click.echo(f"  row {error['row']}: {'; '.join(error['errors'])}", err=True)
+        click.echo(f"Imported {summary['imported']} expenses, skipped {summary['skipped']} "
+                   f"in {time.perf_counter() - start:.2f}s")
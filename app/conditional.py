@@ -0,0 +1,111 @@
+"""Conditional GET (ETag / Last-Modified) for read-only pages and APIs.
+
+Validators are derived from the data version stamp kept by triggers on
+expenses, budgets and tags, so answering a revalidation costs a single-row
+lookup: the view, its queries and its template are skipped entirely when
+the client's copy is still current. The application version is part of the
+ETag too, so a deploy that changes templates or views is not answered with
+304 for pages rendered by the previous release.
+"""
+import hashlib
+import os
+import threading
+from datetime import date, datetime, time, timezone
+from functools import wraps
+from flask import current_app, request, session, make_response
+from app.cache import get_data_stamp
+from app.config import APP_VERSION
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+def _source_fingerprint(app):
+    """Hash the paths, sizes and mtimes of the files a response is rendered from."""
+    roots = [os.path.dirname(os.path.abspath(__file__))]
+    for folder in (app.template_folder, app.static_folder):
+        if folder:
+            roots.append(os.path.join(app.root_path, folder))
+    
+    digest = hashlib.sha1()
+    for root in roots:
+        for directory, subdirectories, files in os.walk(root):
+            subdirectories[:] = sorted(name for name in subdirectories if name != '__pycache__')
+            for name in sorted(files):
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+                digest.update(f'{path}|{stat.st_size}|{stat.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()[:12]
+
+def app_version():
+    """Get the application version: APP_VERSION, or a fingerprint of its files.
+    
+    The fingerprint is taken once per app and process; a deploy restarts
+    the workers.
+    """
+    if APP_VERSION:
+        return APP_VERSION
+    
+    app = current_app._get_current_object()
+    version = _versions.get(app)
+    if version is None:
+        with _versions_lock:
+            version = _versions.get(app)
+            if version is None:
+                version = _versions[app] = _source_fingerprint(app)
+    return version
+
+def _etag(version, personalized):
+    """Build the entity tag for the current request at a data version."""
+    # Relative periods ("this month") roll over at midnight even without writes
+    parts = [app_version(), str(version), date.today().isoformat(), request.full_path]
+    if personalized:
+        parts += [session.get('currency', ''), request.cookies.get('theme', '')]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+def _last_modified(updated_at):
+    """Get the Last-Modified time: the last write, or midnight if that is later."""
+    midnight = datetime.combine(date.today(), time()).timestamp()
+    return datetime.fromtimestamp(max(updated_at, int(midnight)), timezone.utc)
+
+def conditional_get(personalized=True):
+    """Decorate a GET view so unchanged content is answered with 304 Not Modified.
+    
+    Personalized views render the session currency and theme cookie, which
+    are folded into the ETag; for them If-Modified-Since alone is not
+    trusted, since a preference change does not move Last-Modified.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages have to be rendered (and consumed)
+            if '_flashes' in session:
+                return view(*args, **kwargs)
+            
+            version, updated_at = get_data_stamp()
+            etag = _etag(version, personalized)
+            last_modified = _last_modified(updated_at)
+            
+            # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = (not personalized and since is not None
+                                and since.timestamp() >= last_modified.timestamp())
+            
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            # Let clients keep the copy but revalidate it on every use
+            response.cache_control.no_cache = True
+            if personalized:
+                response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
@@ -1,29 +1,72 @@
 import os
 
 # Application configuration
-DEBUG = True
+DEBUG = os.environ.get('FLASK_DEBUG', '0') == '1'
 SECRET_KEY = os.environ.get('SECRET_KEY', 'dev_key_for_testing')
-DATABASE_PATH = 'expenses.db'
+DATABASE_PATH = os.environ.get('DATABASE_PATH', 'expenses.db')
 
-# Available currencies
+# Database connection settings
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -16000))  # negative = KiB
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
+# Response cache for analytics, reports and forecasts
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 256))  # entries per process
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 300))  # seconds
+RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH', '')  # shared SQLite store; empty = per-process only
+
+# Answer dashboard aggregates from an in-process columnar snapshot of the expenses
+ANALYTICS_SNAPSHOT = os.environ.get('ANALYTICS_SNAPSHOT', '0') == '1'
+
+# Seconds between background runs of the recurring expense scheduler; 0 disables it
+RECURRING_SCHEDULER_INTERVAL = int(os.environ.get('RECURRING_SCHEDULER_INTERVAL', 0))
+
+# Per-request SQL profiling (Server-Timing header, slow-query log); off costs nothing
+SQL_PROFILING = os.environ.get('SQL_PROFILING', '0') == '1'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))  # log statements at least this slow
+SQL_PROFILE_TOP = int(os.environ.get('SQL_PROFILE_TOP', 5))  # statements listed in the debug panel
+SQL_PROFILE_PANEL = os.environ.get('SQL_PROFILE_PANEL', '0') == '1'  # append the panel to HTML pages
+
+# Serve request, database and cache metrics at /metrics (Prometheus text format)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+
+# Production server (gunicorn.conf.py); workers default to 2 x cores + 1
+WEB_BIND = os.environ.get('WEB_BIND', '0.0.0.0:8000')
+WEB_WORKERS = int(os.environ.get('WEB_WORKERS', os.environ.get('WEB_CONCURRENCY', 2 * (os.cpu_count() or 1) + 1)))
+WEB_THREADS = int(os.environ.get('WEB_THREADS', 4))  # request threads per worker
+WEB_KEEPALIVE = int(os.environ.get('WEB_KEEPALIVE', 5))  # seconds an idle keep-alive connection is held
+WEB_TIMEOUT = int(os.environ.get('WEB_TIMEOUT', 30))  # seconds before a stuck worker is restarted
+WEB_MAX_REQUESTS = int(os.environ.get('WEB_MAX_REQUESTS', 0))  # recycle workers after this many requests; 0 = never
+
+# Available currencies; decimals is the number of minor unit digits amounts are stored with
 CURRENCIES = {
-    'USD': {'symbol': '$', 'name': 'US Dollar'},
-    'EUR': {'symbol': '€', 'name': 'Euro'},
-    'GBP': {'symbol': '£', 'name': 'British Pound'},
-    'JPY': {'symbol': '¥', 'name': 'Japanese Yen'},
-    'CAD': {'symbol': 'C$', 'name': 'Canadian Dollar'},
-    'HUF': {'symbol': 'Ft', 'name': 'Hungarian Forint'}
+    'USD': {'symbol': '$', 'name': 'US Dollar', 'decimals': 2},
+    'EUR': {'symbol': '€', 'name': 'Euro', 'decimals': 2},
+    'GBP': {'symbol': '£', 'name': 'British Pound', 'decimals': 2},
+    'JPY': {'symbol': '¥', 'name': 'Japanese Yen', 'decimals': 0},
+    'CAD': {'symbol': 'C$', 'name': 'Canadian Dollar', 'decimals': 2},
+    'HUF': {'symbol': 'Ft', 'name': 'Hungarian Forint', 'decimals': 2}
 }
 
 # Default currency
 DEFAULT_CURRENCY = 'HUF'
 
+# Local exchange rate file (CSV of date,currency,rate; rate = FX_BASE_CURRENCY units per unit), never fetched
+FX_RATES_PATH = os.environ.get('FX_RATES_PATH', 'fx_rates.csv')
+FX_BASE_CURRENCY = os.environ.get('FX_BASE_CURRENCY', DEFAULT_CURRENCY)
+
 # Predefined categories
 EXPENSE_CATEGORIES = [
     'Food', 'Transportation', 'Housing', 'Utilities', 'Entertainment',
     'Healthcare', 'Education', 'Shopping', 'Travel', 'Miscellaneous'
 ]
 
+# Number of expenses shown per page on the expense list
+EXPENSES_PAGE_SIZE = int(os.environ.get('EXPENSES_PAGE_SIZE', 50))
+
+# Release identifier folded into ETags; empty = derived from the template, static and app source files
+APP_VERSION = os.environ.get('APP_VERSION', '')
+
 # Date format
 DATE_FORMAT = '%Y-%m-%d'
 
@@ -1,38 +1,61 @@
-from flask import Blueprint, render_template, request, session
+from datetime import date
+from flask import Blueprint, render_template, request, session, jsonify
 from app.models.expense import Expense
 from app.models.budget import Budget
-from app.config import CURRENCIES, DEFAULT_CURRENCY
+from app.models.timeseries import ExpenseTimeSeries, MAX_CHART_POINTS, TIME_BUCKETS
+from app.models.report import ExpenseReport, REPORT_DIMENSIONS, REPORT_LABELS
+from app.models.snapshot import get_snapshot
+from app.cache import cached, get_cache_stats
+from app.conditional import conditional_get
+from app.config import CURRENCIES, DEFAULT_CURRENCY, ANALYTICS_SNAPSHOT
 from app.utils import get_date_range
 
 analytics_bp = Blueprint('analytics', __name__)
 
+def _analytics_data(date_range):
+    """Compute the statistics, top expenses, category totals and budget comparison for a range.
+    
+    Amounts are in date_range['currency'].
+    """
+    if ANALYTICS_SNAPSHOT:
+        snapshot = get_snapshot()
+        return {
+            'stats': snapshot.get_statistics(date_range),
+            'top_expenses': [dict(row) for row in Expense.get_by_ids(snapshot.get_top_ids(5, date_range))],
+            'category_totals': snapshot.get_category_totals(date_range),
+            'budget_comparison': Budget.get_comparison(date_range, currency=date_range['currency'])
+        }
+    
+    return {
+        'stats': Expense.get_statistics(date_range),
+        'top_expenses': [dict(row) for row in Expense.top_n(date_range, 5)],
+        'category_totals': [dict(row) for row in Expense.get_category_totals(date_range)],
+        'budget_comparison': Budget.get_comparison(date_range, currency=date_range['currency'])
+    }
+
 @analytics_bp.route('/analytics')
+@conditional_get()
 def index():
     """Analytics page with expense charts and statistics."""
     # Get filter parameters
     period = request.args.get('period', 'month')
     chart_type = request.args.get('chart_type', 'category')
     
-    # Get date range based on period
-    date_range = get_date_range(period)
-    
-    # Get expense statistics
-    stats = Expense.get_statistics(date_range)
-    
-    # Get top expenses for the period
-    with_filters = Expense.get_all(date_range, 'amount DESC')
-    top_expenses = with_filters[:5] if with_filters else []
-    
-    # Get category totals for the period
-    category_totals = Expense.get_category_totals(date_range)
-    
-    # Get budget comparison
-    budget_comparison = Budget.get_comparison(date_range)
-    
     # Get current currency
     currency_code = session.get('currency', DEFAULT_CURRENCY)
     currency = CURRENCIES[currency_code]
     
+    # Get date range based on period, amounts converted into the current currency
+    date_range = dict(get_date_range(period), currency=currency_code)
+    
+    # Periods are relative to today, so the date is part of the cache key
+    data = cached('analytics', {'period': period, 'currency': currency_code, 'today': date.today()},
+                  lambda: _analytics_data(date_range))
+    stats = data['stats']
+    top_expenses = data['top_expenses']
+    category_totals = data['category_totals']
+    budget_comparison = data['budget_comparison']
+    
     # Create chart data based on chart type
     chart_data = {}
     if chart_type == 'category':
@@ -45,11 +68,14 @@ def index():
             'data': data
         }
     else:
-        # Time chart - would need to implement time-based grouping
-        # This is a placeholder and should be implemented based on requirements
+        # Time chart - daily points for short periods, weekly for a year, monthly for everything
+        bucket = {'week': 'day', 'month': 'day', 'year': 'week'}.get(period, 'month')
+        time_series = cached('timeseries', {'filters': date_range, 'bucket': bucket},
+                             lambda: ExpenseTimeSeries.get(date_range, bucket))
+        
         chart_data = {
-            'labels': ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
-            'data': [100, 150, 200, 175, 225, 250]
+            'labels': time_series['labels'],
+            'data': time_series['totals']
         }
     
     return render_template('analytics.html',
@@ -64,34 +90,87 @@ def index():
                           currency_code=currency_code)
 
 @analytics_bp.route('/reports')
+@conditional_get()
 def reports():
     """Reports page for generating expense reports."""
     # Get filter parameters
     from_date = request.args.get('from_date', '')
     to_date = request.args.get('to_date', '')
     grouping = request.args.get('grouping', 'month')  # month, week, category
+    if grouping not in REPORT_DIMENSIONS:
+        grouping = 'month'
+    
+    # Get current currency
+    currency_code = session.get('currency', DEFAULT_CURRENCY)
+    currency = CURRENCIES[currency_code]
     
     # Create filters
-    filters = {}
+    filters = {'currency': currency_code}
     if from_date:
         filters['from_date'] = from_date
     if to_date:
         filters['to_date'] = to_date
     
-    # Get report data based on grouping
-    # Implementation depends on requirements, this is a placeholder
-    report_data = []
-    report_type = 'Monthly'
-    
-    # Get current currency
-    currency_code = session.get('currency', DEFAULT_CURRENCY)
-    currency = CURRENCIES[currency_code]
+    # One report query gives both the rows and the grand total
+    report = cached('report', {'dimensions': [grouping], 'filters': filters, 'subtotals': True},
+                    lambda: ExpenseReport.run([grouping], filters, subtotals=True))
+    report_data = ExpenseReport.rows(report, level=1)
+    summary = ExpenseReport.summary(report)
+    report_type = REPORT_LABELS[grouping]
     
     return render_template('reports.html',
                           report_data=report_data,
+                          summary=summary,
                           report_type=report_type,
                           from_date=from_date,
                           to_date=to_date,
                           grouping=grouping,
                           currency=currency,
-                          currency_code=currency_code) 
\ No newline at end of file
+                          currency_code=currency_code) 
+
+@analytics_bp.route('/api/reports')
+@conditional_get(personalized=False)
+def report_api():
+    """Columnar expense report; dimensions is a comma-separated grouping spec."""
+    dimensions = [d.strip() for d in request.args.get('dimensions', 'month').split(',') if d.strip()]
+    filters = {
+        'from_date': request.args.get('from_date', ''),
+        'to_date': request.args.get('to_date', ''),
+        'category': request.args.get('category', ''),
+        'tag': request.args.get('tag', ''),
+        'currency': request.args.get('currency', '')
+    }
+    subtotals = request.args.get('subtotals') == '1'
+    
+    errors = ExpenseReport.validate(dimensions, filters)
+    if errors:
+        return jsonify({'errors': errors, 'dimensions': REPORT_DIMENSIONS, 'currencies': list(CURRENCIES)}), 400
+    
+    report = cached('report', {'dimensions': dimensions, 'filters': filters, 'subtotals': subtotals},
+                    lambda: ExpenseReport.run(dimensions, filters, subtotals))
+    return jsonify(report)
+
+@analytics_bp.route('/api/timeseries')
+@conditional_get(personalized=False)
+def timeseries():
+    """Expense totals per category over day/week/month/quarter buckets, as JSON."""
+    filters = {
+        'from_date': request.args.get('from_date', ''),
+        'to_date': request.args.get('to_date', ''),
+        'category': request.args.get('category', ''),
+        'currency': request.args.get('currency', '')
+    }
+    bucket = request.args.get('bucket', 'month')
+    if bucket not in TIME_BUCKETS:
+        return jsonify({'error': f'Unknown bucket: {bucket}', 'buckets': TIME_BUCKETS}), 400
+    tag_name = request.args.get('tag', '')
+    max_points = min(request.args.get('max_points', MAX_CHART_POINTS, type=int), MAX_CHART_POINTS)
+    
+    data = cached('timeseries', {'filters': filters, 'bucket': bucket, 'tag': tag_name, 'max_points': max_points},
+                  lambda: ExpenseTimeSeries.get(filters, bucket, tag_name, max_points))
+    return jsonify(data)
+
+@analytics_bp.route('/api/cache-stats')
+def cache_stats():
+    """Hit/miss counters for this process's response cache."""
+    return jsonify(get_cache_stats())
\ No newline at end of file
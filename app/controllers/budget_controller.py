@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from app.models.budget import Budget
+from app.money import Money
 from app.config import EXPENSE_CATEGORIES, CURRENCIES, DEFAULT_CURRENCY, BUDGET_PERIODS
 
 budget_bp = Blueprint('budget', __name__)
@@ -26,7 +27,7 @@ def manage_budgets():
         else:
             # Create or update budget
             try:
-                amount = float(amount)
+                amount = Money.parse(amount)
                 result = Budget.create_or_update({
                     'category': category,
                     'amount': amount,
@@ -37,7 +38,7 @@ def manage_budgets():
                     flash(f'Budget for {category} created successfully!', 'success')
                 else:
                     flash(f'Budget for {category} updated successfully!', 'success')
-                    
+            
             except ValueError:
                 flash('Invalid amount provided', 'danger')
     
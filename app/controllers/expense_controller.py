@@ -1,12 +1,17 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from app.models.expense import Expense
+from flask import Blueprint, render_template, stream_template, request, redirect, url_for, flash, session, jsonify
+from app.models.expense import Expense, ExpenseStream, SEARCH_MAX_RESULTS
 from app.models.tag import Tag
-from app.config import EXPENSE_CATEGORIES, CURRENCIES, DEFAULT_CURRENCY, RECURRING_INTERVALS
+from app.money import Money
+from app.config import EXPENSE_CATEGORIES, CURRENCIES, DEFAULT_CURRENCY, RECURRING_INTERVALS, EXPENSES_PAGE_SIZE
 from app.utils import parse_tags
+from app.exporters import export_response
+from app.importers import PARSERS, ImportFileError, detect_format, open_upload, import_expenses
+from app.conditional import conditional_get
 
 expense_bp = Blueprint('expense', __name__)
 
 @expense_bp.route('/')
+@conditional_get()
 def index():
     """Home page showing expense list with filters."""
     # Get filter parameters
@@ -23,24 +28,33 @@ def index():
         'to_date': to_date
     }
     
-    # Get expenses based on filters
-    if tag_filter:
-        expenses = Expense.get_by_tag(tag_filter, filters)
+    cursor = request.args.get('cursor', '')
+    show_all = request.args.get('all') == '1'
+    
+    # Get expenses based on filters, one keyset page at a time unless the
+    # full history was requested, in which case it is streamed
+    if show_all:
+        expenses = ExpenseStream(filters, tag_filter)
+        next_cursor = None
     else:
-        expenses = Expense.get_all(filters)
+        page = Expense.paginate(filters, tag_filter, cursor, EXPENSES_PAGE_SIZE)
+        expenses = page['expenses']
+        next_cursor = page['next_cursor']
     
-    # Get expense total
-    total_expenses = Expense.get_total()
+    query_args = request.args.to_dict()
+    query_args.pop('cursor', None)
+    next_url = url_for('expense.index', **dict(query_args, cursor=next_cursor)) if next_cursor else None
+    full_history_url = url_for('expense.index', **dict(query_args, all='1'))
     
-    # Get categories for the filter dropdown
-    with_existing_categories = []
-    existing_categories = set()
+    # Get current currency
+    currency_code = session.get('currency', DEFAULT_CURRENCY)
+    currency = CURRENCIES[currency_code]
     
-    for expense in expenses:
-        existing_categories.add(expense['category'])
+    # Get expense total, converted into the current currency
+    total_expenses = Expense.get_total(currency_code)
     
-    # Merge existing categories with predefined ones
-    with_existing_categories = list(existing_categories)
+    # Merge existing categories with predefined ones for the filter dropdown
+    with_existing_categories = Expense.get_categories()
     for category in EXPENSE_CATEGORIES:
         if category not in with_existing_categories:
             with_existing_categories.append(category)
@@ -48,27 +62,26 @@ def index():
     # Get available tags for the filter dropdown
     tags = Tag.get_names()
     
-    # Get current currency
-    currency_code = session.get('currency', DEFAULT_CURRENCY)
-    currency = CURRENCIES[currency_code]
+    template_args = dict(
+        expenses=expenses,
+        total=total_expenses,
+        categories=sorted(with_existing_categories),
+        tags=tags,
+        search_query=search_query,
+        category_filter=category_filter,
+        tag_filter=tag_filter,
+        from_date=from_date,
+        to_date=to_date,
+        next_url=next_url,
+        full_history_url=None if show_all else full_history_url,
+        currency=currency,
+        currency_code=currency_code
+    )
     
-    # Get expense tags
-    for expense in expenses:
-        expense_tags = Expense.get_tags(expense['id'])
-        expense['tags'] = ','.join(expense_tags)
-    
-    return render_template('index.html', 
-                          expenses=expenses, 
-                          total=total_expenses,
-                          categories=sorted(with_existing_categories),
-                          tags=tags,
-                          search_query=search_query,
-                          category_filter=category_filter,
-                          tag_filter=tag_filter,
-                          from_date=from_date,
-                          to_date=to_date,
-                          currency=currency,
-                          currency_code=currency_code)
+    if show_all:
+        return stream_template('index.html', **template_args)
+    
+    return render_template('index.html', **template_args)
 
 @expense_bp.route('/add', methods=['GET', 'POST'])
 def add_expense():
@@ -78,6 +91,7 @@ def add_expense():
         form_data = {
             'description': request.form.get('description', '').strip(),
             'amount': request.form.get('amount', ''),
+            'currency': request.form.get('currency') or session.get('currency', DEFAULT_CURRENCY),
             'category': request.form.get('category', '').strip(),
             'date': request.form.get('date', ''),
             'recurring': 1 if request.form.get('recurring') else 0,
@@ -91,8 +105,8 @@ def add_expense():
             for error in errors:
                 flash(error, 'danger')
         else:
-            # Try to convert amount to float
-            form_data['amount'] = float(form_data['amount'])
+            # Try to convert amount to Money
+            form_data['amount'] = Money.parse(form_data['amount'], form_data['currency'])
             
             # Parse tags
             tags = parse_tags(request.form.get('tags', ''))
@@ -115,6 +129,7 @@ def add_expense():
                           categories=sorted(EXPENSE_CATEGORIES),
                           currency=currency,
                           currency_code=currency_code,
+                          currencies=CURRENCIES,
                           today=today,
                           tags=Tag.get_names(),
                           recurring_intervals=RECURRING_INTERVALS)
@@ -134,6 +149,7 @@ def edit_expense(id):
         form_data = {
             'description': request.form.get('description', '').strip(),
             'amount': request.form.get('amount', ''),
+            'currency': request.form.get('currency') or expense['currency'],
             'category': request.form.get('category', '').strip(),
             'date': request.form.get('date', ''),
             'recurring': 1 if request.form.get('recurring') else 0,
@@ -147,8 +163,8 @@ def edit_expense(id):
             for error in errors:
                 flash(error, 'danger')
         else:
-            # Try to convert amount to float
-            form_data['amount'] = float(form_data['amount'])
+            # Try to convert amount to Money
+            form_data['amount'] = Money.parse(form_data['amount'], form_data['currency'])
             
             # Parse tags
             tags = parse_tags(request.form.get('tags', ''))
@@ -174,6 +190,7 @@ def edit_expense(id):
                           categories=sorted(EXPENSE_CATEGORIES),
                           currency=currency,
                           currency_code=currency_code,
+                          currencies=CURRENCIES,
                           all_tags=Tag.get_names(),
                           recurring_intervals=RECURRING_INTERVALS)
 
@@ -184,13 +201,62 @@ def delete_expense(id):
     flash('Expense deleted successfully!', 'success')
     return redirect(url_for('expense.index'))
 
+@expense_bp.route('/api/search', methods=['GET'])
+@conditional_get(personalized=False)
+def search_expenses():
+    """Ranked full-text search over expense descriptions and tags."""
+    term = request.args.get('q', '').strip()
+    if not term:
+        return jsonify([])
+    
+    filters = {
+        'category': request.args.get('category', ''),
+        'from_date': request.args.get('from_date', ''),
+        'to_date': request.args.get('to_date', '')
+    }
+    
+    limit = max(1, min(request.args.get('limit', 20, type=int), SEARCH_MAX_RESULTS))
+    
+    expenses = Expense.with_tags(Expense.search(term, filters, limit=limit))
+    return jsonify(expenses)
+
+@expense_bp.route('/import', methods=['POST'])
+def import_data():
+    """Import expenses from an uploaded CSV or OFX file."""
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Please choose a file to import', 'danger')
+        return redirect(url_for('expense.index'))
+    
+    parser = PARSERS[detect_format(upload.filename)]
+    try:
+        summary = import_expenses(parser(open_upload(upload)))
+    except ImportFileError as exc:
+        flash(f'Could not import {upload.filename}: {exc}', 'danger')
+        return redirect(url_for('expense.index'))
+    
+    flash(f"Imported {summary['imported']} expenses", 'success')
+    if summary['skipped']:
+        flash(f"Skipped {summary['skipped']} invalid rows", 'warning')
+    
+    return redirect(url_for('expense.index'))
+
 @expense_bp.route('/export', methods=['GET'])
 def export_data():
-    """Export expense data."""
+    """Export expense data as a streamed CSV, JSON or NDJSON download."""
     format_type = request.args.get('format', 'json')
     
-    # This should return a JSON response with all expenses
-    # Can be implemented later
+    filters = {
+        'category': request.args.get('category', ''),
+        'from_date': request.args.get('from_date', ''),
+        'to_date': request.args.get('to_date', '')
+    }
+    
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    response = export_response(format_type, filters, use_gzip)
+    
+    if response is None:
+        flash('Unsupported export format', 'danger')
+        return redirect(url_for('expense.index'))
     
-    flash('Export feature coming soon!', 'info')
-    return redirect(url_for('expense.index')) 
\ No newline at end of file
+    return response
\ No newline at end of file
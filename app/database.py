@@ -1,16 +1,140 @@
+import queue
 import sqlite3
+import threading
 from contextlib import contextmanager
-from app.config import DATABASE_PATH
+from flask import g, has_app_context
+from app.migrations import migrate
+from app.profiling import connection_factory
+from app.money import Money, adapt_money, convert_money
+from app.config import DATABASE_PATH, DB_POOL_SIZE, SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE
+
+# Money is bound as integer minor units and MONEY columns come back as Money
+sqlite3.register_adapter(Money, adapt_money)
+sqlite3.register_converter('MONEY', convert_money)
+
+def _open_connection(database):
+    """Open a new SQLite connection with the application's pragmas applied."""
+    # Pooled connections are handed between threads, one borrower at a time
+    # Declared types convert MONEY columns; "total [MONEY]" aliases convert aggregates
+    conn = sqlite3.connect(database, check_same_thread=False, factory=connection_factory(),
+                           detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA cache_size = {int(SQLITE_CACHE_SIZE)}')
+    conn.execute(f'PRAGMA mmap_size = {int(SQLITE_MMAP_SIZE)}')
+    return conn
+
+class ConnectionPool:
+    """Bounded pool of reusable SQLite connections."""
+    
+    def __init__(self, database, max_size):
+        self.database = database
+        self.max_size = max_size
+        self._idle = queue.LifoQueue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def acquire(self):
+        """Take an idle connection from the pool, opening a new one if none is free."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self.misses += 1
+            return _open_connection(self.database)
+        
+        with self._lock:
+            self.hits += 1
+        return conn
+    
+    def release(self, conn):
+        """Return a connection to the pool, closing it if the pool is full."""
+        try:
+            # Discard anything the borrower left uncommitted
+            conn.rollback()
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
+    
+    def close_all(self):
+        """Close every idle connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+    
+    def stats(self):
+        """Get pool usage counters."""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'idle': self._idle.qsize(),
+            'max_size': self.max_size
+        }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Get the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE_PATH, DB_POOL_SIZE)
+    return _pool
+
+def reset_pool():
+    """Close pooled connections so the next use reopens them (e.g. after changing DATABASE_PATH)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = None
+
+def get_pool_stats():
+    """Get hit/miss counters for the connection pool."""
+    return get_pool().stats()
 
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
+    """Context manager for database connections.
+    
+    Inside an app context the connection is borrowed once per request and
+    kept on ``g`` until teardown; elsewhere it is returned to the pool on exit.
+    """
+    if has_app_context():
+        if '_db_conn' not in g:
+            g._db_conn = get_pool().acquire()
+        yield g._db_conn
+        return
+    
+    pool = get_pool()
+    conn = pool.acquire()
     try:
         yield conn
     finally:
-        conn.close()
+        pool.release(conn)
+
+def close_db(exception=None):
+    """Return the request's connection to the pool."""
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        get_pool().release(conn)
+
+def get_last_expense_id(conn):
+    """Get the last ID handed out by the expenses AUTOINCREMENT sequence."""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'expenses'").fetchone()
+    return row[0] if row else 0
+
+def init_app(app):
+    """Register database teardown handling on the Flask app."""
+    app.teardown_appcontext(close_db)
 
 def init_db():
     """Initialize the database with required tables."""
@@ -20,7 +144,7 @@ def init_db():
             CREATE TABLE IF NOT EXISTS expenses (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 description TEXT NOT NULL,
-                amount REAL NOT NULL,
+                amount MONEY NOT NULL,
                 category TEXT NOT NULL,
                 date TEXT NOT NULL,
                 recurring INTEGER DEFAULT 0,
@@ -33,7 +157,7 @@ def init_db():
             CREATE TABLE IF NOT EXISTS budgets (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 category TEXT NOT NULL UNIQUE,
-                amount REAL NOT NULL,
+                amount MONEY NOT NULL,
                 period TEXT NOT NULL
             )
         ''')
@@ -58,6 +182,9 @@ def init_db():
         ''')
         
         conn.commit()
+        
+        # Bring indexes and later schema changes up to date
+        migrate(conn)
 
 def dict_factory(cursor, row):
     """Convert database row objects to dictionaries."""
@@ -65,6 +192,6 @@ def dict_factory(cursor, row):
 
 def get_dict_connection():
     """Get a connection that returns results as dictionaries."""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = _open_connection(DATABASE_PATH)
     conn.row_factory = dict_factory
     return conn 
\ No newline at end of file
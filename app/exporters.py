@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+from itertools import chain
+import zlib
+from flask import Response, stream_with_context
+from app.models.expense import Expense
+from app.money import MoneyJSONProvider
+
+# Columns written by the CSV exporter, in order
+EXPORT_FIELDS = ['id', 'date', 'description', 'amount', 'currency', 'category', 'tags', 'recurring', 'recurring_interval']
+
+# Number of rows serialized into each chunk sent to the client
+CHUNK_ROWS = 500
+
+def _chunked(lines):
+    """Group serialized lines into larger chunks to cut per-write overhead."""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= CHUNK_ROWS:
+            yield ''.join(buffer)
+            buffer = []
+    
+    if buffer:
+        yield ''.join(buffer)
+
+def csv_lines(expenses):
+    """Serialize expenses as CSV lines, header first."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    
+    rows = chain(
+        [EXPORT_FIELDS],
+        ([','.join(expense['tags']) if field == 'tags' else expense[field] for field in EXPORT_FIELDS]
+         for expense in expenses)
+    )
+    for row in rows:
+        writer.writerow(row)
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate()
+
+def json_lines(expenses):
+    """Serialize expenses as one JSON array, one element per line."""
+    yield '['
+    separator = '\n'
+    for expense in expenses:
+        yield separator + json.dumps(expense, default=MoneyJSONProvider.default)
+        separator = ',\n'
+    yield '\n]\n'
+
+def ndjson_lines(expenses):
+    """Serialize expenses as newline-delimited JSON."""
+    for expense in expenses:
+        yield json.dumps(expense, default=MoneyJSONProvider.default) + '\n'
+
+def gzip_stream(chunks):
+    """Gzip-compress a stream of text chunks on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+EXPORT_FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'json': (json_lines, 'application/json'),
+    'ndjson': (ndjson_lines, 'application/x-ndjson')
+}
+
+def export_response(format_type, filters=None, use_gzip=False):
+    """Build a streaming export response, or None if the format is unsupported."""
+    if format_type not in EXPORT_FORMATS:
+        return None
+    
+    serializer, mimetype = EXPORT_FORMATS[format_type]
+    chunks = _chunked(serializer(Expense.iter_export(filters)))
+    
+    headers = {'Content-Disposition': f'attachment; filename=expenses.{format_type}'}
+    if use_gzip:
+        chunks = gzip_stream(chunks)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
@@ -0,0 +1,231 @@
+"""Exchange rates for reporting amounts of several currencies in one.
+
+Rates come from a local CSV file (FX_RATES_PATH, never fetched over the
+network) with a date,currency,rate header, where rate is the value of one
+unit of the currency in FX_BASE_CURRENCY. They are held in memory as one
+date-sorted pair of arrays (quote dates, rates) per currency, so the rate
+in effect on a day is a binary search.
+
+An amount converts at the rate in effect on the first day of its month,
+the granularity of the monthly rollup, so every aggregate path gives the
+same answer; before a currency's first quote that quote applies. A
+currency without any quote (including every currency but the base when
+there is no rates file) converts at face value: one major unit for one
+major unit of the base, as amounts were shown before rates were kept. So
+no amount is ever dropped from a converted total or counted without being
+summed, whichever aggregate path reads it.
+
+The rates are mirrored into the fx_rates table whenever the file changes,
+so aggregate queries convert in bulk inside SQLite (convert_sql) instead
+of row by row in Python; the in-memory arrays serve single conversions
+and the vectorized analytics snapshot.
+"""
+import bisect
+import csv
+import hashlib
+import io
+import os
+import threading
+from datetime import date, datetime
+import numpy as np
+from app.database import get_pool
+from app.migrations import bump_data_version
+from app.money import Money, currency_decimals
+from app.config import CURRENCIES, DEFAULT_CURRENCY, DATE_FORMAT, FX_RATES_PATH, FX_BASE_CURRENCY
+
+# Quote date of the base currency's constant rate in the fx_rates table
+_BASE_DAY = '0000-01-01'
+
+# Rate of a currency in effect on a day, falling back to its first quote, then to face value
+_RATE_SQL = '''COALESCE(
+    (SELECT minor_rate FROM fx_rates WHERE currency = {currency} AND day <= {day} ORDER BY day DESC LIMIT 1),
+    (SELECT minor_rate FROM fx_rates WHERE currency = {currency} ORDER BY day LIMIT 1),
+    {face_value})'''
+
+def _face_value(currency, base):
+    """Get the face value rate of currency: base minor units per minor unit at 1:1 in major units."""
+    return 10.0 ** (currency_decimals(base) - currency_decimals(currency))
+
+def _face_value_sql(currency, base):
+    """Get an SQL expression for the face value rate of a currency expression."""
+    cases = ''.join(
+        f" WHEN '{code}' THEN {_face_value(code, base)!r}"
+        for code in CURRENCIES if _face_value(code, base) != 1.0
+    )
+    fallback = repr(_face_value(None, base))
+    return f'CASE {currency}{cases} ELSE {fallback} END' if cases else fallback
+
+def target_currency(filters):
+    """Get the currency aggregates over filters are reported in: filters['currency'] or the default."""
+    currency = (filters or {}).get('currency')
+    return currency if currency in CURRENCIES else DEFAULT_CURRENCY
+
+def _month_start(day):
+    """Get the ordinal of the first day of the month of a date or YYYY-MM[-DD] string."""
+    if isinstance(day, str):
+        return date(int(day[:4]), int(day[5:7]), 1).toordinal()
+    return day.replace(day=1).toordinal()
+
+class FxRates:
+    """Date-indexed exchange rates, in base minor units per minor unit of each currency."""
+    
+    def __init__(self, quotes=(), base=FX_BASE_CURRENCY, fingerprint=''):
+        """Build the table from (date, currency, rate) quotes; a later quote for the same day wins."""
+        series = {}
+        for day, currency, rate in quotes:
+            if currency != base:
+                series.setdefault(currency, {})[day.toordinal()] = rate
+        
+        self.base = base
+        self.fingerprint = fingerprint
+        self._days = {}
+        self._rates = {}
+        for currency, quoted in series.items():
+            days = sorted(quoted)
+            # Per minor unit, so conversions need no per-currency scaling
+            scale = 10 ** (currency_decimals(base) - currency_decimals(currency))
+            self._days[currency] = np.array(days, np.int64)
+            self._rates[currency] = np.array([quoted[day] * scale for day in days], np.float64)
+    
+    @classmethod
+    def load(cls, path=FX_RATES_PATH, base=FX_BASE_CURRENCY):
+        """Read a rates file; a missing file gives a table that only knows the base currency.
+        
+        Raises ValueError naming the line of a malformed quote.
+        """
+        try:
+            with open(path, 'rb') as handle:
+                data = handle.read()
+        except FileNotFoundError:
+            data = b''
+        
+        quotes = []
+        for line_number, row in enumerate(csv.DictReader(io.StringIO(data.decode('utf-8-sig'))), start=2):
+            try:
+                quote = (
+                    datetime.strptime(row['date'].strip(), DATE_FORMAT).date(),
+                    row['currency'].strip().upper(),
+                    float(row['rate'])
+                )
+            except (AttributeError, KeyError, ValueError):
+                raise ValueError(f'{path}, line {line_number}: expected date,currency,rate') from None
+            if not quote[2] > 0:
+                raise ValueError(f'{path}, line {line_number}: rate must be positive')
+            quotes.append(quote)
+        
+        return cls(quotes, base, hashlib.sha1(base.encode() + b'\n' + data).hexdigest())
+    
+    def minor_rate(self, currency, day):
+        """Get what one minor unit of currency is worth in base minor units in day's month."""
+        if currency == self.base:
+            return 1.0
+        days = self._days.get(currency)
+        if days is None:
+            return _face_value(currency, self.base)
+        index = bisect.bisect_right(days, _month_start(day)) - 1
+        return float(self._rates[currency][max(index, 0)])
+    
+    def minor_rates(self, currency, month_starts):
+        """Vectorized minor_rate over an array of month start ordinals."""
+        if currency == self.base:
+            return np.ones(len(month_starts))
+        days = self._days.get(currency)
+        if days is None:
+            return np.full(len(month_starts), _face_value(currency, self.base))
+        index = np.searchsorted(days, month_starts, 'right') - 1
+        return self._rates[currency][np.maximum(index, 0)]
+    
+    def convert(self, money, currency, day):
+        """Convert Money into currency at the rate of day's month."""
+        if money.currency == currency:
+            return money
+        source = self.minor_rate(money.currency, day)
+        target = self.minor_rate(currency, day)
+        return Money(money.minor * source / target, currency)
+    
+    def convert_sql(self, amount, currency, month, target):
+        """Get an SQL expression converting amount into minor units of target.
+        
+        amount is in minor units of the currency expression and month is an
+        expression giving its YYYY-MM. Amounts already in target pass through
+        as integers; others are scaled by the ratio of the two rates in the
+        fx_rates table, at face value for a currency without quotes, and stay
+        REAL until the caller rounds the aggregate; the result is never NULL.
+        target is inlined as a literal, so it must be one of CURRENCIES. Column references must be qualified
+        with their table: they end up inside subqueries on fx_rates, whose
+        own currency and day columns would shadow bare names.
+        """
+        if target not in CURRENCIES:
+            raise ValueError(f'Unknown currency: {target!r}')
+        
+        day = f"{month} || '-01'"
+        rate = _RATE_SQL.format(currency=currency, day=day, face_value=_face_value_sql(currency, self.base))
+        if target == self.base:
+            return f"CASE WHEN {currency} = '{target}' THEN {amount} ELSE {amount} * {rate} END"
+        
+        target_rate = _RATE_SQL.format(currency=f"'{target}'", day=day, face_value=_face_value(target, self.base))
+        return f"CASE WHEN {currency} = '{target}' THEN {amount} ELSE {amount} * {rate} / {target_rate} END"
+    
+    def rows(self):
+        """Get (currency, day, minor_rate) rows for the fx_rates table."""
+        yield self.base, _BASE_DAY, 1.0
+        for currency, days in self._days.items():
+            for ordinal, rate in zip(days.tolist(), self._rates[currency].tolist()):
+                yield currency, date.fromordinal(ordinal).isoformat(), rate
+
+def _sync(rates):
+    """Mirror rates into the fx_rates table unless it already holds this version of the file."""
+    pool = get_pool()
+    # A connection of its own: the caller's may be in the middle of a transaction
+    conn = pool.acquire()
+    try:
+        row = conn.execute('SELECT fingerprint FROM fx_rate_source WHERE id = 1').fetchone()
+        if row and row[0] == rates.fingerprint:
+            return
+        
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM fx_rates')
+            conn.executemany('INSERT INTO fx_rates (currency, day, minor_rate) VALUES (?, ?, ?)', rates.rows())
+            conn.execute('''
+                INSERT INTO fx_rate_source (id, fingerprint) VALUES (1, ?)
+                ON CONFLICT (id) DO UPDATE SET fingerprint = excluded.fingerprint
+            ''', (rates.fingerprint,))
+            # Cached aggregates were converted with the old rates
+            bump_data_version(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        pool.release(conn)
+
+def _file_stamp():
+    """Get (mtime, size) of the rates file, or None if it does not exist."""
+    try:
+        stat = os.stat(FX_RATES_PATH)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+_rates = None
+_rates_stamp = None
+_rates_lock = threading.Lock()
+
+def get_fx_rates():
+    """Get the process-wide rate table, reloading it (and fx_rates) when the rates file changes."""
+    global _rates, _rates_stamp
+    stamp = _file_stamp()
+    if _rates is None or stamp != _rates_stamp:
+        with _rates_lock:
+            if _rates is None or stamp != _rates_stamp:
+                rates = FxRates.load(FX_RATES_PATH)
+                _sync(rates)
+                _rates, _rates_stamp = rates, stamp
+    return _rates
+
+def init_fx(app):
+    """Pick up edits to the rates file before each request, so cached responses are invalidated."""
+    @app.before_request
+    def refresh_fx_rates():
+        get_fx_rates()
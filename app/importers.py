@@ -0,0 +1,231 @@
+import csv
+import io
+import re
+from datetime import datetime
+from app.database import get_db_connection, get_last_expense_id
+from app.migrations import apply_derived_rows, bump_data_version
+from app.models.expense import Expense
+from app.config import DATE_FORMAT, DEFAULT_CURRENCY
+from app.money import Money
+from app.utils import parse_tags
+
+# Number of rows written per executemany call
+IMPORT_BATCH_SIZE = 5000
+
+# Category given to imported rows that do not name one (e.g. bank statements)
+DEFAULT_IMPORT_CATEGORY = 'Miscellaneous'
+
+# Maximum number of row errors kept in the import summary
+MAX_REPORTED_ERRORS = 20
+
+_OFX_FIELD = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+class ImportFileError(ValueError):
+    """An upload that cannot be read at all: not UTF-8 text, or malformed CSV."""
+
+def parse_csv(lines):
+    """Parse CSV lines into expense records, one at a time.
+    
+    Expects a header row with at least date, description and amount columns;
+    currency, category, tags, recurring and recurring_interval are optional. Files
+    produced by the CSV export can be imported back as they are.
+    """
+    reader = csv.reader(lines)
+    header = [name.strip().lower() for name in next(reader, [])]
+    columns = {name: index for index, name in enumerate(header)}
+    
+    def column(row, name):
+        index = columns.get(name)
+        return row[index].strip() if index is not None and index < len(row) else ''
+    
+    for row in reader:
+        if not row:
+            continue
+        
+        yield {
+            'description': column(row, 'description'),
+            'amount': column(row, 'amount'),
+            'currency': column(row, 'currency').upper() or DEFAULT_CURRENCY,
+            'category': column(row, 'category') or DEFAULT_IMPORT_CATEGORY,
+            'date': column(row, 'date'),
+            'tags': parse_tags(column(row, 'tags')),
+            'recurring': 1 if column(row, 'recurring').lower() in ('1', 'true', 'yes') else 0,
+            'recurring_interval': column(row, 'recurring_interval') or None
+        }
+
+def parse_ofx(lines):
+    """Parse an OFX/QFX bank statement into expense records, one at a time.
+    
+    Only debit transactions (negative TRNAMT) are expenses; credits are skipped.
+    Amounts are in the statement's CURDEF currency.
+    """
+    transaction = None
+    currency = DEFAULT_CURRENCY
+    for line in lines:
+        for tag, value in _OFX_FIELD.findall(line):
+            tag = tag.upper()
+            if tag == 'CURDEF' and value.strip():
+                currency = value.strip().upper()
+            elif tag == 'STMTTRN':
+                transaction = {}
+            elif transaction is not None and value:
+                transaction[tag] = value.strip()
+        
+        if transaction is not None and '</STMTTRN>' in line.upper():
+            record = _ofx_record(transaction, currency)
+            transaction = None
+            if record:
+                yield record
+
+def _ofx_record(transaction, currency):
+    """Convert one parsed STMTTRN block into an expense record, or None for credits."""
+    try:
+        amount = float(transaction.get('TRNAMT', ''))
+    except ValueError:
+        amount = None
+    
+    if amount is not None and amount >= 0:
+        return None
+    
+    posted = transaction.get('DTPOSTED', '')[:8]
+    try:
+        date = datetime.strptime(posted, '%Y%m%d').strftime(DATE_FORMAT)
+    except ValueError:
+        date = posted
+    
+    return {
+        'description': transaction.get('NAME') or transaction.get('MEMO', ''),
+        'amount': str(-amount) if amount is not None else transaction.get('TRNAMT', ''),
+        'currency': currency,
+        'category': DEFAULT_IMPORT_CATEGORY,
+        'date': date,
+        'tags': [],
+        'recurring': 0,
+        'recurring_interval': None
+    }
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx
+}
+
+def detect_format(filename):
+    """Guess the import format from a file name."""
+    return 'ofx' if filename.lower().endswith(('.ofx', '.qfx')) else 'csv'
+
+def open_upload(file_storage):
+    """Wrap an uploaded file so it can be parsed line by line without reading it whole."""
+    return io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', newline='')
+
+def _suspend_triggers(conn, tables):
+    """Drop the triggers on tables and return their SQL so they can be recreated.
+    
+    Only safe inside a transaction: if it rolls back the triggers come back with it.
+    """
+    placeholders = ','.join('?' * len(tables))
+    triggers = conn.execute(f'''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'trigger' AND tbl_name IN ({placeholders})
+    ''', tables).fetchall()
+    
+    for trigger in triggers:
+        conn.execute(f'DROP TRIGGER "{trigger["name"]}"')
+    
+    return [trigger['sql'] for trigger in triggers]
+
+def _flush(conn, batch, tag_ids):
+    """Insert one batch of validated records and their tag links."""
+    conn.executemany('''
+        INSERT INTO expenses (description, amount, currency, category, date, recurring, recurring_interval)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (record['description'], record['amount'], record['currency'], record['category'], record['date'],
+         record['recurring'], record['recurring_interval'])
+        for record in batch
+    ])
+    
+    if not any(record['tags'] for record in batch):
+        return
+    
+    # The write lock is held for the whole import, so the batch received
+    # consecutive IDs ending at the current AUTOINCREMENT value
+    first_id = get_last_expense_id(conn) - len(batch) + 1
+    
+    links = []
+    for expense_id, record in enumerate(batch, start=first_id):
+        for tag_name in record['tags']:
+            if tag_name not in tag_ids:
+                tag_ids[tag_name] = conn.execute('INSERT INTO tags (name) VALUES (?)', (tag_name,)).lastrowid
+            links.append((expense_id, tag_ids[tag_name]))
+    
+    conn.executemany('INSERT OR IGNORE INTO expense_tags (expense_id, tag_id) VALUES (?, ?)', links)
+
+def import_expenses(records, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """Validate and insert expense records in one transaction.
+    
+    Records failing Expense.validate are skipped and reported. Rows are
+    written with executemany in batches of batch_size; progress, if given,
+    is called with the running count of imported rows after every batch.
+    The per-row rollup, search and data version triggers are suspended for
+    the load and the imported range is folded into those tables in one pass
+    at the end.
+    Returns a summary dict with 'imported', 'skipped' and 'errors'.
+    Raises ImportFileError, with nothing imported, if the file itself
+    cannot be decoded or parsed.
+    """
+    summary = {'imported': 0, 'skipped': 0, 'errors': []}
+    
+    with get_db_connection() as conn:
+        # Take the write lock up front so the import cannot interleave with other writers
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            first_id = get_last_expense_id(conn) + 1
+            triggers = _suspend_triggers(conn, ('expenses', 'expense_tags'))
+            
+            tag_ids = {row['name']: row['id'] for row in conn.execute('SELECT id, name FROM tags')}
+            
+            batch = []
+            for line_number, record in enumerate(records, start=1):
+                errors = Expense.validate(record)
+                if errors:
+                    summary['skipped'] += 1
+                    if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                        summary['errors'].append({'row': line_number, 'errors': errors})
+                    continue
+                
+                record['currency'] = record.get('currency') or DEFAULT_CURRENCY
+                record['amount'] = Money.parse(record['amount'], record['currency'])
+                batch.append(record)
+                
+                if len(batch) >= batch_size:
+                    _flush(conn, batch, tag_ids)
+                    summary['imported'] += len(batch)
+                    batch = []
+                    if progress:
+                        progress(summary['imported'])
+            
+            if batch:
+                _flush(conn, batch, tag_ids)
+                summary['imported'] += len(batch)
+                if progress:
+                    progress(summary['imported'])
+            
+            if summary['imported']:
+                apply_derived_rows(conn, first_id, get_last_expense_id(conn))
+                bump_data_version(conn)
+            
+            for trigger_sql in triggers:
+                conn.execute(trigger_sql)
+            
+            conn.commit()
+        except UnicodeDecodeError:
+            conn.rollback()
+            raise ImportFileError('The file is not UTF-8 text') from None
+        except csv.Error as exc:
+            conn.rollback()
+            raise ImportFileError(f'The file is not valid CSV: {exc}') from None
+        except Exception:
+            conn.rollback()
+            raise
+    
+    return summary
@@ -0,0 +1,218 @@
+"""Prometheus metrics for request latency, the database and the caches.
+
+init_metrics registers request hooks and a /metrics endpoint in the text
+exposition format. Request counters are sharded per thread: each thread
+only ever writes its own shard, so recording a request takes no lock and
+threads never wait on each other. A scrape sums the shards. Database
+gauges (pages, WAL size, row counts) and the pool and response cache
+counters are read when scraped.
+
+Every worker process keeps its own counters, so a scrape sees the worker
+that answered it; the 'pid' label tells the series apart.
+"""
+import os
+import threading
+import time
+from flask import Response, g, request
+from app.cache import get_cache_stats
+from app.database import get_db_connection, get_pool_stats
+from app.config import DATABASE_PATH, METRICS_ENABLED
+
+# Upper bounds of the request latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class _Shard:
+    """Counters written by a single thread."""
+    
+    __slots__ = ('requests', 'latency', 'exceptions', 'in_flight')
+    
+    def __init__(self):
+        # (endpoint, method, status) -> count
+        self.requests = {}
+        # (endpoint, method) -> [count per bucket..., +Inf count, sum of seconds]
+        self.latency = {}
+        # endpoint -> count
+        self.exceptions = {}
+        self.in_flight = 0
+
+class RequestMetrics:
+    """Request counters sharded per thread and merged on read."""
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+    
+    def _shard(self):
+        """Get the calling thread's shard; only registering a new thread takes the lock."""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+    
+    def started(self):
+        self._shard().in_flight += 1
+    
+    def finished(self):
+        self._shard().in_flight -= 1
+    
+    def observe(self, endpoint, method, status, seconds):
+        """Count a finished request and add its latency to the histogram."""
+        shard = self._shard()
+        key = (endpoint, method, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        
+        values = shard.latency.get((endpoint, method))
+        if values is None:
+            values = shard.latency[(endpoint, method)] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                values[index] += 1
+        values[-2] += 1
+        values[-1] += seconds
+    
+    def exception(self, endpoint):
+        shard = self._shard()
+        shard.exceptions[endpoint] = shard.exceptions.get(endpoint, 0) + 1
+    
+    def collect(self):
+        """Sum every shard into (requests, latency, exceptions, in_flight)."""
+        with self._lock:
+            shards = list(self._shards)
+        
+        requests, latency, exceptions, in_flight = {}, {}, {}, 0
+        for shard in shards:
+            # dict.copy() and list() are atomic under the GIL, so the owner thread may keep writing
+            for key, count in shard.requests.copy().items():
+                requests[key] = requests.get(key, 0) + count
+            for key, values in shard.latency.copy().items():
+                total = latency.setdefault(key, [0] * len(values))
+                for index, value in enumerate(list(values)):
+                    total[index] += value
+            for key, count in shard.exceptions.copy().items():
+                exceptions[key] = exceptions.get(key, 0) + count
+            in_flight += shard.in_flight
+        
+        return requests, latency, exceptions, in_flight
+
+_metrics = RequestMetrics()
+
+def _labels(**labels):
+    """Format a label set, escaping values as the exposition format requires."""
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+def _database_stats():
+    """Get page, WAL and row-count gauges for the SQLite database."""
+    with get_db_connection() as conn:
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        # The rollup holds the expense count without scanning the table
+        rows = {
+            'expenses': conn.execute('SELECT COALESCE(SUM(count), 0) FROM expense_monthly_rollup').fetchone()[0],
+            'budgets': conn.execute('SELECT COUNT(*) FROM budgets').fetchone()[0],
+            'tags': conn.execute('SELECT COUNT(*) FROM tags').fetchone()[0]
+        }
+    
+    try:
+        wal_size = os.path.getsize(DATABASE_PATH + '-wal')
+    except OSError:
+        wal_size = 0
+    
+    return {'page_count': page_count, 'page_size': page_size, 'freelist': freelist,
+            'wal_size': wal_size, 'rows': rows}
+
+def render_metrics():
+    """Render every metric in the Prometheus text exposition format."""
+    requests, latency, exceptions, in_flight = _metrics.collect()
+    pid = os.getpid()
+    lines = []
+    
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for suffix, labels, value in samples:
+            lines.append(f'{name}{suffix}{_labels(pid=pid, **labels)} {value}')
+    
+    metric('http_requests_total', 'counter', 'Requests served, by endpoint, method and status.', [
+        ('', {'endpoint': endpoint, 'method': method, 'status': status}, count)
+        for (endpoint, method, status), count in sorted(requests.items())
+    ])
+    
+    samples = []
+    for (endpoint, method), values in sorted(latency.items()):
+        for bound, count in zip(LATENCY_BUCKETS, values):
+            samples.append(('_bucket', {'endpoint': endpoint, 'method': method, 'le': bound}, count))
+        samples.append(('_bucket', {'endpoint': endpoint, 'method': method, 'le': '+Inf'}, values[-2]))
+        samples.append(('_sum', {'endpoint': endpoint, 'method': method}, round(values[-1], 6)))
+        samples.append(('_count', {'endpoint': endpoint, 'method': method}, values[-2]))
+    metric('http_request_duration_seconds', 'histogram', 'Request latency, by endpoint and method.', samples)
+    
+    metric('http_request_exceptions_total', 'counter', 'Requests that raised an unhandled exception.', [
+        ('', {'endpoint': endpoint}, count) for endpoint, count in sorted(exceptions.items())
+    ])
+    metric('http_requests_in_flight', 'gauge', 'Requests currently being served.', [('', {}, in_flight)])
+    
+    database = _database_stats()
+    metric('sqlite_page_count', 'gauge', 'Pages in the main database file.', [('', {}, database['page_count'])])
+    metric('sqlite_page_size_bytes', 'gauge', 'Database page size.', [('', {}, database['page_size'])])
+    metric('sqlite_freelist_pages', 'gauge', 'Unused pages in the main database file.', [('', {}, database['freelist'])])
+    metric('sqlite_wal_size_bytes', 'gauge', 'Size of the write-ahead log file.', [('', {}, database['wal_size'])])
+    metric('sqlite_table_rows', 'gauge', 'Rows per table.', [
+        ('', {'table': table}, count) for table, count in database['rows'].items()
+    ])
+    
+    pool = get_pool_stats()
+    metric('db_pool_acquires_total', 'counter', 'Pool checkouts, by whether an idle connection was reused.', [
+        ('', {'result': 'hit'}, pool['hits']),
+        ('', {'result': 'miss'}, pool['misses'])
+    ])
+    metric('db_pool_idle_connections', 'gauge', 'Idle pooled connections.', [('', {}, pool['idle'])])
+    
+    cache = get_cache_stats()
+    metric('response_cache_lookups_total', 'counter', 'Response cache lookups, by result.', [
+        ('', {'result': 'hit'}, cache['hits']),
+        ('', {'result': 'shared_hit'}, cache['shared_hits']),
+        ('', {'result': 'miss'}, cache['misses'])
+    ])
+    metric('response_cache_hit_ratio', 'gauge', 'Share of response cache lookups answered from a cache.',
+           [('', {}, cache['hit_ratio'])])
+    metric('response_cache_entries', 'gauge', 'Entries in the in-process response cache.', [('', {}, cache['entries'])])
+    
+    return '\n'.join(lines) + '\n'
+
+def init_metrics(app):
+    """Register the request hooks and the /metrics endpoint; does nothing unless METRICS_ENABLED."""
+    if not METRICS_ENABLED:
+        return
+    
+    @app.before_request
+    def start_request_timer():
+        g._metrics_start = time.perf_counter()
+        _metrics.started()
+    
+    @app.after_request
+    def record_request(response):
+        start = g.get('_metrics_start')
+        if start is not None:
+            _metrics.observe(request.endpoint or 'unmatched', request.method,
+                             response.status_code, time.perf_counter() - start)
+        return response
+    
+    @app.teardown_request
+    def finish_request(exception=None):
+        if g.pop('_metrics_start', None) is None:
+            return
+        _metrics.finished()
+        if exception is not None:
+            _metrics.exception(request.endpoint or 'unmatched')
+    
+    app.add_url_rule('/metrics', 'metrics', lambda: Response(render_metrics(), content_type=CONTENT_TYPE))
@@ -0,0 +1,724 @@
+"""Versioned schema migrations tracked through SQLite's ``PRAGMA user_version``.
+
+Each migration is a function that receives an open connection and is run
+inside its own transaction. Append new migrations to ``MIGRATIONS``; never
+reorder or edit ones that have already shipped.
+"""
+import re
+import sqlite3
+from app.config import CURRENCIES, DEFAULT_CURRENCY
+
+# Change log entries kept for incremental readers; older ones are pruned
+CHANGE_LOG_LIMIT = 100000
+
+def _add_secondary_indexes(conn):
+    """Index the columns used by expense filters and tag lookups."""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_expenses_category_date ON expenses (category, date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_expense_tags_tag ON expense_tags (tag_id, expense_id)')
+
+def _add_expense_rollups(conn):
+    """Add per-day and per-month category rollups kept current by triggers."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS expense_daily_rollup (
+            day TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            max_amount REAL,
+            PRIMARY KEY (day, category)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS expense_monthly_rollup (
+            month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            max_amount REAL,
+            PRIMARY KEY (month, category)
+        )
+    ''')
+    
+    add_new = '''
+        INSERT INTO expense_daily_rollup (day, category, total, count, max_amount)
+        VALUES (NEW.date, NEW.category, NEW.amount, 1, NEW.amount)
+        ON CONFLICT (day, category) DO UPDATE SET
+            total = total + excluded.total,
+            count = count + 1,
+            max_amount = MAX(max_amount, excluded.max_amount);
+        INSERT INTO expense_monthly_rollup (month, category, total, count, max_amount)
+        VALUES (substr(NEW.date, 1, 7), NEW.category, NEW.amount, 1, NEW.amount)
+        ON CONFLICT (month, category) DO UPDATE SET
+            total = total + excluded.total,
+            count = count + 1,
+            max_amount = MAX(max_amount, excluded.max_amount);
+    '''
+    
+    # Removing the largest amount forces the max to be recomputed from the
+    # remaining rows; the daily rollup is fixed first so the month can use it
+    remove_old = '''
+        UPDATE expense_daily_rollup
+        SET total = total - OLD.amount, count = count - 1
+        WHERE day = OLD.date AND category = OLD.category;
+        DELETE FROM expense_daily_rollup
+        WHERE day = OLD.date AND category = OLD.category AND count <= 0;
+        UPDATE expense_daily_rollup
+        SET max_amount = (
+            SELECT MAX(amount) FROM expenses
+            WHERE category = OLD.category AND date = OLD.date
+        )
+        WHERE day = OLD.date AND category = OLD.category AND max_amount <= OLD.amount;
+        UPDATE expense_monthly_rollup
+        SET total = total - OLD.amount, count = count - 1
+        WHERE month = substr(OLD.date, 1, 7) AND category = OLD.category;
+        DELETE FROM expense_monthly_rollup
+        WHERE month = substr(OLD.date, 1, 7) AND category = OLD.category AND count <= 0;
+        UPDATE expense_monthly_rollup
+        SET max_amount = (
+            SELECT MAX(max_amount) FROM expense_daily_rollup
+            WHERE day >= substr(OLD.date, 1, 7) || '-01'
+              AND day <= substr(OLD.date, 1, 7) || '-31'
+              AND category = OLD.category
+        )
+        WHERE month = substr(OLD.date, 1, 7) AND category = OLD.category
+          AND max_amount <= OLD.amount;
+    '''
+    
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_insert
+        AFTER INSERT ON expenses
+        BEGIN
+            {add_new}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_delete
+        AFTER DELETE ON expenses
+        BEGIN
+            {remove_old}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_update
+        AFTER UPDATE OF amount, category, date ON expenses
+        BEGIN
+            {remove_old}
+            {add_new}
+        END
+    ''')
+    
+    # Backfill from existing expenses
+    _rebuild_category_rollups(conn)
+
+def rebuild_rollups(conn):
+    """Recompute both rollup tables from the expenses table.
+    
+    Runs inside the caller's transaction; the caller is responsible for committing.
+    """
+    conn.execute('DELETE FROM expense_daily_rollup')
+    conn.execute('DELETE FROM expense_monthly_rollup')
+    conn.execute('''
+        INSERT INTO expense_daily_rollup (day, category, currency, total, count, max_amount)
+        SELECT date, category, currency, SUM(amount), COUNT(*), MAX(amount)
+        FROM expenses
+        GROUP BY date, category, currency
+    ''')
+    conn.execute('''
+        INSERT INTO expense_monthly_rollup (month, category, currency, total, count, max_amount)
+        SELECT substr(day, 1, 7), category, currency, SUM(total), SUM(count), MAX(max_amount)
+        FROM expense_daily_rollup
+        GROUP BY substr(day, 1, 7), category, currency
+    ''')
+
+def _rebuild_category_rollups(conn):
+    """Backfill the rollups as keyed before _add_currencies (day or month, category).
+    
+    Kept for the migrations that ran against that schema.
+    """
+    conn.execute('DELETE FROM expense_daily_rollup')
+    conn.execute('DELETE FROM expense_monthly_rollup')
+    conn.execute('''
+        INSERT INTO expense_daily_rollup (day, category, total, count, max_amount)
+        SELECT date, category, SUM(amount), COUNT(*), MAX(amount)
+        FROM expenses
+        GROUP BY date, category
+    ''')
+    conn.execute('''
+        INSERT INTO expense_monthly_rollup (month, category, total, count, max_amount)
+        SELECT substr(day, 1, 7), category, SUM(total), SUM(count), MAX(max_amount)
+        FROM expense_daily_rollup
+        GROUP BY substr(day, 1, 7), category
+    ''')
+
+def _add_expense_search_index(conn):
+    """Add an FTS5 index over expense descriptions and tag names.
+    
+    Skipped when SQLite is built without FTS5; searches then fall back to LIKE.
+    """
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS expense_fts USING fts5(
+                description,
+                tags,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return
+    
+    expense_tag_names = '''
+        COALESCE((
+            SELECT group_concat(t.name, ' ') FROM expense_tags et
+            JOIN tags t ON t.id = et.tag_id
+            WHERE et.expense_id = {expense_id}
+        ), '')
+    '''
+    
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_insert
+        AFTER INSERT ON expenses
+        BEGIN
+            INSERT INTO expense_fts (rowid, description, tags)
+            VALUES (NEW.id, NEW.description, '');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_update
+        AFTER UPDATE OF description ON expenses
+        BEGIN
+            UPDATE expense_fts SET description = NEW.description WHERE rowid = NEW.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_delete
+        AFTER DELETE ON expenses
+        BEGIN
+            DELETE FROM expense_fts WHERE rowid = OLD.id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_expense_tags_fts_insert
+        AFTER INSERT ON expense_tags
+        BEGIN
+            UPDATE expense_fts SET tags = {expense_tag_names.format(expense_id='NEW.expense_id')}
+            WHERE rowid = NEW.expense_id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_expense_tags_fts_delete
+        AFTER DELETE ON expense_tags
+        BEGIN
+            UPDATE expense_fts SET tags = {expense_tag_names.format(expense_id='OLD.expense_id')}
+            WHERE rowid = OLD.expense_id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_tags_fts_delete
+        AFTER DELETE ON tags
+        BEGIN
+            UPDATE expense_fts SET tags = {expense_tag_names.format(expense_id='expense_fts.rowid')}
+            WHERE rowid IN (SELECT expense_id FROM expense_tags WHERE tag_id = OLD.id);
+        END
+    ''')
+    
+    # Backfill from existing expenses
+    conn.execute('DELETE FROM expense_fts')
+    conn.execute(f'''
+        INSERT INTO expense_fts (rowid, description, tags)
+        SELECT e.id, e.description, {expense_tag_names.format(expense_id='e.id')}
+        FROM expenses e
+    ''')
+
+def apply_derived_rows(conn, first_id, last_id):
+    """Fold a contiguous range of newly inserted expenses into the rollup, search and change log tables.
+    
+    Set-based counterpart of the insert triggers, for bulk loads that run
+    with the triggers suspended. Runs inside the caller's transaction.
+    """
+    conn.execute('''
+        INSERT INTO expense_daily_rollup (day, category, currency, total, count, max_amount)
+        SELECT date, category, currency, SUM(amount), COUNT(*), MAX(amount)
+        FROM expenses
+        WHERE id BETWEEN ? AND ?
+        GROUP BY date, category, currency
+        ON CONFLICT (day, category, currency) DO UPDATE SET
+            total = total + excluded.total,
+            count = count + excluded.count,
+            max_amount = MAX(max_amount, excluded.max_amount)
+    ''', (first_id, last_id))
+    conn.execute('''
+        INSERT INTO expense_monthly_rollup (month, category, currency, total, count, max_amount)
+        SELECT substr(date, 1, 7), category, currency, SUM(amount), COUNT(*), MAX(amount)
+        FROM expenses
+        WHERE id BETWEEN ? AND ?
+        GROUP BY substr(date, 1, 7), category, currency
+        ON CONFLICT (month, category, currency) DO UPDATE SET
+            total = total + excluded.total,
+            count = count + excluded.count,
+            max_amount = MAX(max_amount, excluded.max_amount)
+    ''', (first_id, last_id))
+    
+    conn.execute('''
+        INSERT INTO expense_changes (expense_id)
+        SELECT id FROM expenses WHERE id BETWEEN ? AND ?
+    ''', (first_id, last_id))
+    conn.execute('''
+        DELETE FROM expense_changes
+        WHERE seq <= (SELECT MAX(seq) FROM expense_changes) - ?
+    ''', (CHANGE_LOG_LIMIT,))
+    
+    has_fts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'expense_fts'"
+    ).fetchone()
+    if has_fts:
+        conn.execute('''
+            INSERT INTO expense_fts (rowid, description, tags)
+            SELECT e.id, e.description, COALESCE((
+                SELECT group_concat(t.name, ' ') FROM expense_tags et
+                JOIN tags t ON t.id = et.tag_id
+                WHERE et.expense_id = e.id
+            ), '')
+            FROM expenses e
+            WHERE e.id BETWEEN ? AND ?
+        ''', (first_id, last_id))
+
+# Tables whose writes change what analytics and reports show
+VERSIONED_TABLES = ('expenses', 'expense_tags', 'budgets', 'tags')
+
+def _add_data_version(conn):
+    """Add a data version counter bumped by every write to the versioned tables.
+    
+    Response caches key their entries on this counter, so any change to
+    expenses, budgets or tags invalidates them no matter which process or
+    code path made it.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)')
+    
+    for table in VERSIONED_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+
+# Statement run by the data version triggers (and by hand for bulk loads)
+_BUMP_DATA_VERSION = '''
+    UPDATE data_version
+    SET version = version + 1, updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE id = 1
+'''
+
+def _add_data_version_timestamp(conn):
+    """Record when the data version last changed, for Last-Modified headers."""
+    conn.execute('ALTER TABLE data_version ADD COLUMN updated_at INTEGER NOT NULL DEFAULT 0')
+    conn.execute("UPDATE data_version SET updated_at = CAST(strftime('%s', 'now') AS INTEGER)")
+    
+    for table in VERSIONED_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            name = f'trg_{table}_version_{event.lower()}'
+            conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+            conn.execute(f'''
+                CREATE TRIGGER {name}
+                AFTER {event} ON {table}
+                BEGIN
+                    {_BUMP_DATA_VERSION};
+                END
+            ''')
+
+def bump_data_version(conn):
+    """Bump the data version by hand, for writes made with the triggers suspended.
+    
+    Runs inside the caller's transaction.
+    """
+    conn.execute(_BUMP_DATA_VERSION)
+
+def _add_prediction_tables(conn):
+    """Add the forecast history tables (previously only created by the legacy app)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS predictions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            target_month TEXT NOT NULL,
+            predicted_amount REAL NOT NULL,
+            actual_amount REAL,
+            prediction_date TEXT DEFAULT CURRENT_DATE,
+            accuracy REAL,
+            notes TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS prediction_categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prediction_id INTEGER,
+            category TEXT NOT NULL,
+            predicted_amount REAL NOT NULL,
+            actual_amount REAL,
+            FOREIGN KEY (prediction_id) REFERENCES predictions (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_predictions_target_month ON predictions (target_month)')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_prediction_categories_prediction
+        ON prediction_categories (prediction_id)
+    ''')
+
+def _add_recurring_schedule(conn):
+    """Track how far each recurring expense has been materialized.
+    
+    A recurring expense is the template for its series; occurrences counts
+    the copies generated so far and last_generated is the latest one's date.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS recurring_schedule (
+            template_id INTEGER PRIMARY KEY,
+            occurrences INTEGER NOT NULL,
+            last_generated TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_recurring_delete
+        AFTER DELETE ON expenses
+        BEGIN
+            DELETE FROM recurring_schedule WHERE template_id = old.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_expenses_recurring
+        ON expenses (recurring_interval) WHERE recurring = 1
+    ''')
+
+def _add_expense_change_log(conn):
+    """Log the ID of every inserted, updated or deleted expense.
+    
+    In-process readers such as the analytics snapshot remember the last
+    sequence number they saw and reload only the expenses changed since.
+    The log is pruned to the last CHANGE_LOG_LIMIT entries on insert;
+    readers that fall further behind reload everything.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS expense_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            expense_id INTEGER NOT NULL
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_changes_insert
+        AFTER INSERT ON expenses
+        BEGIN
+            INSERT INTO expense_changes (expense_id) VALUES (new.id);
+            DELETE FROM expense_changes
+            WHERE seq <= (SELECT MAX(seq) FROM expense_changes) - {CHANGE_LOG_LIMIT};
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_changes_update
+        AFTER UPDATE OF amount, category, date ON expenses
+        BEGIN
+            INSERT INTO expense_changes (expense_id) VALUES (new.id);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_changes_delete
+        AFTER DELETE ON expenses
+        BEGIN
+            INSERT INTO expense_changes (expense_id) VALUES (old.id);
+        END
+    ''')
+
+def _add_amount_indexes(conn):
+    """Index amounts so top-N queries can read the largest expenses first."""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_expenses_amount ON expenses (amount)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_expenses_category_amount ON expenses (category, amount)')
+
+def _rebuild_with_money_columns(conn, table, columns, scale):
+    """Recreate a table with columns declared MONEY, multiplying their values by scale.
+    
+    The table is copied into a new one whose CREATE statement only differs
+    in those declared types, then swapped in; its indexes and triggers are
+    recreated and the AUTOINCREMENT counter is carried over. Tables that do
+    not exist and columns already declared MONEY are skipped, so running it
+    again changes nothing. Returns whether the table was rebuilt.
+    """
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    if row is None:
+        return False
+    
+    declared = {info[1]: info[2].upper() for info in conn.execute(f'PRAGMA table_info("{table}")')}
+    columns = [column for column in columns if declared.get(column) == 'REAL']
+    if not columns:
+        return False
+    
+    create = row[0]
+    for column in columns:
+        create = re.sub(rf'\b{column}\s+REAL\b', f'{column} MONEY', create, count=1)
+    create = re.sub(rf'^CREATE TABLE\s+(IF NOT EXISTS\s+)?"?{table}"?', f'CREATE TABLE "{table}_new"',
+                    create.strip(), count=1, flags=re.IGNORECASE)
+    
+    dependents = [sql for (sql,) in conn.execute('''
+        SELECT sql FROM sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    ''', (table,))]
+    
+    has_sequence = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone()
+    sequence = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone() if has_sequence else None
+    
+    names = [info[1] for info in conn.execute(f'PRAGMA table_info("{table}")')]
+    select = ', '.join(
+        f'CAST(ROUND("{name}" * {scale}) AS INTEGER)' if name in columns else f'"{name}"'
+        for name in names
+    )
+    column_list = ', '.join(f'"{name}"' for name in names)
+    
+    conn.execute(create)
+    conn.execute(f'INSERT INTO "{table}_new" ({column_list}) SELECT {select} FROM "{table}"')
+    conn.execute(f'DROP TABLE "{table}"')
+    # Other tables' triggers still name the dropped table; keep the rename from re-parsing them
+    conn.execute('PRAGMA legacy_alter_table = ON')
+    try:
+        conn.execute(f'ALTER TABLE "{table}_new" RENAME TO "{table}"')
+    finally:
+        conn.execute('PRAGMA legacy_alter_table = OFF')
+    
+    for sql in dependents:
+        conn.execute(sql)
+    
+    if sequence:
+        conn.execute('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?', (sequence[0], table))
+    return True
+
+def _store_amounts_in_minor_units(conn):
+    """Store money as integer minor units of the default currency in MONEY columns.
+    
+    Converts expenses, budgets and (when present) income_entries. The
+    rollup totals are recomputed from the converted expenses, so they are
+    exact sums. Forecast tables keep their REAL estimates. Amounts already
+    stored in MONEY columns are not scaled again.
+    """
+    scale = 10 ** CURRENCIES[DEFAULT_CURRENCY]['decimals']
+    
+    rebuilt = [
+        _rebuild_with_money_columns(conn, 'expenses', ['amount'], scale),
+        _rebuild_with_money_columns(conn, 'budgets', ['amount'], scale),
+        _rebuild_with_money_columns(conn, 'income_entries', ['amount'], scale),
+        _rebuild_with_money_columns(conn, 'expense_daily_rollup', ['total', 'max_amount'], 1),
+        _rebuild_with_money_columns(conn, 'expense_monthly_rollup', ['total', 'max_amount'], 1)
+    ]
+    if not any(rebuilt):
+        return
+    
+    _rebuild_category_rollups(conn)
+    # Cached aggregates hold amounts in the old representation
+    bump_data_version(conn)
+
+def _has_column(conn, table, column):
+    """Check whether a table exists and has a column."""
+    return any(info[1] == column for info in conn.execute(f'PRAGMA table_info("{table}")'))
+
+def _add_currencies(conn):
+    """Record the currency of every expense and income entry and add the exchange rate tables.
+    
+    Existing rows are in the default currency. The rollups are recreated
+    with currency as part of their key, so a total only ever adds amounts
+    of one currency; conversion happens when they are read. fx_rates
+    mirrors the rates file and fx_rate_source records which version of it
+    was loaded (see app.fx).
+    """
+    for table in ('expenses', 'income_entries'):
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        if exists and not _has_column(conn, table, 'currency'):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN currency TEXT NOT NULL DEFAULT '{DEFAULT_CURRENCY}'")
+    
+    for trigger in ('insert', 'delete', 'update'):
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_expenses_rollup_{trigger}')
+    conn.execute('DROP TABLE IF EXISTS expense_daily_rollup')
+    conn.execute('DROP TABLE IF EXISTS expense_monthly_rollup')
+    
+    conn.execute('''
+        CREATE TABLE expense_daily_rollup (
+            day TEXT NOT NULL,
+            category TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            total MONEY NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            max_amount MONEY,
+            PRIMARY KEY (day, category, currency)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE expense_monthly_rollup (
+            month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            total MONEY NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            max_amount MONEY,
+            PRIMARY KEY (month, category, currency)
+        )
+    ''')
+    
+    add_new = '''
+        INSERT INTO expense_daily_rollup (day, category, currency, total, count, max_amount)
+        VALUES (NEW.date, NEW.category, NEW.currency, NEW.amount, 1, NEW.amount)
+        ON CONFLICT (day, category, currency) DO UPDATE SET
+            total = total + excluded.total,
+            count = count + 1,
+            max_amount = MAX(max_amount, excluded.max_amount);
+        INSERT INTO expense_monthly_rollup (month, category, currency, total, count, max_amount)
+        VALUES (substr(NEW.date, 1, 7), NEW.category, NEW.currency, NEW.amount, 1, NEW.amount)
+        ON CONFLICT (month, category, currency) DO UPDATE SET
+            total = total + excluded.total,
+            count = count + 1,
+            max_amount = MAX(max_amount, excluded.max_amount);
+    '''
+    
+    # As in _add_expense_rollups, with every rollup row narrowed to one currency
+    remove_old = '''
+        UPDATE expense_daily_rollup
+        SET total = total - OLD.amount, count = count - 1
+        WHERE day = OLD.date AND category = OLD.category AND currency = OLD.currency;
+        DELETE FROM expense_daily_rollup
+        WHERE day = OLD.date AND category = OLD.category AND currency = OLD.currency AND count <= 0;
+        UPDATE expense_daily_rollup
+        SET max_amount = (
+            SELECT MAX(amount) FROM expenses
+            WHERE category = OLD.category AND date = OLD.date AND currency = OLD.currency
+        )
+        WHERE day = OLD.date AND category = OLD.category AND currency = OLD.currency
+          AND max_amount <= OLD.amount;
+        UPDATE expense_monthly_rollup
+        SET total = total - OLD.amount, count = count - 1
+        WHERE month = substr(OLD.date, 1, 7) AND category = OLD.category AND currency = OLD.currency;
+        DELETE FROM expense_monthly_rollup
+        WHERE month = substr(OLD.date, 1, 7) AND category = OLD.category AND currency = OLD.currency
+          AND count <= 0;
+        UPDATE expense_monthly_rollup
+        SET max_amount = (
+            SELECT MAX(max_amount) FROM expense_daily_rollup
+            WHERE day >= substr(OLD.date, 1, 7) || '-01'
+              AND day <= substr(OLD.date, 1, 7) || '-31'
+              AND category = OLD.category AND currency = OLD.currency
+        )
+        WHERE month = substr(OLD.date, 1, 7) AND category = OLD.category AND currency = OLD.currency
+          AND max_amount <= OLD.amount;
+    '''
+    
+    conn.execute(f'''
+        CREATE TRIGGER trg_expenses_rollup_insert
+        AFTER INSERT ON expenses
+        BEGIN
+            {add_new}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER trg_expenses_rollup_delete
+        AFTER DELETE ON expenses
+        BEGIN
+            {remove_old}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER trg_expenses_rollup_update
+        AFTER UPDATE OF amount, category, date, currency ON expenses
+        BEGIN
+            {remove_old}
+            {add_new}
+        END
+    ''')
+    
+    # Changing only the currency must reach incremental readers too
+    conn.execute('DROP TRIGGER IF EXISTS trg_expenses_changes_update')
+    conn.execute('''
+        CREATE TRIGGER trg_expenses_changes_update
+        AFTER UPDATE OF amount, category, date, currency ON expenses
+        BEGIN
+            INSERT INTO expense_changes (expense_id) VALUES (new.id);
+        END
+    ''')
+    
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fx_rates (
+            currency TEXT NOT NULL,
+            day TEXT NOT NULL,
+            minor_rate REAL NOT NULL,
+            PRIMARY KEY (currency, day)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fx_rate_source (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            fingerprint TEXT NOT NULL
+        )
+    ''')
+    
+    rebuild_rollups(conn)
+    bump_data_version(conn)
+
+def _index_amounts_by_currency(conn):
+    """Replace the amount indexes with ones led by currency.
+    
+    Top-N ranks amounts converted into the report currency; only amounts
+    already in it can be read in index order, so the index has to narrow
+    to one currency first.
+    """
+    conn.execute('DROP INDEX IF EXISTS idx_expenses_amount')
+    conn.execute('DROP INDEX IF EXISTS idx_expenses_category_amount')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_expenses_currency_amount ON expenses (currency, amount)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_expenses_category_currency_amount ON expenses (category, currency, amount)')
+
+# Ordered list of migrations; a database at user_version N has run the first N
+MIGRATIONS = [
+    _add_secondary_indexes,
+    _add_expense_rollups,
+    _add_expense_search_index,
+    _add_data_version,
+    _add_data_version_timestamp,
+    _add_prediction_tables,
+    _add_recurring_schedule,
+    _add_expense_change_log,
+    _add_amount_indexes,
+    _store_amounts_in_minor_units,
+    _add_currencies,
+    _index_amounts_by_currency,
+]
+
+def get_schema_version(conn):
+    """Get the schema version recorded in the database."""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn):
+    """Apply all pending migrations in order and return the resulting version.
+    
+    Each migration takes the write lock before reading the version, so
+    processes starting together (e.g. gunicorn workers) apply it once: the
+    others wait for the lock and then find it already applied.
+    """
+    version = get_schema_version(conn)
+    
+    while version < len(MIGRATIONS):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = get_schema_version(conn)
+            if version >= len(MIGRATIONS):
+                conn.rollback()
+                break
+            
+            MIGRATIONS[version](conn)
+            version += 1
+            # PRAGMA does not accept bound parameters
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    
+    return version
@@ -1,4 +1,9 @@
+from datetime import date
 from app.database import get_db_connection
+from app.config import BUDGET_PERIODS
+from app.fx import get_fx_rates, target_currency
+from app.money import Money
+from app.utils import get_budget_period_start
 
 class Budget:
     """Model for handling budget-related operations."""
@@ -25,7 +30,7 @@ class Budget:
     def create_or_update(budget_data):
         """Create a new budget or update if already exists."""
         category = budget_data['category']
-        amount = budget_data['amount']
+        amount = Money.parse(budget_data['amount'])
         period = budget_data['period']
         
         with get_db_connection() as conn:
@@ -61,46 +66,76 @@ class Budget:
             conn.commit()
     
     @staticmethod
-    def get_comparison(date_range=None):
-        """Get budget comparison with actual spending."""
+    def get_comparison(date_range=None, today=None, currency=None):
+        """Get budget comparison with actual spending.
+        
+        Each budget is compared against spending in its own current period
+        (today, this week, this month or this year), narrowed further by
+        date_range when given. All budgets are computed in a single query.
+        Budgets are set in the default currency; both sides are reported in
+        currency (default: the default currency), budgets converted at this
+        month's rate and spending at the rate of each expense's month. A
+        currency without quotes converts at face value on both sides (see
+        app.fx), so the percentages stay comparable.
+        """
+        rates = get_fx_rates()
+        day = today or date.today()
+        currency = target_currency({'currency': currency})
+        spent = rates.convert_sql('e.amount', 'e.currency', 'substr(e.date, 1, 7)', currency)
+        
+        period_starts = {
+            period: get_budget_period_start(period, today) or ''
+            for period in BUDGET_PERIODS
+        }
+        
+        query = f'''
+            SELECT b.id, b.category, b.amount, b.period,
+                   COALESCE(SUM({spent}), 0) as spent
+            FROM budgets b
+            LEFT JOIN expenses e
+                ON e.category = b.category
+                AND e.date >= CASE b.period
+                    WHEN 'daily' THEN :daily
+                    WHEN 'weekly' THEN :weekly
+                    WHEN 'monthly' THEN :monthly
+                    WHEN 'yearly' THEN :yearly
+                    ELSE ''
+                END
+        '''
+        params = dict(period_starts)
+        
+        if date_range:
+            if date_range.get('from_date'):
+                query += ' AND e.date >= :from_date'
+                params['from_date'] = date_range['from_date']
+            
+            if date_range.get('to_date'):
+                query += ' AND e.date <= :to_date'
+                params['to_date'] = date_range['to_date']
+        
+        query += ' GROUP BY b.id ORDER BY b.category'
+        
         with get_db_connection() as conn:
-            budgets = conn.execute('SELECT * FROM budgets ORDER BY category').fetchall()
+            rows = conn.execute(query, params).fetchall()
+        
+        result = []
+        for row in rows:
+            spent = Money(row['spent'], currency)
+            budget = rates.convert(row['amount'], currency, day)
             
-            result = []
-            for budget in budgets:
-                # Query to get spending for this category within date range
-                query = '''
-                    SELECT SUM(amount) as spent
-                    FROM expenses
-                    WHERE category = ?
-                '''
-                params = [budget['category']]
-                
-                if date_range:
-                    if date_range.get('from_date'):
-                        query += ' AND date >= ?'
-                        params.append(date_range['from_date'])
-                    
-                    if date_range.get('to_date'):
-                        query += ' AND date <= ?'
-                        params.append(date_range['to_date'])
-                
-                spending = conn.execute(query, params).fetchone()
-                spent = spending['spent'] if spending and spending['spent'] else 0
-                
-                # Calculate percentage of budget used
-                percentage = round((spent / budget['amount']) * 100) if budget['amount'] > 0 else 0
-                
-                result.append({
-                    'id': budget['id'],
-                    'category': budget['category'],
-                    'budget': budget['amount'],
-                    'period': budget['period'],
-                    'spent': spent,
-                    'percentage': percentage
-                })
+            # Calculate percentage of budget used
+            percentage = round((spent / budget) * 100) if budget > 0 else 0
             
-            return result
+            result.append({
+                'id': row['id'],
+                'category': row['category'],
+                'budget': budget,
+                'period': row['period'],
+                'spent': spent,
+                'percentage': percentage
+            })
+        
+        return result
     
     @staticmethod
     def validate(form_data):
@@ -113,7 +148,7 @@ class Budget:
         
         # Amount validation
         try:
-            amount = float(form_data.get('amount', 0))
+            amount = Money.parse(form_data.get('amount', 0))
             if amount <= 0:
                 errors.append('Budget amount must be greater than zero')
         except ValueError:
@@ -0,0 +1,61 @@
+from app.database import get_db_connection
+from app.models.rollup import _rollup_source
+from app.money import Money
+from app.fx import target_currency
+
+class DashboardStats:
+    """Data provider for the analytics dashboard.
+    
+    Statistics, the category breakdown and the monthly series all come from
+    one grouped query over the daily rollup (month x category totals,
+    counts and maxima), which a single pass over the rows folds into the
+    three results. Filters support from_date, to_date and category.
+    """
+    
+    @staticmethod
+    def get(filters=None):
+        """Get {'stats', 'category_totals', 'monthly_spending'} for the filters.
+        
+        stats has total, average, max and count; category_totals is largest
+        first and monthly_spending is oldest first, both as plain dicts.
+        Amounts are in filters['currency'] (default: the default currency).
+        """
+        table, _, where, params = _rollup_source(filters, daily_only=True)
+        
+        with get_db_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT substr(day, 1, 7) as month, category,
+                       SUM(total) as total, SUM(count) as count, MAX(max_amount) as max
+                FROM {table}
+                {where}
+                GROUP BY month, category
+            ''', params).fetchall()
+        
+        # Totals are summed unrounded and become Money once, at the end
+        total, count, highest = 0, 0, None
+        categories = {}
+        months = {}
+        for month, category, month_total, month_count, month_max in rows:
+            month_total = month_total or 0
+            total += month_total
+            count += month_count
+            if month_max is not None and (highest is None or month_max > highest):
+                highest = month_max
+            categories[category] = categories.get(category, 0) + month_total
+            months[month] = months.get(month, 0) + month_total
+        
+        currency = target_currency(filters)
+        total = Money(total, currency)
+        return {
+            'stats': {
+                'total': total,
+                'average': total / count if count else Money(0, currency),
+                'max': Money(highest or 0, currency),
+                'count': count
+            },
+            'category_totals': [
+                {'category': category, 'total': Money(value, currency)}
+                for category, value in sorted(categories.items(), key=lambda item: item[1], reverse=True)
+            ],
+            'monthly_spending': [{'month': month, 'total': Money(months[month], currency)} for month in sorted(months)]
+        }
@@ -1,60 +1,314 @@
 from datetime import datetime
+from functools import lru_cache
 from app.database import get_db_connection
-from app.config import DATE_FORMAT
+from app.models.rollup import ExpenseRollup
+from app.config import CURRENCIES, DATE_FORMAT, DEFAULT_CURRENCY, EXPENSES_PAGE_SIZE
+from app.money import Money, with_row_currency
+from app.fx import get_fx_rates, target_currency
+
+# Maximum number of expense IDs bound into a single tag lookup query
+TAG_BATCH_SIZE = 500
+
+# Most results a search request may ask for
+SEARCH_MAX_RESULTS = 100
+
+# Number of rows fetched per round trip when streaming an export
+EXPORT_BATCH_SIZE = 1000
+
+# Orderings accepted by get_all/get_by_tag; id breaks ties so pages are stable
+EXPENSE_ORDERINGS = {
+    'date DESC': ('date DESC', 'id DESC'),
+    'date ASC': ('date ASC', 'id ASC'),
+    'amount DESC': ('amount DESC', 'id DESC'),
+    'amount ASC': ('amount ASC', 'id ASC'),
+    'category': ('category ASC', 'date DESC', 'id DESC'),
+    'description': ('description ASC', 'id ASC')
+}
+
+# Columns Expense.top_n can rank by, largest first
+TOP_N_KEYS = ('amount', 'date')
+
+@lru_cache(maxsize=4096)
+def _parse_date(date_str):
+    """Parse a date string, memoized since bulk imports repeat the same dates."""
+    return datetime.strptime(date_str, DATE_FORMAT)
+
+def _fts_query(term):
+    """Turn free text into an FTS5 query that prefix-matches every word."""
+    words = term.split()
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+def _has_search_index():
+    """Check whether the expense_fts full-text index exists."""
+    with get_db_connection() as conn:
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'expense_fts'"
+        ).fetchone() is not None
+
+def _order_clause(order_by, alias=''):
+    """Build an ORDER BY clause from a whitelisted ordering name."""
+    if order_by not in EXPENSE_ORDERINGS:
+        raise ValueError(f'Unsupported expense ordering: {order_by!r}')
+    return ' ORDER BY ' + ', '.join(alias + term for term in EXPENSE_ORDERINGS[order_by])
+
+def _limit_clause(limit, offset):
+    """Build a LIMIT/OFFSET clause and its parameters."""
+    if limit is None and not offset:
+        return '', []
+    # SQLite needs a LIMIT to accept an OFFSET; -1 means no limit
+    return ' LIMIT ? OFFSET ?', [limit if limit is not None else -1, offset or 0]
+
+def _search_clause(term, id_column, description_column):
+    """Build the SQL condition for a description/tag search.
+    
+    Uses the expense_fts index when it exists and falls back to a LIKE scan
+    of the description otherwise. Returns (clause, params).
+    """
+    if term.split() and _has_search_index():
+        return f'{id_column} IN (SELECT rowid FROM expense_fts WHERE expense_fts MATCH ?)', [_fts_query(term)]
+    
+    return f'{description_column} LIKE ?', [f'%{term}%']
+
+def _filter_clause(filters, alias=''):
+    """Build the AND conditions for search, category and date range filters.
+    
+    alias prefixes the expense columns (e.g. 'e.'). Returns (clause, params).
+    """
+    clause, params = '', []
+    if not filters:
+        return clause, params
+    
+    # Apply search filter
+    if filters.get('search'):
+        search, search_params = _search_clause(filters['search'], f'{alias}id', f'{alias}description')
+        clause += f' AND {search}'
+        params.extend(search_params)
+    
+    # Apply category filter
+    if filters.get('category'):
+        clause += f' AND {alias}category = ?'
+        params.append(filters['category'])
+    
+    # Apply date range filters
+    if filters.get('from_date'):
+        clause += f' AND {alias}date >= ?'
+        params.append(filters['from_date'])
+    
+    if filters.get('to_date'):
+        clause += f' AND {alias}date <= ?'
+        params.append(filters['to_date'])
+    
+    return clause, params
+
+def _parse_cursor(cursor):
+    """Split a 'date_id' pagination cursor into (date, id), or None if invalid."""
+    try:
+        date, expense_id = cursor.rsplit('_', 1)
+        return date, int(expense_id)
+    except (AttributeError, ValueError):
+        return None
 
 class Expense:
     """Model for handling expense-related operations."""
     
     @staticmethod
-    def get_all(filters=None, order_by='date DESC'):
-        """Get all expenses with optional filtering."""
-        query = 'SELECT * FROM expenses WHERE 1=1'
-        params = []
+    def get_all(filters=None, order_by='date DESC', cursor=None, page_size=None, limit=None, offset=0):
+        """Get all expenses with optional filtering, as dicts.
         
-        if filters:
-            # Apply search filter
-            if filters.get('search'):
-                query += ' AND description LIKE ?'
-                params.append(f'%{filters["search"]}%')
-            
-            # Apply category filter
-            if filters.get('category'):
-                query += ' AND category = ?'
-                params.append(filters['category'])
-            
-            # Apply date range filters
-            if filters.get('from_date'):
-                query += ' AND date >= ?'
-                params.append(filters['from_date'])
-            
-            if filters.get('to_date'):
-                query += ' AND date <= ?'
-                params.append(filters['to_date'])
+        order_by must be one of EXPENSE_ORDERINGS; limit and offset bound the
+        rows returned. When page_size is given the results are instead
+        keyset-paginated newest first (date DESC, id DESC), starting after
+        cursor, and order_by, limit and offset are ignored.
+        """
+        where, params = _filter_clause(filters)
+        query = f'SELECT * FROM expenses WHERE 1=1{where}'
         
-        # Add ordering
-        if order_by:
-            query += f' ORDER BY {order_by}'
+        if page_size:
+            # Keyset pagination
+            position = _parse_cursor(cursor)
+            if position:
+                query += ' AND (date, id) < (?, ?)'
+                params.extend(position)
+            
+            query += ' ORDER BY date DESC, id DESC LIMIT ?'
+            params.append(page_size)
+        else:
+            # Add ordering
+            query += _order_clause(order_by)
+            clause, clause_params = _limit_clause(limit, offset)
+            query += clause
+            params.extend(clause_params)
         
         with get_db_connection() as conn:
-            return conn.execute(query, params).fetchall()
+            return [with_row_currency(row) for row in conn.execute(query, params)]
     
     @staticmethod
-    def get_by_tag(tag_name, filters=None):
-        """Get expenses with a specific tag."""
+    def get_by_tag(tag_name, filters=None, cursor=None, page_size=None, order_by='date DESC', limit=None, offset=0):
+        """Get expenses with a specific tag; ordering, limits and pagination work like get_all."""
         query = '''
             SELECT e.* FROM expenses e
             JOIN expense_tags et ON e.id = et.expense_id
             JOIN tags t ON et.tag_id = t.id
             WHERE t.name = ?
         '''
-        params = [tag_name]
+        where, params = _filter_clause(filters, 'e.')
+        query += where
+        params = [tag_name] + params
         
-        if filters:
-            # Apply search filter
-            if filters.get('search'):
-                query += ' AND e.description LIKE ?'
-                params.append(f'%{filters["search"]}%')
+        if page_size:
+            # Keyset pagination
+            position = _parse_cursor(cursor)
+            if position:
+                query += ' AND (e.date, e.id) < (?, ?)'
+                params.extend(position)
             
+            query += ' ORDER BY e.date DESC, e.id DESC LIMIT ?'
+            params.append(page_size)
+        else:
+            query += _order_clause(order_by, 'e.')
+            clause, clause_params = _limit_clause(limit, offset)
+            query += clause
+            params.extend(clause_params)
+        
+        with get_db_connection() as conn:
+            return [with_row_currency(row) for row in conn.execute(query, params)]
+    
+    @staticmethod
+    def top_n(filters=None, n=5, key='amount'):
+        """Get the n expenses with the largest key ('amount' or 'date').
+        
+        Amounts are ranked converted into the filters' currency (see
+        app.fx), so expenses in different currencies compare by value. The
+        expenses already in that currency need no conversion: their top n
+        walk the (currency, amount) index from the top. Only expenses in
+        other currencies, usually few or none, are converted and sorted,
+        and the two candidate lists are merged. Dates walk the date index.
+        """
+        if key not in TOP_N_KEYS:
+            raise ValueError(f'Unsupported top-n key: {key!r}')
+        if key == 'date':
+            return Expense.get_all(filters, order_by='date DESC', limit=n)
+        
+        target = target_currency(filters)
+        where, params = _filter_clause(filters)
+        rates = get_fx_rates()
+        converted = rates.convert_sql('expenses.amount', 'expenses.currency', 'substr(expenses.date, 1, 7)', target)
+        merged = rates.convert_sql('top.amount', 'top.currency', 'substr(top.date, 1, 7)', target)
+        
+        # currency != ? written as a range pair, so it can search the index too
+        query = f'''
+            SELECT * FROM (
+                SELECT * FROM (
+                    SELECT * FROM expenses WHERE currency = ?{where}
+                    ORDER BY amount DESC, id DESC LIMIT ?
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT * FROM expenses WHERE (currency < ? OR currency > ?){where}
+                    ORDER BY {converted} DESC, id DESC LIMIT ?
+                )
+            ) top
+            ORDER BY {merged} DESC, top.id DESC
+            LIMIT ?
+        '''
+        
+        with get_db_connection() as conn:
+            rows = conn.execute(query, [target, *params, n, target, target, *params, n, n])
+            return [with_row_currency(row) for row in rows]
+    
+    @staticmethod
+    def search(term, filters=None, limit=20):
+        """Full-text search over descriptions and tags, best matches first.
+        
+        Falls back to a newest-first LIKE search when FTS5 is unavailable.
+        """
+        filters = dict(filters or {}, search=term)
+        if not term.split() or not _has_search_index():
+            return Expense.get_all(filters, page_size=limit)
+        
+        query = '''
+            SELECT e.* FROM expense_fts
+            JOIN expenses e ON e.id = expense_fts.rowid
+            WHERE expense_fts MATCH ?
+        '''
+        params = [_fts_query(term)]
+        
+        # Apply category filter
+        if filters.get('category'):
+            query += ' AND e.category = ?'
+            params.append(filters['category'])
+        
+        # Apply date range filters
+        if filters.get('from_date'):
+            query += ' AND e.date >= ?'
+            params.append(filters['from_date'])
+        
+        if filters.get('to_date'):
+            query += ' AND e.date <= ?'
+            params.append(filters['to_date'])
+        
+        query += ' ORDER BY expense_fts.rank LIMIT ?'
+        params.append(limit)
+        
+        with get_db_connection() as conn:
+            return [with_row_currency(row) for row in conn.execute(query, params)]
+    
+    @staticmethod
+    def paginate(filters=None, tag_name=None, cursor=None, page_size=EXPENSES_PAGE_SIZE):
+        """Get one page of expenses, newest first, with tags attached.
+        
+        Returns a dict with the page's 'expenses' and the 'next_cursor' to
+        pass back for the following page (None on the last page).
+        """
+        # Fetch one extra row to find out whether another page follows
+        if tag_name:
+            rows = Expense.get_by_tag(tag_name, filters, cursor, page_size + 1)
+        else:
+            rows = Expense.get_all(filters, cursor=cursor, page_size=page_size + 1)
+        
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        
+        return {
+            'expenses': Expense.with_tags(rows),
+            'next_cursor': f"{rows[-1]['date']}_{rows[-1]['id']}" if has_more else None
+        }
+    
+    @staticmethod
+    def iter_all(filters=None, tag_name=None, batch_size=EXPENSES_PAGE_SIZE):
+        """Iterate over all matching expenses with tags, one keyset page at a time."""
+        cursor = None
+        while True:
+            page = Expense.paginate(filters, tag_name, cursor, batch_size)
+            yield from page['expenses']
+            
+            cursor = page['next_cursor']
+            if not cursor:
+                return
+    
+    @staticmethod
+    def iter_export(filters=None, batch_size=EXPORT_BATCH_SIZE):
+        """Iterate over expenses for export, newest first, with a 'tags' list.
+        
+        Rows are pulled from one server-side cursor with fetchmany so memory
+        stays constant however many expenses are exported. Tags are
+        aggregated per row with GROUP_CONCAT, which keeps the date index
+        order and lets output start before the whole table has been read.
+        """
+        query = '''
+            SELECT e.id, e.description, e.amount, e.category, e.date,
+                   e.currency, e.recurring, e.recurring_interval,
+                   (
+                       SELECT GROUP_CONCAT(t.name, ',') FROM expense_tags et
+                       JOIN tags t ON t.id = et.tag_id
+                       WHERE et.expense_id = e.id
+                   ) as tags
+            FROM expenses e
+            WHERE 1=1
+        '''
+        params = []
+        
+        if filters:
             # Apply category filter
             if filters.get('category'):
                 query += ' AND e.category = ?'
@@ -69,27 +323,57 @@ class Expense:
                 query += ' AND e.date <= ?'
                 params.append(filters['to_date'])
         
-        query += ' ORDER BY e.date DESC'
+        query += ' ORDER BY e.date DESC, e.id DESC'
         
         with get_db_connection() as conn:
-            return conn.execute(query, params).fetchall()
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                
+                for row in rows:
+                    expense = with_row_currency(row)
+                    expense['tags'] = expense['tags'].split(',') if expense['tags'] else []
+                    yield expense
+    
+    @staticmethod
+    def get_categories():
+        """Get the distinct categories that have expenses."""
+        return ExpenseRollup.get_categories()
     
     @staticmethod
     def get_by_id(expense_id):
-        """Get a single expense by ID."""
+        """Get a single expense by ID as a dict, or None."""
+        with get_db_connection() as conn:
+            row = conn.execute('SELECT * FROM expenses WHERE id = ?', (expense_id,)).fetchone()
+        return with_row_currency(row) if row else None
+    
+    @staticmethod
+    def get_by_ids(expense_ids):
+        """Get several expenses by ID, in the order the IDs are given."""
+        if not expense_ids:
+            return []
+        
+        placeholders = ','.join('?' * len(expense_ids))
         with get_db_connection() as conn:
-            return conn.execute('SELECT * FROM expenses WHERE id = ?', (expense_id,)).fetchone()
+            rows = conn.execute(f'SELECT * FROM expenses WHERE id IN ({placeholders})', list(expense_ids)).fetchall()
+        
+        by_id = {row['id']: with_row_currency(row) for row in rows}
+        return [by_id[expense_id] for expense_id in expense_ids if expense_id in by_id]
     
     @staticmethod
     def create(expense_data):
         """Create a new expense."""
+        currency = expense_data.get('currency') or DEFAULT_CURRENCY
         with get_db_connection() as conn:
             cursor = conn.execute('''
-                INSERT INTO expenses (description, amount, category, date, recurring, recurring_interval)
-                VALUES (?, ?, ?, ?, ?, ?)
+                INSERT INTO expenses (description, amount, currency, category, date, recurring, recurring_interval)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (
                 expense_data['description'],
-                expense_data['amount'],
+                Money.parse(expense_data['amount'], currency),
+                currency,
                 expense_data['category'],
                 expense_data['date'],
                 expense_data.get('recurring', 0),
@@ -97,9 +381,9 @@ class Expense:
             ))
             expense_id = cursor.lastrowid
             
-            # Handle tags if provided
+            # Handle tags if provided, in the same transaction
             if 'tags' in expense_data and expense_data['tags']:
-                Expense.set_tags(expense_id, expense_data['tags'])
+                Expense.set_tags(expense_id, expense_data['tags'], conn)
             
             conn.commit()
             return expense_id
@@ -107,14 +391,16 @@ class Expense:
     @staticmethod
     def update(expense_id, expense_data):
         """Update an existing expense."""
+        currency = expense_data.get('currency') or DEFAULT_CURRENCY
         with get_db_connection() as conn:
             conn.execute('''
                 UPDATE expenses
-                SET description = ?, amount = ?, category = ?, date = ?, recurring = ?, recurring_interval = ?
+                SET description = ?, amount = ?, currency = ?, category = ?, date = ?, recurring = ?, recurring_interval = ?
                 WHERE id = ?
             ''', (
                 expense_data['description'],
-                expense_data['amount'],
+                Money.parse(expense_data['amount'], currency),
+                currency,
                 expense_data['category'],
                 expense_data['date'],
                 expense_data.get('recurring', 0),
@@ -127,9 +413,9 @@ class Expense:
                 # Remove existing tags
                 conn.execute('DELETE FROM expense_tags WHERE expense_id = ?', (expense_id,))
                 
-                # Add new tags
+                # Add new tags in the same transaction
                 if expense_data['tags']:
-                    Expense.set_tags(expense_id, expense_data['tags'])
+                    Expense.set_tags(expense_id, expense_data['tags'], conn)
             
             conn.commit()
     
@@ -142,102 +428,48 @@ class Expense:
             conn.commit()
     
     @staticmethod
-    def get_total():
-        """Get the sum of all expenses."""
-        with get_db_connection() as conn:
-            result = conn.execute('SELECT SUM(amount) as total FROM expenses').fetchone()
-            return result['total'] if result and result['total'] else 0
+    def get_total(currency=None):
+        """Get the sum of all expenses, converted into currency (default: the default currency)."""
+        return ExpenseRollup.get_total(currency)
     
     @staticmethod
     def get_category_totals(filters=None):
-        """Get expense totals grouped by category."""
-        query = '''
-            SELECT category, SUM(amount) as total, COUNT(*) as count
-            FROM expenses
-            WHERE 1=1
-        '''
-        params = []
-        
-        if filters:
-            # Apply date range filters
-            if filters.get('from_date'):
-                query += ' AND date >= ?'
-                params.append(filters['from_date'])
-            
-            if filters.get('to_date'):
-                query += ' AND date <= ?'
-                params.append(filters['to_date'])
-        
-        query += ' GROUP BY category ORDER BY total DESC'
-        
-        with get_db_connection() as conn:
-            return conn.execute(query, params).fetchall()
+        """Get expense totals grouped by category (served from the rollup tables)."""
+        return ExpenseRollup.get_category_totals(filters)
     
     @staticmethod
     def get_statistics(filters=None):
-        """Get expense statistics (total, average, max, count)."""
-        query = '''
-            SELECT 
-                SUM(amount) as total,
-                AVG(amount) as average,
-                MAX(amount) as max,
-                COUNT(*) as count
-            FROM expenses
-            WHERE 1=1
-        '''
-        params = []
-        
-        if filters:
-            # Apply date range filters
-            if filters.get('from_date'):
-                query += ' AND date >= ?'
-                params.append(filters['from_date'])
-            
-            if filters.get('to_date'):
-                query += ' AND date <= ?'
-                params.append(filters['to_date'])
-            
-            # Apply category filter
-            if filters.get('category'):
-                query += ' AND category = ?'
-                params.append(filters['category'])
-        
-        with get_db_connection() as conn:
-            stats = conn.execute(query, params).fetchone()
-            return {
-                'total': stats['total'] if stats['total'] else 0,
-                'average': stats['average'] if stats['average'] else 0,
-                'max': stats['max'] if stats['max'] else 0,
-                'count': stats['count']
-            }
+        """Get expense statistics (total, average, max, count) from the rollup tables."""
+        return ExpenseRollup.get_statistics(filters)
     
     @staticmethod
-    def set_tags(expense_id, tags):
-        """Associate tags with an expense."""
-        if not tags:
+    def set_tags(expense_id, tags, conn=None):
+        """Associate tags with an expense.
+        
+        When conn is given the tags are written as part of the caller's
+        transaction and the caller commits; otherwise they are committed on
+        their own. Missing tags are created and all links are written with
+        two statements, however many tags there are.
+        """
+        tag_names = list(dict.fromkeys(tag.strip() for tag in tags or [] if tag.strip()))
+        if not tag_names:
             return
         
-        with get_db_connection() as conn:
-            for tag_name in tags:
-                tag_name = tag_name.strip()
-                if not tag_name:
-                    continue
-                
-                # Get tag ID or create new tag
-                tag = conn.execute('SELECT id FROM tags WHERE name = ?', (tag_name,)).fetchone()
-                if tag:
-                    tag_id = tag['id']
-                else:
-                    cursor = conn.execute('INSERT INTO tags (name) VALUES (?)', (tag_name,))
-                    tag_id = cursor.lastrowid
-                
-                # Create relationship
-                conn.execute('''
-                    INSERT OR IGNORE INTO expense_tags (expense_id, tag_id)
-                    VALUES (?, ?)
-                ''', (expense_id, tag_id))
-            
-            conn.commit()
+        if conn is None:
+            with get_db_connection() as conn:
+                Expense.set_tags(expense_id, tag_names, conn)
+                conn.commit()
+            return
+        
+        # Create any tags that do not exist yet
+        conn.executemany('INSERT OR IGNORE INTO tags (name) VALUES (?)', [(name,) for name in tag_names])
+        
+        # Link every tag in one pass
+        placeholders = ','.join('?' * len(tag_names))
+        conn.execute(f'''
+            INSERT OR IGNORE INTO expense_tags (expense_id, tag_id)
+            SELECT ?, id FROM tags WHERE name IN ({placeholders})
+        ''', [expense_id, *tag_names])
     
     @staticmethod
     def get_tags(expense_id):
@@ -252,21 +484,62 @@ class Expense:
             return [tag['name'] for tag in tags]
     
     @staticmethod
-    def validate(form_data):
-        """Validate expense data."""
+    def get_tags_bulk(expense_ids):
+        """Get tags for many expenses at once, keyed by expense ID."""
+        tags_by_expense = {expense_id: [] for expense_id in expense_ids}
+        if not tags_by_expense:
+            return tags_by_expense
+        
+        ids = list(tags_by_expense)
+        with get_db_connection() as conn:
+            # Chunk the ID list to stay under SQLite's bound-parameter limit
+            for start in range(0, len(ids), TAG_BATCH_SIZE):
+                chunk = ids[start:start + TAG_BATCH_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(f'''
+                    SELECT et.expense_id, t.name FROM expense_tags et
+                    JOIN tags t ON t.id = et.tag_id
+                    WHERE et.expense_id IN ({placeholders})
+                    ORDER BY t.name
+                ''', chunk).fetchall()
+                
+                for row in rows:
+                    tags_by_expense[row['expense_id']].append(row['name'])
+        
+        return tags_by_expense
+    
+    @staticmethod
+    def with_tags(expenses):
+        """Return expenses as dicts with a comma-separated 'tags' field attached."""
+        expenses = [dict(expense) for expense in expenses]
+        tags_by_expense = Expense.get_tags_bulk(expense['id'] for expense in expenses)
+        
+        for expense in expenses:
+            expense['tags'] = ','.join(tags_by_expense[expense['id']])
+        
+        return expenses
+    
+    @staticmethod
+    def validate(form_data, currency=DEFAULT_CURRENCY):
+        """Validate expense data; currency is used when the data names none, as in create."""
         errors = []
         
         # Description validation
         if not form_data.get('description') or len(form_data.get('description', '').strip()) < 2:
             errors.append('Description must be at least 2 characters long')
         
-        # Amount validation
-        try:
-            amount = float(form_data.get('amount', 0))
-            if amount <= 0:
-                errors.append('Amount must be greater than zero')
-        except ValueError:
-            errors.append('Amount must be a valid number')
+        # Currency validation, before the amount is parsed in it
+        currency = form_data.get('currency') or currency
+        if currency not in CURRENCIES:
+            errors.append('Unknown currency')
+        else:
+            # Amount validation, rounded to the minor units it will be stored in
+            try:
+                amount = Money.parse(form_data.get('amount', 0), currency)
+                if amount <= 0:
+                    errors.append('Amount must be greater than zero')
+            except ValueError:
+                errors.append('Amount must be a valid number')
         
         # Category validation
         if not form_data.get('category'):
@@ -276,10 +549,29 @@ class Expense:
         try:
             date_str = form_data.get('date', '')
             if date_str:
-                datetime.strptime(date_str, DATE_FORMAT)
+                _parse_date(date_str)
             else:
                 errors.append('Date is required')
         except ValueError:
             errors.append('Invalid date format')
         
-        return errors 
\ No newline at end of file
+        return errors 
+
+class ExpenseStream:
+    """Lazily re-iterable view over all matching expenses, for streamed rendering.
+    
+    Each iteration walks the table again page by page, so templates can loop
+    over it more than once without the full result ever being held in memory.
+    """
+    
+    def __init__(self, filters=None, tag_name=None):
+        self.filters = filters
+        self.tag_name = tag_name
+    
+    def __iter__(self):
+        return Expense.iter_all(self.filters, self.tag_name)
+    
+    def __bool__(self):
+        if self.tag_name:
+            return bool(Expense.get_by_tag(self.tag_name, self.filters, page_size=1))
+        return bool(Expense.get_all(self.filters, page_size=1))
\ No newline at end of file
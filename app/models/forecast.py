@@ -0,0 +1,265 @@
+from datetime import date
+import numpy as np
+from app.database import get_db_connection
+from app.money import Money
+from app.fx import get_fx_rates
+from app.config import DEFAULT_CURRENCY
+
+# Months of history loaded for fitting
+FORECAST_HISTORY_MONTHS = 24
+
+# Months of history shown on the forecasts page
+FORECAST_DISPLAY_MONTHS = 6
+
+# Most recent months held out to score each method
+BACKTEST_MONTHS = 3
+
+MOVING_AVERAGE_WINDOW = 3
+SMOOTHING_ALPHA = 0.5
+
+def _shift_month(month, offset):
+    """Shift a YYYY-MM string by offset months."""
+    year, number = map(int, month.split('-'))
+    index = year * 12 + number - 1 + offset
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+def _moving_average(history):
+    """Mean of the last few months, per category."""
+    return history[-MOVING_AVERAGE_WINDOW:].mean(axis=0)
+
+def _exp_smoothing(history):
+    """Simple exponential smoothing level after the last month, per category."""
+    months = len(history)
+    # level = sum of alpha * (1 - alpha)^k * x[t-k], with the first month carrying the remaining weight
+    weights = SMOOTHING_ALPHA * (1 - SMOOTHING_ALPHA) ** np.arange(months - 1, -1, -1)
+    weights[0] = (1 - SMOOTHING_ALPHA) ** (months - 1)
+    return weights @ history
+
+def _linear_trend(history):
+    """Least-squares line through every category, extended one month."""
+    months = len(history)
+    if months < 2:
+        return history[-1].copy()
+    slope, intercept = np.polyfit(np.arange(months), history, 1)
+    return np.maximum(slope * months + intercept, 0)
+
+def _seasonal_naive(history):
+    """Same month last year, falling back to the moving average without a year of history."""
+    if len(history) < 12:
+        return _moving_average(history)
+    return history[-12].copy()
+
+# Forecast methods; each maps a (months x categories) history to one value per category
+FORECAST_METHODS = {
+    'moving_average': _moving_average,
+    'exp_smoothing': _exp_smoothing,
+    'linear_trend': _linear_trend,
+    'seasonal_naive': _seasonal_naive
+}
+
+def _accuracy(predicted, actual):
+    """Accuracy in percent: 100 minus the absolute percentage error, floored at 0."""
+    if actual <= 0:
+        return 100.0 if predicted <= 0 else 0.0
+    return max(0.0, 100.0 - abs(predicted - actual) / actual * 100)
+
+class ExpenseForecast:
+    """Model for forecasting next month's spending per category.
+    
+    Monthly totals come from the monthly rollup in one query as a
+    months x categories NumPy matrix, so each method forecasts every
+    category at once. Methods are scored by backtesting on the most recent
+    months and the best one is used.
+    """
+    
+    @staticmethod
+    def previous_month(month):
+        """Get the YYYY-MM month before month."""
+        return _shift_month(month, -1)
+    
+    @staticmethod
+    def load_matrix(first_month, last_month, category=None, currency=DEFAULT_CURRENCY):
+        """Load monthly totals as (months, categories, matrix) for an inclusive month range.
+        
+        Totals are in currency (one of CURRENCIES), in major units.
+        """
+        total = get_fx_rates().convert_sql('r.total', 'r.currency', 'r.month', currency)
+        query = f'''
+            SELECT r.month, r.category, SUM({total}) as total FROM expense_monthly_rollup r
+            WHERE r.month BETWEEN ? AND ?
+        '''
+        params = [first_month, last_month]
+        
+        if category:
+            query += ' AND r.category = ?'
+            params.append(category)
+        
+        query += ' GROUP BY r.month, r.category'
+        
+        with get_db_connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        months = []
+        month = first_month
+        while month <= last_month:
+            months.append(month)
+            month = _shift_month(month, 1)
+        
+        categories = sorted({row['category'] for row in rows})
+        month_index = {value: index for index, value in enumerate(months)}
+        category_index = {value: index for index, value in enumerate(categories)}
+        
+        matrix = np.zeros((len(months), len(categories)))
+        if rows:
+            matrix[
+                [month_index[row['month']] for row in rows],
+                [category_index[row['category']] for row in rows]
+            ] = [float(Money(row['total'] or 0, currency)) for row in rows]
+        
+        return months, categories, matrix
+    
+    @staticmethod
+    def backtest(matrix, months=BACKTEST_MONTHS):
+        """Score every method on the last months of history.
+        
+        Each held-out month is forecast from the months before it. Returns
+        {method: {'accuracy': mean accuracy of the total, 'predictions':
+        [(month_offset, per-category forecast)]}} for methods with enough
+        history, where month_offset indexes into matrix.
+        """
+        months = min(months, len(matrix) - 2)
+        results = {}
+        if months < 1:
+            return results
+        
+        for name, method in FORECAST_METHODS.items():
+            predictions = []
+            scores = []
+            for offset in range(len(matrix) - months, len(matrix)):
+                predicted = method(matrix[:offset])
+                predictions.append((offset, predicted))
+                scores.append(_accuracy(predicted.sum(), matrix[offset].sum()))
+            results[name] = {'accuracy': float(np.mean(scores)), 'predictions': predictions}
+        
+        return results
+    
+    @staticmethod
+    def forecast(last_month, category=None, currency=DEFAULT_CURRENCY):
+        """Forecast the month after last_month from the history up to it.
+        
+        Amounts are in currency, in major units. Returns a dict with
+        'target_month', 'history' (the months shown on the page, newest
+        first), 'prediction' (None without history) and 'backtest' (method
+        -> accuracy). The result only holds plain Python types so it can be
+        cached.
+        """
+        first_month = _shift_month(last_month, 1 - FORECAST_HISTORY_MONTHS)
+        months, categories, matrix = ExpenseForecast.load_matrix(first_month, last_month, category, currency)
+        
+        # Drop the empty months before spending was first recorded
+        active = np.flatnonzero(matrix.sum(axis=1) > 0)
+        if len(active):
+            months, matrix = months[active[0]:], matrix[active[0]:]
+        
+        history = []
+        for index in range(len(months) - 1, max(len(months) - 1 - FORECAST_DISPLAY_MONTHS, -1), -1):
+            total = float(matrix[index].sum())
+            if total > 0:
+                expenses = [
+                    {'category': categories[column], 'total': float(matrix[index, column])}
+                    for column in np.argsort(-matrix[index])
+                    if matrix[index, column] > 0
+                ]
+                history.append({'year_month': months[index], 'expenses': expenses, 'total': total})
+        
+        result = {
+            'target_month': _shift_month(last_month, 1),
+            'history': history,
+            'prediction': None,
+            'backtest': {}
+        }
+        if not len(active):
+            return result
+        
+        scores = ExpenseForecast.backtest(matrix)
+        best = max(scores, key=lambda name: scores[name]['accuracy']) if scores else 'moving_average'
+        amounts = FORECAST_METHODS[best](matrix)
+        
+        # Share of the history months with any spending in each category
+        frequency = (matrix > 0).mean(axis=0) * 100
+        
+        predicted_categories = [
+            {'category': categories[column], 'amount': float(amounts[column]), 'frequency': float(frequency[column])}
+            for column in range(len(categories))
+            if amounts[column] > 0
+        ]
+        predicted_categories.sort(key=lambda item: item['frequency'], reverse=True)
+        
+        result['prediction'] = {
+            'total': float(amounts.sum()),
+            'categories': predicted_categories,
+            'method': best,
+            'accuracy': scores[best]['accuracy'] if scores else None,
+            'methods': {name: float(method(matrix).sum()) for name, method in FORECAST_METHODS.items()}
+        }
+        result['backtest'] = {name: score['accuracy'] for name, score in scores.items()}
+        
+        if category is None:
+            if currency == DEFAULT_CURRENCY:
+                ExpenseForecast.record(months, categories, matrix, scores, best, result)
+            else:
+                # Stored predictions are kept in the default currency
+                ExpenseForecast.forecast(last_month)
+        
+        return result
+    
+    @staticmethod
+    def record(months, categories, matrix, scores, best, result):
+        """Write the backtest and the forward forecast of the best method to the predictions tables.
+        
+        Earlier rows for the same target months are replaced, so recording
+        the same forecast again is harmless.
+        """
+        rows = [
+            (months[offset], predicted, matrix[offset])
+            for offset, predicted in scores.get(best, {}).get('predictions', [])
+        ]
+        rows.append((result['target_month'], FORECAST_METHODS[best](matrix), None))
+        targets = [row[0] for row in rows]
+        placeholders = ','.join('?' * len(targets))
+        today = date.today().isoformat()
+        
+        with get_db_connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(f'''
+                    DELETE FROM prediction_categories WHERE prediction_id IN (
+                        SELECT id FROM predictions WHERE target_month IN ({placeholders})
+                    )
+                ''', targets)
+                conn.execute(f'DELETE FROM predictions WHERE target_month IN ({placeholders})', targets)
+                
+                for target_month, predicted, actual in rows:
+                    actual_total = float(actual.sum()) if actual is not None else None
+                    prediction_id = conn.execute('''
+                        INSERT INTO predictions (target_month, predicted_amount, actual_amount, prediction_date, accuracy, notes)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (
+                        target_month, float(predicted.sum()), actual_total, today,
+                        _accuracy(predicted.sum(), actual_total) if actual is not None else None,
+                        best
+                    )).lastrowid
+                    
+                    conn.executemany('''
+                        INSERT INTO prediction_categories (prediction_id, category, predicted_amount, actual_amount)
+                        VALUES (?, ?, ?, ?)
+                    ''', [
+                        (prediction_id, category, float(predicted[column]),
+                         float(actual[column]) if actual is not None else None)
+                        for column, category in enumerate(categories)
+                    ])
+                
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
@@ -0,0 +1,99 @@
+from datetime import date, datetime
+from app.database import get_db_connection, get_last_expense_id
+from app.config import DATE_FORMAT, RECURRING_INTERVALS
+from app.utils import get_recurring_date
+
+# Number of generated expenses written per executemany call
+RECURRING_BATCH_SIZE = 1000
+
+class RecurringExpense:
+    """Model for materializing recurring expenses into real expense rows.
+    
+    Every expense with recurring set is the template of a series: its own
+    date is the first occurrence and each later one is a copy (description,
+    amount, category and tags, not itself recurring) dated by
+    get_recurring_date. recurring_schedule records how many copies exist,
+    so running materialize() again only adds occurrences that became due.
+    """
+    
+    @staticmethod
+    def _due_dates(template, generated, today):
+        """Get the dates of the occurrences after the first generated ones that are due by today."""
+        try:
+            base_date = datetime.strptime(template['date'], DATE_FORMAT).date()
+        except ValueError:
+            return []
+        
+        dates = []
+        occurrence = generated + 1
+        while True:
+            due = get_recurring_date(base_date, template['recurring_interval'], occurrence)
+            if due is None or due > today:
+                return dates
+            dates.append(due.strftime(DATE_FORMAT))
+            occurrence += 1
+    
+    @staticmethod
+    def materialize(today=None, batch_size=RECURRING_BATCH_SIZE):
+        """Generate every occurrence due by today in a single transaction.
+        
+        Takes the write lock up front, so concurrent runs (several workers,
+        cron overlapping the background thread) serialize and the second
+        finds nothing left to do. Returns {'templates': series advanced,
+        'generated': expenses created}.
+        """
+        today = today or date.today()
+        summary = {'templates': 0, 'generated': 0}
+        
+        with get_db_connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                placeholders = ','.join('?' * len(RECURRING_INTERVALS))
+                templates = conn.execute(f'''
+                    SELECT e.id, e.description, e.amount, e.currency, e.category, e.date, e.recurring_interval,
+                           COALESCE(s.occurrences, 0) as occurrences
+                    FROM expenses e
+                    LEFT JOIN recurring_schedule s ON s.template_id = e.id
+                    WHERE e.recurring = 1 AND e.recurring_interval IN ({placeholders})
+                ''', RECURRING_INTERVALS).fetchall()
+                
+                for template in templates:
+                    dates = RecurringExpense._due_dates(template, template['occurrences'], today)
+                    if not dates:
+                        continue
+                    
+                    first_id = get_last_expense_id(conn) + 1
+                    for start in range(0, len(dates), batch_size):
+                        conn.executemany('''
+                            INSERT INTO expenses (description, amount, currency, category, date, recurring, recurring_interval)
+                            VALUES (?, ?, ?, ?, ?, 0, NULL)
+                        ''', [
+                            (template['description'], template['amount'], template['currency'], template['category'], due)
+                            for due in dates[start:start + batch_size]
+                        ])
+                    
+                    # The write lock is held, so the copies got consecutive IDs
+                    conn.execute('''
+                        INSERT INTO expense_tags (expense_id, tag_id)
+                        SELECT e.id, et.tag_id
+                        FROM expenses e, expense_tags et
+                        WHERE e.id BETWEEN ? AND ? AND et.expense_id = ?
+                    ''', (first_id, get_last_expense_id(conn), template['id']))
+                    
+                    conn.execute('''
+                        INSERT INTO recurring_schedule (template_id, occurrences, last_generated)
+                        VALUES (?, ?, ?)
+                        ON CONFLICT (template_id) DO UPDATE SET
+                            occurrences = excluded.occurrences,
+                            last_generated = excluded.last_generated
+                    ''', (template['id'], template['occurrences'] + len(dates), dates[-1]))
+                    
+                    summary['templates'] += 1
+                    summary['generated'] += len(dates)
+                
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        
+        return summary
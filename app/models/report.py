@@ -0,0 +1,212 @@
+from app.database import get_db_connection
+from app.models.rollup import _rollup_source
+from app.models.timeseries import BUCKET_SQL, TIME_BUCKETS
+from app.money import Money
+from app.fx import get_fx_rates, target_currency
+from app.config import CURRENCIES
+
+# Grouping dimensions a report can be broken down by
+REPORT_DIMENSIONS = TIME_BUCKETS + ['category', 'tag']
+
+# Title of a single-dimension report on the reports page
+REPORT_LABELS = {
+    'day': 'Daily',
+    'week': 'Weekly',
+    'month': 'Monthly',
+    'quarter': 'Quarterly',
+    'category': 'Category',
+    'tag': 'Tag'
+}
+
+# Label used in the tag dimension for expenses without tags
+UNTAGGED = ''
+
+def _column_name(dimension):
+    """Get the result column for a dimension; all time buckets share 'period'."""
+    return 'period' if dimension in TIME_BUCKETS else dimension
+
+def _parse_dimensions(dimensions):
+    """Validate a grouping spec: known dimensions, no repeats, at most one time bucket.
+    
+    Raises ValueError naming the first offending dimension.
+    """
+    result = []
+    for dimension in dimensions or []:
+        if dimension not in REPORT_DIMENSIONS:
+            raise ValueError(f'Unknown dimension: {dimension}')
+        if dimension in result:
+            raise ValueError(f'Repeated dimension: {dimension}')
+        if dimension in TIME_BUCKETS and any(d in TIME_BUCKETS for d in result):
+            raise ValueError(f'Only one time bucket per report: {dimension}')
+        result.append(dimension)
+    return result
+
+def _compile_level(dimensions, grouped, filters):
+    """Compile one grouping level to a SELECT and its parameters.
+    
+    grouped is the prefix of dimensions aggregated at this level; the other
+    dimension columns are NULL. Levels that need neither tags nor a tag
+    filter read the daily or monthly rollup instead of the expenses.
+    """
+    needs_tags = 'tag' in grouped or filters.get('tag')
+    bucket = next((d for d in grouped if d in TIME_BUCKETS), None)
+    
+    if needs_tags:
+        date_column, category_column = 'e.date', 'e.category'
+        source = ' FROM expenses e'
+        if 'tag' in grouped:
+            source += '''
+                LEFT JOIN expense_tags et ON et.expense_id = e.id
+                LEFT JOIN tags t ON t.id = et.tag_id
+            '''
+        where, params = ' WHERE 1=1', []
+        
+        if filters.get('from_date'):
+            where += ' AND e.date >= ?'
+            params.append(filters['from_date'])
+        
+        if filters.get('to_date'):
+            where += ' AND e.date <= ?'
+            params.append(filters['to_date'])
+        
+        if filters.get('category'):
+            where += ' AND e.category = ?'
+            params.append(filters['category'])
+        
+        if filters.get('tag'):
+            where += '''
+                AND e.id IN (
+                    SELECT et2.expense_id FROM expense_tags et2
+                    JOIN tags t2 ON t2.id = et2.tag_id
+                    WHERE t2.name = ?
+                )
+            '''
+            params.append(filters['tag'])
+        
+        amount = get_fx_rates().convert_sql('e.amount', 'e.currency', 'substr(e.date, 1, 7)', target_currency(filters))
+        total, count = f'SUM({amount})', 'COUNT(*)'
+    else:
+        # Days and weeks can only come from the daily rollup
+        table, date_column, where, params = _rollup_source(filters, daily_only=bucket in ('day', 'week'))
+        source = f' FROM {table}'
+        category_column = 'category'
+        total, count = 'SUM(total)', 'SUM(count)'
+    
+    expressions = {
+        'category': category_column,
+        'tag': f"COALESCE(t.name, '{UNTAGGED}')"
+    }
+    if bucket:
+        expressions[bucket] = BUCKET_SQL[bucket].format(col=date_column)
+    
+    select = []
+    for dimension in dimensions:
+        expression = expressions[dimension] if dimension in grouped else 'NULL'
+        select.append(f'{expression} as {_column_name(dimension)}')
+    select += [f'{total} as total', f'{count} as count', f'{len(grouped)} as level']
+    
+    query = f"SELECT {', '.join(select)}{source}{where}"
+    if grouped:
+        query += ' GROUP BY ' + ', '.join(_column_name(d) for d in grouped)
+    
+    return query, params
+
+class ExpenseReport:
+    """Aggregation engine behind the expense reports.
+    
+    A report is grouped by a list of dimensions (at most one time bucket of
+    day/week/month/quarter, plus category and/or tag) and is compiled to a
+    single SQL statement. With subtotals, every prefix of the dimension list
+    down to the grand total is added as its own level (UNION ALL), each
+    aggregated from the source so that an expense with several tags is
+    only counted once outside the tag level. Filters support from_date,
+    to_date, category and tag; totals are in filters['currency'] (default:
+    the default currency), converted inside the statement.
+    """
+    
+    @staticmethod
+    def run(dimensions, filters=None, subtotals=False):
+        """Run a report and return it in columnar form.
+        
+        Returns a dict with 'dimensions' (the validated spec), 'currency'
+        (of the totals), 'columns' (the column names, dimension columns
+        first, then total, count and level) and 'data' (column name -> list
+        of values). level is the number of dimensions grouped in a row;
+        subtotal rows have NULL in the dimension columns they roll up and
+        follow the rows they summarize.
+        
+        Raises ValueError for an invalid spec; see validate.
+        """
+        filters = filters or {}
+        dimensions = _parse_dimensions(dimensions)
+        
+        levels = [len(dimensions)]
+        if subtotals:
+            levels += range(len(dimensions) - 1, -1, -1)
+        
+        queries, params = [], []
+        for level in levels:
+            query, level_params = _compile_level(dimensions, dimensions[:level], filters)
+            queries.append(query)
+            params += level_params
+        
+        columns = [_column_name(d) for d in dimensions] + ['total', 'count', 'level']
+        
+        # Detail rows first within each group, subtotal after them
+        order = [f'{name} IS NULL, {name}' for name in columns[:len(dimensions)]]
+        query = 'SELECT * FROM (' + ' UNION ALL '.join(queries) + ')'
+        if order:
+            query += ' ORDER BY ' + ', '.join(order)
+        
+        with get_db_connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        data = {name: [row[index] for row in rows] for index, name in enumerate(columns)}
+        # Sums of minor units; NULL when a level has no expenses
+        currency = target_currency(filters)
+        data['total'] = [Money(value or 0, currency) for value in data['total']]
+        data['count'] = [value or 0 for value in data['count']]
+        
+        return {
+            'dimensions': dimensions,
+            'currency': currency,
+            'columns': columns,
+            'data': data
+        }
+    
+    @staticmethod
+    def validate(dimensions, filters=None):
+        """Validate a grouping spec and the report currency, returning a list of errors."""
+        errors = []
+        
+        try:
+            _parse_dimensions(dimensions)
+        except ValueError as exc:
+            errors.append(str(exc))
+        
+        currency = (filters or {}).get('currency')
+        if currency and currency not in CURRENCIES:
+            errors.append(f'Unknown currency: {currency}')
+        
+        return errors
+    
+    @staticmethod
+    def rows(report, level=None):
+        """Turn a columnar report into a list of row dicts, optionally of one level only."""
+        columns = report['columns']
+        rows = [dict(zip(columns, values)) for values in zip(*(report['data'][name] for name in columns))]
+        if level is not None:
+            rows = [row for row in rows if row['level'] == level]
+        return rows
+    
+    @staticmethod
+    def summary(report):
+        """Get grand total, count and average from a report run with subtotals."""
+        grand = ExpenseReport.rows(report, level=0)
+        total = grand[0]['total'] if grand else Money(0, report['currency'])
+        count = grand[0]['count'] if grand else 0
+        return {
+            'grand_total': total,
+            'total_count': count,
+            'average': total / count if count else Money(0, report['currency'])
+        }
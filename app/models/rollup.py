@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta
+from app.database import get_db_connection
+from app.migrations import rebuild_rollups, bump_data_version
+from app.config import DATE_FORMAT
+from app.money import Money
+from app.fx import get_fx_rates, target_currency
+
+def _month_bounds(filters):
+    """Get (first_month, last_month) if the date range covers whole months, else None."""
+    from_date = filters.get('from_date')
+    to_date = filters.get('to_date')
+    
+    try:
+        if from_date and datetime.strptime(from_date, DATE_FORMAT).day != 1:
+            return None
+        if to_date and (datetime.strptime(to_date, DATE_FORMAT) + timedelta(days=1)).day != 1:
+            return None
+    except ValueError:
+        return None
+    
+    return (from_date[:7] if from_date else None, to_date[:7] if to_date else None)
+
+def _rollup_source(filters, daily_only=False):
+    """Pick the rollup table for a filter set and build its WHERE clause.
+    
+    Month-aligned ranges read the monthly rollup; anything else reads the
+    daily one. The table is returned as a subquery with total and
+    max_amount converted into the filters' currency (see app.fx), which
+    SQLite flattens into the caller's query, so the WHERE clause still
+    reaches the rollup's index. Returns (table, key_column, where_clause, params).
+    """
+    filters = filters or {}
+    months = None if daily_only else _month_bounds(filters)
+    
+    if months:
+        rollup, key, month, (lower, upper) = 'expense_monthly_rollup', 'month', 'r.month', months
+    else:
+        rollup, key, month = 'expense_daily_rollup', 'day', 'substr(r.day, 1, 7)'
+        lower, upper = filters.get('from_date'), filters.get('to_date')
+    
+    rates = get_fx_rates()
+    target = target_currency(filters)
+    table = f'''(
+        SELECT r.{key}, r.category, r.count,
+               {rates.convert_sql('r.total', 'r.currency', month, target)} as total,
+               {rates.convert_sql('r.max_amount', 'r.currency', month, target)} as max_amount
+        FROM {rollup} r
+    )'''
+    
+    where = ' WHERE 1=1'
+    params = []
+    
+    if lower:
+        where += f' AND {key} >= ?'
+        params.append(lower)
+    
+    if upper:
+        where += f' AND {key} <= ?'
+        params.append(upper)
+    
+    if filters.get('category'):
+        where += ' AND category = ?'
+        params.append(filters['category'])
+    
+    return table, key, where, params
+
+class ExpenseRollup:
+    """Model for reading the pre-aggregated daily and monthly expense rollups.
+    
+    The rollup tables are maintained by triggers on the expenses table, so
+    they are always current; rebuild() exists for backfills and repairs.
+    Filters support from_date, to_date and category.
+    """
+    
+    @staticmethod
+    def rebuild():
+        """Recompute the rollup tables from scratch."""
+        with get_db_connection() as conn:
+            conn.execute('BEGIN')
+            try:
+                rebuild_rollups(conn)
+                # Cached aggregates may have been read from the damaged rollups
+                bump_data_version(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            
+            daily = conn.execute('SELECT COUNT(*) FROM expense_daily_rollup').fetchone()[0]
+            monthly = conn.execute('SELECT COUNT(*) FROM expense_monthly_rollup').fetchone()[0]
+            return {'daily': daily, 'monthly': monthly}
+    
+    @staticmethod
+    def get_total(currency=None):
+        """Get the sum of all expenses, in currency (default: the default currency)."""
+        filters = {'currency': currency}
+        table, _, _, _ = _rollup_source(filters)
+        
+        with get_db_connection() as conn:
+            result = conn.execute(f'SELECT SUM(total) as total FROM {table}').fetchone()
+            return Money(result['total'] or 0, target_currency(filters))
+    
+    @staticmethod
+    def get_statistics(filters=None):
+        """Get expense statistics (total, average, max, count) in the filters' currency."""
+        table, _, where, params = _rollup_source(filters)
+        currency = target_currency(filters)
+        
+        with get_db_connection() as conn:
+            stats = conn.execute(f'''
+                SELECT SUM(total) as total, SUM(count) as count, MAX(max_amount) as max
+                FROM {table}{where}
+            ''', params).fetchone()
+        
+        total = Money(stats['total'] or 0, currency)
+        count = stats['count'] if stats['count'] else 0
+        return {
+            'total': total,
+            'average': total / count if count else Money(0, currency),
+            'max': Money(stats['max'] or 0, currency),
+            'count': count
+        }
+    
+    @staticmethod
+    def get_category_totals(filters=None):
+        """Get expense totals grouped by category, largest first, in the filters' currency."""
+        table, _, where, params = _rollup_source(filters)
+        currency = target_currency(filters)
+        
+        with get_db_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT category, SUM(total) as total, SUM(count) as count
+                FROM {table}{where}
+                GROUP BY category
+                ORDER BY total DESC
+            ''', params).fetchall()
+        
+        return [
+            {'category': row['category'], 'total': Money(row['total'] or 0, currency), 'count': row['count']}
+            for row in rows
+        ]
+    
+    @staticmethod
+    def get_period_totals(filters=None, grouping='month'):
+        """Get totals (in the filters' currency) and counts grouped by 'month', 'week' or 'category'."""
+        if grouping == 'category':
+            return ExpenseRollup.get_category_totals(filters)
+        
+        # Weeks straddle months, so they can only come from the daily rollup
+        table, key, where, params = _rollup_source(filters, daily_only=(grouping == 'week'))
+        
+        if key == 'month':
+            period = 'month'
+        elif grouping == 'week':
+            period = "strftime('%Y-W%W', day)"
+        else:
+            period = 'substr(day, 1, 7)'
+        
+        currency = target_currency(filters)
+        with get_db_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {period} as period, SUM(total) as total, SUM(count) as count
+                FROM {table}{where}
+                GROUP BY period
+                ORDER BY period
+            ''', params).fetchall()
+        
+        return [
+            {'period': row['period'], 'total': Money(row['total'] or 0, currency), 'count': row['count']}
+            for row in rows
+        ]
+    
+    @staticmethod
+    def get_categories():
+        """Get the distinct categories that have expenses."""
+        with get_db_connection() as conn:
+            rows = conn.execute('SELECT DISTINCT category FROM expense_monthly_rollup ORDER BY category').fetchall()
+            return [row['category'] for row in rows]
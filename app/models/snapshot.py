@@ -0,0 +1,236 @@
+import threading
+from datetime import datetime
+import numpy as np
+from app.database import get_db_connection
+from app.config import DATE_FORMAT
+from app.money import Money
+from app.fx import get_fx_rates, target_currency
+
+# Reload everything instead of patching when more expenses than this changed
+FULL_RELOAD_CHANGES = 50000
+
+# Reads an amount as its raw integer minor units, bypassing the Money converter
+_MINOR_SQL = 'CAST({column} AS INTEGER)'
+
+# Converts SQLite dates to proleptic Gregorian ordinals (date.toordinal())
+_ORDINAL_SQL = 'CAST(julianday({column}) - 1721424.5 AS INTEGER)'
+
+# date.toordinal() of 1970-01-01, the epoch of NumPy datetime64
+_EPOCH_ORDINAL = 719163
+
+def _ordinal(value, default):
+    """Convert an optional YYYY-MM-DD string to a date ordinal."""
+    try:
+        return datetime.strptime(value, DATE_FORMAT).toordinal() if value else default
+    except ValueError:
+        return default
+
+def _month_starts(dates):
+    """Map an array of date ordinals to the ordinals of the first days of their months."""
+    days = (dates.astype(np.int64) - _EPOCH_ORDINAL).astype('datetime64[D]')
+    return days.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) + _EPOCH_ORDINAL
+
+class _Columns:
+    """Immutable set of expense columns sorted by date; replaced whole on refresh."""
+    
+    __slots__ = ('ids', 'dates', 'amounts', 'codes', 'currencies', 'months')
+    
+    def __init__(self, ids, dates, amounts, codes, currencies):
+        order = np.argsort(dates, kind='stable')
+        self.ids = ids[order]
+        self.dates = dates[order]
+        self.amounts = amounts[order]
+        self.codes = codes[order]
+        self.currencies = currencies[order]
+        # Amounts convert at the rate of their month's first day (see app.fx)
+        self.months = _month_starts(self.dates)
+    
+    def select(self, filters):
+        """Get the [start, stop) bounds of a date range filter within the sorted columns."""
+        lower = _ordinal(filters.get('from_date'), None)
+        upper = _ordinal(filters.get('to_date'), None)
+        start = np.searchsorted(self.dates, lower, 'left') if lower is not None else 0
+        stop = np.searchsorted(self.dates, upper, 'right') if upper is not None else len(self.dates)
+        return start, stop
+
+class ExpenseSnapshot:
+    """Column-oriented in-memory copy of the expenses for dashboard aggregates.
+    
+    Holds IDs, dates (as ordinals), amounts (int64 minor units), category codes
+    (int16) and currency codes (int8) in NumPy arrays sorted by date, so a
+    date range is a pair of binary searches and aggregates are vectorized
+    over a slice. Before each read the snapshot catches up with the
+    expense_changes log and reloads only the expenses written since; other
+    processes' writes are seen too. Filters support from_date, to_date,
+    category and currency (the currency totals are reported in).
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns = None
+        self._categories = []
+        self._codes = {}
+        self._currencies = []
+        self._currency_codes = {}
+        self._seq = 0
+    
+    def _code(self, category):
+        """Get the small integer code of a category, assigning one if new."""
+        code = self._codes.get(category)
+        if code is None:
+            code = self._codes[category] = len(self._categories)
+            self._categories.append(category)
+        return code
+    
+    def _currency_code(self, currency):
+        """Get the small integer code of a currency, assigning one if new."""
+        code = self._currency_codes.get(currency)
+        if code is None:
+            code = self._currency_codes[currency] = len(self._currencies)
+            self._currencies.append(currency)
+        return code
+    
+    def _arrays(self, rows):
+        """Build (ids, dates, amounts, codes, currencies) arrays from (id, ordinal, amount, category, currency) rows."""
+        count = len(rows)
+        return (
+            np.fromiter((row[0] for row in rows), np.int64, count),
+            np.fromiter((row[1] for row in rows), np.int32, count),
+            np.fromiter((row[2] for row in rows), np.int64, count),
+            np.fromiter((self._code(row[3]) for row in rows), np.int16, count),
+            np.fromiter((self._currency_code(row[4]) for row in rows), np.int8, count)
+        )
+    
+    def refresh(self):
+        """Bring the snapshot up to date with the database and return its columns."""
+        with self._lock:
+            with get_db_connection() as conn:
+                # Separate subqueries so each is a single B-tree seek
+                low, high = conn.execute('''
+                    SELECT (SELECT MIN(seq) FROM expense_changes), (SELECT MAX(seq) FROM expense_changes)
+                ''').fetchone()
+                high = high or 0
+                
+                if self._columns is not None and high == self._seq:
+                    return self._columns
+                
+                # Entries we have not seen were pruned, or too much changed to patch
+                full = (self._columns is None or (low or 0) > self._seq + 1
+                        or high - self._seq > FULL_RELOAD_CHANGES)
+                
+                if full:
+                    rows = conn.execute(f'''
+                        SELECT id, {_ORDINAL_SQL.format(column='date')}, {_MINOR_SQL.format(column='amount')}, category, currency FROM expenses
+                        WHERE julianday(date) IS NOT NULL
+                    ''').fetchall()
+                    self._columns = _Columns(*self._arrays(rows))
+                else:
+                    changed = conn.execute(f'''
+                        SELECT c.expense_id, e.id as present, {_ORDINAL_SQL.format(column='e.date')}, {_MINOR_SQL.format(column='e.amount')}, e.category, e.currency
+                        FROM (SELECT DISTINCT expense_id FROM expense_changes WHERE seq > ?) c
+                        LEFT JOIN expenses e ON e.id = c.expense_id
+                    ''', (self._seq,)).fetchall()
+                    
+                    columns = self._columns
+                    keep = ~np.isin(columns.ids, [row[0] for row in changed])
+                    fresh = self._arrays([(row[0], row[2], row[3], row[4], row[5])
+                                          for row in changed if row[1] is not None and row[2] is not None])
+                    self._columns = _Columns(
+                        np.concatenate([columns.ids[keep], fresh[0]]),
+                        np.concatenate([columns.dates[keep], fresh[1]]),
+                        np.concatenate([columns.amounts[keep], fresh[2]]),
+                        np.concatenate([columns.codes[keep], fresh[3]]),
+                        np.concatenate([columns.currencies[keep], fresh[4]])
+                    )
+                
+                self._seq = high
+                return self._columns
+    
+    def _slice(self, filters):
+        """Get (ids, amounts, codes, currencies, months) arrays for the expenses matching filters."""
+        filters = filters or {}
+        columns = self.refresh()
+        start, stop = columns.select(filters)
+        arrays = tuple(array[start:stop] for array in
+                       (columns.ids, columns.amounts, columns.codes, columns.currencies, columns.months))
+        
+        if filters.get('category'):
+            code = self._codes.get(filters['category'])
+            mask = arrays[2] == code if code is not None else np.zeros(len(arrays[2]), bool)
+            arrays = tuple(array[mask] for array in arrays)
+        
+        return arrays
+    
+    def _converted(self, amounts, currencies, months, target):
+        """Convert minor unit amounts into float64 minor units of target, one vectorized pass per currency.
+        
+        Currencies without quotes convert at face value, like in the SQL
+        aggregates (see app.fx), so every amount has a value.
+        """
+        rates = get_fx_rates()
+        result = amounts.astype(np.float64)
+        target_rates = None
+        for code, currency in enumerate(self._currencies):
+            if currency == target:
+                continue
+            mask = currencies == code
+            if not mask.any():
+                continue
+            if target_rates is None:
+                target_rates = rates.minor_rates(target, months)
+            result[mask] *= rates.minor_rates(currency, months[mask]) / target_rates[mask]
+        return result
+    
+    def get_statistics(self, filters=None):
+        """Get expense statistics (total, average, max, count)."""
+        currency = target_currency(filters)
+        _, amounts, _, currencies, months = self._slice(filters)
+        amounts = self._converted(amounts, currencies, months, currency)
+        count = len(amounts)
+        total = Money(amounts.sum(), currency)
+        return {
+            'total': total,
+            'average': total / count if count else Money(0, currency),
+            'max': Money(amounts.max(), currency) if count else Money(0, currency),
+            'count': count
+        }
+    
+    def get_category_totals(self, filters=None):
+        """Get expense totals and counts per category, largest first."""
+        currency = target_currency(filters)
+        _, amounts, codes, currencies, months = self._slice(filters)
+        amounts = self._converted(amounts, currencies, months, currency)
+        size = len(self._categories)
+        # float64 sums of integers are exact below 2**53 minor units
+        totals = np.bincount(codes, weights=amounts, minlength=size)
+        counts = np.bincount(codes, minlength=size)
+        return [
+            {'category': self._categories[code], 'total': Money(totals[code], currency), 'count': int(counts[code])}
+            for code in np.argsort(-totals, kind='stable')
+            if counts[code]
+        ]
+    
+    def get_top_ids(self, k=5, filters=None):
+        """Get the IDs of the k largest expenses, largest first.
+        
+        Ranks by amount converted into the filters' currency, like
+        Expense.top_n.
+        """
+        ids, amounts, _, currencies, months = self._slice(filters)
+        amounts = self._converted(amounts, currencies, months, target_currency(filters))
+        if len(amounts) > k:
+            top = np.argpartition(-amounts, k)[:k]
+            ids, amounts = ids[top], amounts[top]
+        return [int(expense_id) for expense_id in ids[np.argsort(-amounts, kind='stable')]]
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def get_snapshot():
+    """Get the process-wide expense snapshot, creating it on first use."""
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = ExpenseSnapshot()
+    return _snapshot
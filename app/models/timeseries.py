@@ -0,0 +1,189 @@
+from datetime import date, datetime, timedelta
+from app.database import get_db_connection
+from app.config import DATE_FORMAT
+from app.money import Money
+from app.fx import get_fx_rates, target_currency
+
+# Supported bucket sizes, finest first
+TIME_BUCKETS = ['day', 'week', 'month', 'quarter']
+
+# Upper bound on the number of points returned per series
+MAX_CHART_POINTS = 500
+
+# SQL expression giving the bucket key of a YYYY-MM-DD column, per bucket size.
+# Weeks are keyed by their Monday; these keys must match _bucket_key below.
+BUCKET_SQL = {
+    'day': '{col}',
+    'week': "date({col}, 'weekday 0', '-6 days')",
+    'month': 'substr({col}, 1, 7)',
+    'quarter': "substr({col}, 1, 4) || '-Q' || ((CAST(substr({col}, 6, 2) AS INTEGER) + 2) / 3)"
+}
+
+def _bucket_start(day, bucket):
+    """Get the first date of the bucket containing day."""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    if bucket == 'quarter':
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    return day
+
+def _bucket_key(start, bucket):
+    """Format the key of the bucket starting on start, as the SQL expression does."""
+    # Not strftime, which drops the zero padding of years before 1000
+    if bucket == 'month':
+        return f'{start.year:04d}-{start.month:02d}'
+    if bucket == 'quarter':
+        return f'{start.year:04d}-Q{(start.month - 1) // 3 + 1}'
+    return start.isoformat()
+
+def _key_start(key, bucket):
+    """Parse a bucket key back into the bucket's first date."""
+    if bucket == 'month':
+        return datetime.strptime(key, '%Y-%m').date()
+    if bucket == 'quarter':
+        year, quarter = key.split('-Q')
+        return date(int(year), (int(quarter) - 1) * 3 + 1, 1)
+    return datetime.strptime(key, DATE_FORMAT).date()
+
+def _bucket_index(start, bucket):
+    """Number the bucket starting on start, consecutively from 0001-01-01."""
+    if bucket == 'week':
+        # 0001-01-01 (ordinal 1) is a Monday
+        return (start.toordinal() - 1) // 7
+    if bucket == 'month':
+        return start.year * 12 + start.month - 1
+    if bucket == 'quarter':
+        return start.year * 4 + (start.month - 1) // 3
+    return start.toordinal()
+
+def _index_start(index, bucket):
+    """Get the first date of the bucket numbered index by _bucket_index."""
+    if bucket == 'week':
+        return date.fromordinal(index * 7 + 1)
+    if bucket == 'month':
+        return date(index // 12, index % 12 + 1, 1)
+    if bucket == 'quarter':
+        return date(index // 4, index % 4 * 3 + 1, 1)
+    return date.fromordinal(index)
+
+def _parse_bound(value):
+    """Parse an optional YYYY-MM-DD filter value."""
+    try:
+        return datetime.strptime(value, DATE_FORMAT).date() if value else None
+    except ValueError:
+        return None
+
+class ExpenseTimeSeries:
+    """Model for expense totals bucketed over time, for charts."""
+    
+    @staticmethod
+    def _fetch(filters, bucket, tag_name):
+        """Get (bucket_key, category, total) rows with one grouped query.
+        
+        Without a tag filter the daily rollup is read; tag filters need the
+        raw expenses, reached through the tag and date indexes. Totals are
+        converted into the filters' currency in the same query.
+        """
+        rates = get_fx_rates()
+        target = target_currency(filters)
+        if tag_name:
+            column = 'e.date'
+            query = '''
+                FROM expenses e
+                JOIN expense_tags et ON et.expense_id = e.id
+                JOIN tags t ON t.id = et.tag_id
+                WHERE t.name = ?
+            '''
+            params = [tag_name]
+            category_column = 'e.category'
+            amount = f"SUM({rates.convert_sql('e.amount', 'e.currency', 'substr(e.date, 1, 7)', target)})"
+        else:
+            column = 'r.day'
+            query = ' FROM expense_daily_rollup r WHERE 1=1'
+            params = []
+            category_column = 'r.category'
+            amount = f"SUM({rates.convert_sql('r.total', 'r.currency', 'substr(r.day, 1, 7)', target)})"
+        
+        if filters.get('from_date'):
+            query += f' AND {column} >= ?'
+            params.append(filters['from_date'])
+        
+        if filters.get('to_date'):
+            query += f' AND {column} <= ?'
+            params.append(filters['to_date'])
+        
+        if filters.get('category'):
+            query += f' AND {category_column} = ?'
+            params.append(filters['category'])
+        
+        key = BUCKET_SQL[bucket].format(col=column)
+        
+        with get_db_connection() as conn:
+            return conn.execute(f'''
+                SELECT {key} as bucket, {category_column} as category, {amount} as total
+                {query}
+                GROUP BY bucket, {category_column}
+                ORDER BY bucket
+            ''', params).fetchall()
+    
+    @staticmethod
+    def get(filters=None, bucket='month', tag_name=None, max_points=MAX_CHART_POINTS):
+        """Get per-category totals per time bucket, gap-filled and bounded in size.
+        
+        Filters support from_date, to_date and category, and 'currency'
+        picks the currency totals are reported in. Every bucket in the
+        range is present, with zeros where nothing was spent. When there are
+        more than max_points buckets, runs of consecutive buckets are summed
+        into one point (labelled by the first), so totals are preserved.
+        The group size is worked out from the range before anything is
+        filled, so the work is bounded by max_points, not by the width of
+        the range. Returns a dict with 'bucket', 'group_size', 'labels',
+        'series' (category -> values) and 'totals'.
+        
+        Raises ValueError for a bucket not in TIME_BUCKETS.
+        """
+        filters = filters or {}
+        if bucket not in TIME_BUCKETS:
+            raise ValueError(f'Unknown bucket {bucket!r}; expected one of {", ".join(TIME_BUCKETS)}')
+        max_points = max(1, max_points)
+        
+        rows = ExpenseTimeSeries._fetch(filters, bucket, tag_name)
+        
+        lower = _parse_bound(filters.get('from_date'))
+        upper = _parse_bound(filters.get('to_date'))
+        if rows:
+            lower = lower or _key_start(rows[0]['bucket'], bucket)
+            upper = upper or _key_start(rows[-1]['bucket'], bucket)
+        
+        # Buckets between the bounds, summed in runs of group_size consecutive
+        # buckets so that at most max_points slots are ever allocated
+        first = last = 0
+        if lower and upper and lower <= upper:
+            first = _bucket_index(_bucket_start(lower, bucket), bucket)
+            last = _bucket_index(_bucket_start(upper, bucket), bucket) + 1
+        group_size = max(1, -(-(last - first) // max_points))
+        points = -(-(last - first) // group_size)
+        keys = [_bucket_key(_index_start(first + point * group_size, bucket), bucket) for point in range(points)]
+        
+        series = {}
+        for row in rows:
+            index = _bucket_index(_key_start(row['bucket'], bucket), bucket)
+            if not first <= index < last:
+                continue
+            # Minor units; integers unless amounts were converted
+            values = series.setdefault(row['category'], [0] * points)
+            values[(index - first) // group_size] += row['total'] or 0
+        
+        currency = target_currency(filters)
+        totals = [Money(sum(point), currency) for point in zip(*series.values())] if series else [Money(0, currency)] * len(keys)
+        series = {category: [Money(value, currency) for value in values] for category, values in sorted(series.items())}
+        
+        return {
+            'bucket': bucket,
+            'group_size': group_size,
+            'labels': keys,
+            'series': series,
+            'totals': totals
+        }
@@ -0,0 +1,194 @@
+"""Exact money amounts stored as integer minor units.
+
+Amounts live in SQLite as integers counting the smallest unit of their
+currency (cents, fillér; whole yen for zero-decimal currencies), in
+columns declared MONEY. Pooled connections convert those columns, and
+aggregates aliased as "name [MONEY]", to Money on the way out and bind
+Money back as its integer, so sums stay integer arithmetic in SQLite and
+only turn into decimals when displayed.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from flask.json.provider import DefaultJSONProvider
+from app.config import CURRENCIES, DEFAULT_CURRENCY
+
+def currency_decimals(currency):
+    """Get the number of minor unit digits of a currency code."""
+    return CURRENCIES.get(currency, CURRENCIES[DEFAULT_CURRENCY]).get('decimals', 2)
+
+def _to_minor(value, currency):
+    """Round a major unit Decimal to an integer count of minor units, halves away from zero."""
+    return int((value.scaleb(currency_decimals(currency))).quantize(Decimal(1), ROUND_HALF_UP))
+
+class Money:
+    """An exact amount of money: an integer number of minor units of one currency.
+    
+    Supports the arithmetic the views need (adding and subtracting amounts
+    of the same currency, scaling and dividing by numbers, the ratio of two
+    amounts, comparisons with amounts or plain numbers) and converts to
+    float only when asked, e.g. for charts and JSON.
+    """
+    
+    __slots__ = ('minor', 'currency')
+    
+    def __init__(self, minor=0, currency=DEFAULT_CURRENCY):
+        # Converted aggregates arrive as floats; round them to whole minor units
+        self.minor = int(round(minor))
+        self.currency = currency
+    
+    @classmethod
+    def parse(cls, value, currency=DEFAULT_CURRENCY):
+        """Build a Money from a major unit amount (form string, number or Money).
+        
+        Raises ValueError for anything that is not a finite number.
+        """
+        if isinstance(value, Money):
+            return value
+        try:
+            amount = Decimal(str(value).strip())
+        except InvalidOperation:
+            raise ValueError(f'Invalid amount: {value!r}') from None
+        if not amount.is_finite():
+            raise ValueError(f'Invalid amount: {value!r}')
+        return cls(_to_minor(amount, currency), currency)
+    
+    @property
+    def amount(self):
+        """The amount in major units as an exact Decimal."""
+        return Decimal(self.minor).scaleb(-currency_decimals(self.currency))
+    
+    def _same_currency(self, other):
+        if other.currency != self.currency:
+            raise ValueError(f'Cannot combine {self.currency} and {other.currency} amounts')
+    
+    def _scaled(self, factor):
+        """Multiply by a plain number, rounding to the nearest minor unit."""
+        minor = (Decimal(self.minor) * Decimal(str(factor))).quantize(Decimal(1), ROUND_HALF_UP)
+        return Money(minor, self.currency)
+    
+    def __add__(self, other):
+        if isinstance(other, Money):
+            self._same_currency(other)
+            return Money(self.minor + other.minor, self.currency)
+        # sum() starts from 0
+        if other == 0:
+            return self
+        return NotImplemented
+    
+    __radd__ = __add__
+    
+    def __sub__(self, other):
+        if isinstance(other, Money):
+            self._same_currency(other)
+            return Money(self.minor - other.minor, self.currency)
+        if other == 0:
+            return self
+        return NotImplemented
+    
+    def __rsub__(self, other):
+        if other == 0:
+            return -self
+        return NotImplemented
+    
+    def __mul__(self, factor):
+        if isinstance(factor, Money):
+            return NotImplemented
+        return self._scaled(factor)
+    
+    __rmul__ = __mul__
+    
+    def __truediv__(self, other):
+        """Money / Money is a plain ratio; Money / number is an amount."""
+        if isinstance(other, Money):
+            self._same_currency(other)
+            return self.minor / other.minor
+        return self._scaled(1 / Decimal(str(other)))
+    
+    def __neg__(self):
+        return Money(-self.minor, self.currency)
+    
+    def __abs__(self):
+        return Money(abs(self.minor), self.currency)
+    
+    def __bool__(self):
+        return self.minor != 0
+    
+    def _compare_key(self, other):
+        if isinstance(other, Money):
+            self._same_currency(other)
+            return self.minor, other.minor
+        return self.amount, other
+    
+    def __eq__(self, other):
+        if isinstance(other, Money):
+            return self.minor == other.minor and self.currency == other.currency
+        if isinstance(other, (int, float, Decimal)):
+            return self.amount == other
+        return NotImplemented
+    
+    def __hash__(self):
+        # Equal to the hash of the equal plain number, as __eq__ requires
+        return hash(self.amount)
+    
+    def __lt__(self, other):
+        left, right = self._compare_key(other)
+        return left < right
+    
+    def __le__(self, other):
+        left, right = self._compare_key(other)
+        return left <= right
+    
+    def __gt__(self, other):
+        left, right = self._compare_key(other)
+        return left > right
+    
+    def __ge__(self, other):
+        left, right = self._compare_key(other)
+        return left >= right
+    
+    def __float__(self):
+        return float(self.amount)
+    
+    def __round__(self, ndigits=None):
+        return round(float(self), ndigits)
+    
+    def __format__(self, spec):
+        return format(self.amount, spec) if spec else str(self)
+    
+    def __str__(self):
+        return f'{self.amount:.{currency_decimals(self.currency)}f}'
+    
+    def __repr__(self):
+        return f'Money({str(self)!r}, {self.currency!r})'
+
+def with_row_currency(row, column='amount'):
+    """Get a row as a dict whose Money column is in the currency named by the row's 'currency'.
+    
+    The MONEY converter cannot see other columns, so it labels every amount
+    with the default currency.
+    """
+    record = dict(row)
+    record[column] = Money(record[column].minor, record['currency'])
+    return record
+
+def adapt_money(value):
+    """sqlite3 adapter: bind Money as its integer minor units."""
+    return value.minor
+
+def convert_money(value):
+    """sqlite3 converter for MONEY columns (raw bytes of an integer)."""
+    return Money(int(value))
+
+class MoneyJSONProvider(DefaultJSONProvider):
+    """JSON provider that writes Money as a number in major units."""
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, Money):
+            return float(o)
+        return DefaultJSONProvider.default(o)
+
+def init_money(app):
+    """Serialize Money in JSON responses and add the 'currency' template filter."""
+    from app.utils import format_currency
+    app.json = MoneyJSONProvider(app)
+    app.add_template_filter(format_currency, 'currency')
@@ -0,0 +1,206 @@
+"""Per-request SQL profiling.
+
+When SQL_PROFILING is on, pooled connections are opened as
+ProfiledConnection, whose cursors time every execute and fetch and count
+the rows fetched. The numbers accumulate in a QueryProfile kept on ``g``
+for the current request. They are published as a Server-Timing header,
+optionally as a panel at the bottom of HTML pages (SQL_PROFILE_PANEL),
+and statements slower than SLOW_QUERY_MS go to the 'app.sql' logger as
+one JSON object per line. With profiling off the connections are plain
+sqlite3 connections and none of this code runs.
+
+Work done after the response object is built (streamed pages) is still
+logged but cannot appear in the header or panel.
+"""
+import heapq
+import json
+import logging
+import sqlite3
+import time
+from flask import g, has_app_context, request
+from markupsafe import escape
+from app.config import SQL_PROFILING, SLOW_QUERY_MS, SQL_PROFILE_TOP, SQL_PROFILE_PANEL
+
+logger = logging.getLogger('app.sql')
+
+class QueryProfile:
+    """Query count, SQL time and rows fetched for one request."""
+    
+    __slots__ = ('started', 'count', 'total_ms', 'rows', 'statements')
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.total_ms = 0.0
+        self.rows = 0
+        # [sql, ms, rows] per statement, updated as its rows are fetched
+        self.statements = []
+    
+    def start(self, sql):
+        """Register a new statement and return its entry."""
+        entry = [' '.join(sql.split()), 0.0, 0]
+        self.count += 1
+        self.statements.append(entry)
+        return entry
+    
+    def add(self, entry, ms, rows=0):
+        """Charge time and fetched rows to a statement."""
+        entry[1] += ms
+        entry[2] += rows
+        self.total_ms += ms
+        self.rows += rows
+    
+    def slowest(self, count=SQL_PROFILE_TOP):
+        """Get the count slowest statements as dicts, slowest first."""
+        return [
+            {'sql': sql, 'ms': round(ms, 3), 'rows': rows}
+            for sql, ms, rows in heapq.nlargest(count, self.statements, key=lambda entry: entry[1])
+        ]
+    
+    def elapsed_ms(self):
+        """Get the wall time since the request started."""
+        return (time.perf_counter() - self.started) * 1000
+
+def _current_profile():
+    """Get the profile of the request being served, if any."""
+    return g.get('_sql_profile') if has_app_context() else None
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that charges its execute and fetch time to the request's profile."""
+    
+    _profile = None
+    _entry = None
+    
+    def _begin(self, sql):
+        self._profile = _current_profile()
+        self._entry = self._profile.start(sql) if self._profile is not None else None
+    
+    def _charge(self, start, rows=0):
+        if self._entry is not None:
+            self._profile.add(self._entry, (time.perf_counter() - start) * 1000, rows)
+    
+    def execute(self, sql, parameters=()):
+        self._begin(sql)
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        self._charge(start)
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql)
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._charge(start)
+        return self
+    
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._charge(start, row is not None)
+        return row
+    
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._charge(start, len(rows))
+        return rows
+    
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._charge(start, len(rows))
+        return rows
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection whose execute shortcuts go through ProfiledCursor."""
+    
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def connection_factory():
+    """Get the connection class pooled connections are opened with."""
+    return ProfiledConnection if SQL_PROFILING else sqlite3.Connection
+
+def _server_timing(profile):
+    """Format a profile as a Server-Timing header value."""
+    metrics = [
+        f'db;dur={profile.total_ms:.2f};desc="{profile.count} queries, {profile.rows} rows"',
+        f'app;dur={profile.elapsed_ms():.2f}'
+    ]
+    slowest = profile.slowest(1)
+    if slowest:
+        metrics.append(f'db-slowest;dur={slowest[0]["ms"]:.2f}')
+    return ', '.join(metrics)
+
+def _panel(profile):
+    """Render the profile as a small HTML panel."""
+    rows = ''.join(
+        f'<tr><td>{statement["ms"]:.2f}</td><td>{statement["rows"]}</td><td><code>{escape(statement["sql"])}</code></td></tr>'
+        for statement in profile.slowest()
+    )
+    return (
+        '<div id="sql-profile" class="container my-3 small">'
+        f'<strong>SQL:</strong> {profile.count} queries, {profile.total_ms:.2f} ms, {profile.rows} rows'
+        '<table class="table table-sm"><thead><tr><th>ms</th><th>rows</th><th>statement</th></tr></thead>'
+        f'<tbody>{rows}</tbody></table></div>'
+    )
+
+def init_profiling(app):
+    """Register the profiling hooks on a Flask app; does nothing unless SQL_PROFILING is on."""
+    if not SQL_PROFILING:
+        return
+    
+    @app.before_request
+    def start_profile():
+        g._sql_profile = QueryProfile()
+    
+    @app.after_request
+    def publish_profile(response):
+        profile = g.get('_sql_profile')
+        if profile is None:
+            return response
+        
+        response.headers['Server-Timing'] = _server_timing(profile)
+        
+        if (SQL_PROFILE_PANEL and response.mimetype == 'text/html'
+                and not response.is_streamed and not response.direct_passthrough):
+            body = response.get_data(as_text=True)
+            if '</body>' in body:
+                response.set_data(body.replace('</body>', _panel(profile) + '</body>', 1))
+        
+        return response
+    
+    @app.teardown_request
+    def log_slow_queries(exception=None):
+        profile = g.pop('_sql_profile', None)
+        if profile is None:
+            return
+        
+        for statement in profile.statements:
+            if statement[1] >= SLOW_QUERY_MS:
+                logger.warning(json.dumps({
+                    'event': 'slow_query',
+                    'ms': round(statement[1], 3),
+                    'rows': statement[2],
+                    'sql': statement[0],
+                    'method': request.method,
+                    'path': request.path,
+                    'endpoint': request.endpoint,
+                    'request_queries': profile.count,
+                    'request_sql_ms': round(profile.total_ms, 3)
+                }))
@@ -0,0 +1,40 @@
+import logging
+import threading
+from app.models.recurring import RecurringExpense
+
+logger = logging.getLogger(__name__)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def _run(interval, stop):
+    """Materialize due recurring expenses now and then every interval seconds until stopped."""
+    while True:
+        try:
+            summary = RecurringExpense.materialize()
+            if summary['generated']:
+                logger.info('Materialized %d recurring expenses from %d series',
+                            summary['generated'], summary['templates'])
+        except Exception:
+            # Keep the thread alive; the next run retries from the recorded schedule
+            logger.exception('Recurring expense materialization failed')
+        
+        if stop.wait(interval):
+            return
+
+def start_recurring_scheduler(interval):
+    """Start the background recurring expense scheduler once per process.
+    
+    Returns the threading.Event that stops it. Each worker process may run
+    its own scheduler; materialization is idempotent, so they cannot
+    generate an occurrence twice.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            stop = threading.Event()
+            thread = threading.Thread(target=_run, args=(interval, stop),
+                                      name='recurring-scheduler', daemon=True)
+            thread.start()
+            _scheduler = stop
+    return _scheduler
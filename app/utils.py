@@ -1,5 +1,6 @@
+import calendar
 from datetime import datetime, timedelta
-from app.config import CURRENCIES, DEFAULT_CURRENCY, DATE_FORMAT
+from app.config import CURRENCIES, DEFAULT_CURRENCY, DATE_FORMAT, RECURRING_INTERVALS
 
 def get_date_range(period):
     """Get date range based on period."""
@@ -21,13 +22,31 @@ def get_date_range(period):
         'to_date': end_date
     }
 
+def get_budget_period_start(period, today=None):
+    """Get the first day of the current budget period, or None for all time."""
+    if today is None:
+        today = datetime.now().date()
+    
+    if period == 'daily':
+        start_date = today
+    elif period == 'weekly':
+        start_date = today - timedelta(days=today.weekday())
+    elif period == 'monthly':
+        start_date = today.replace(day=1)
+    elif period == 'yearly':
+        start_date = today.replace(month=1, day=1)
+    else:
+        return None
+    
+    return start_date.strftime(DATE_FORMAT)
+
 def format_currency(amount, currency_code=None):
-    """Format amount with currency symbol."""
+    """Format amount (Money or a plain number) with currency symbol and its minor unit digits."""
     if currency_code is None:
-        currency_code = DEFAULT_CURRENCY
+        currency_code = getattr(amount, 'currency', DEFAULT_CURRENCY)
     
     currency = CURRENCIES.get(currency_code, CURRENCIES[DEFAULT_CURRENCY])
-    return f"{currency['symbol']}{amount:.2f}"
+    return f"{currency['symbol']}{amount:.{currency.get('decimals', 2)}f}"
 
 def parse_tags(tags_str):
     """Parse tags string into list of tags."""
@@ -50,6 +69,27 @@ def get_chart_colors(count):
     
     return colors
 
+def get_recurring_date(base_date, interval, occurrence):
+    """Get the date of the occurrence-th repetition of base_date (a date object).
+    
+    Dates are always counted from base_date, so a series starting on the
+    31st lands on the last day of shorter months and returns to the 31st
+    afterwards instead of drifting. Returns None for unknown intervals.
+    """
+    if interval == 'weekly':
+        return base_date + timedelta(weeks=occurrence)
+    
+    if interval == 'monthly':
+        months = occurrence
+    elif interval == 'yearly':
+        months = occurrence * 12
+    else:
+        return None
+    
+    year, month = divmod(base_date.year * 12 + base_date.month - 1 + months, 12)
+    day = min(base_date.day, calendar.monthrange(year, month + 1)[1])
+    return base_date.replace(year=year, month=month + 1, day=day)
+
 def calculate_recurring_dates(base_date, interval, count=12):
     """Calculate future recurring dates from base date."""
     try:
@@ -57,28 +97,10 @@ def calculate_recurring_dates(base_date, interval, count=12):
     except ValueError:
         return []
     
-    dates = []
-    current_date = base_date
-    
-    for _ in range(count):
-        if interval == 'weekly':
-            current_date = current_date + timedelta(days=7)
-        elif interval == 'monthly':
-            # Add a month (approximately handling month boundaries)
-            month = current_date.month + 1
-            year = current_date.year
-            
-            if month > 12:
-                month = 1
-                year += 1
-            
-            # Handle different month lengths
-            day = min(current_date.day, [31, 29 if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0) else 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31][month-1])
-            
-            current_date = current_date.replace(year=year, month=month, day=day)
-        elif interval == 'yearly':
-            current_date = current_date.replace(year=current_date.year + 1)
-        
-        dates.append(current_date.strftime(DATE_FORMAT))
+    if interval not in RECURRING_INTERVALS:
+        return []
     
-    return dates 
\ No newline at end of file
+    return [
+        get_recurring_date(base_date, interval, occurrence).strftime(DATE_FORMAT)
+        for occurrence in range(1, count + 1)
+    ] 
\ No newline at end of file
@@ -0,0 +1,6 @@
+"""Performance benchmarks for the expense tracker.
+
+Each module is runnable with ``python -m benchmarks.<name>`` and prints its
+timings as JSON. Benchmarks build their own throwaway database and never
+touch ``expenses.db``.
+"""
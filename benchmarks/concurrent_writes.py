@@ -0,0 +1,97 @@
+"""Time concurrent Expense.create/update calls.
+
+Usage: python -m benchmarks.concurrent_writes [--threads 8] [--writes 200]
+
+Every writer creates tagged expenses and then re-tags them. The report
+includes any write errors and the row counts afterwards for context; the
+pass/fail checks live in tests/test_concurrency.py.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+def writer(worker, writes, errors):
+    """Create and update expenses from one thread."""
+    from app.models.expense import Expense
+    
+    try:
+        for index in range(writes):
+            expense_id = Expense.create({
+                'description': f'Worker {worker} expense {index}',
+                'amount': index + 1,
+                'category': 'Food',
+                'date': '2024-01-01',
+                'tags': [f'worker-{worker}', f'batch-{index % 10}', 'shared']
+            })
+            Expense.update(expense_id, {
+                'description': f'Worker {worker} expense {index} (edited)',
+                'amount': index + 2,
+                'category': 'Food',
+                'date': '2024-01-02',
+                'tags': [f'worker-{worker}', 'edited']
+            })
+    except Exception as exc:
+        errors.append(f'worker {worker}: {exc!r}')
+
+def check_consistency():
+    """Count expenses and dangling tag links after the run."""
+    from app.database import get_db_connection
+    
+    with get_db_connection() as conn:
+        return {
+            'expenses': conn.execute('SELECT COUNT(*) FROM expenses').fetchone()[0],
+            'links': conn.execute('SELECT COUNT(*) FROM expense_tags').fetchone()[0],
+            'dangling_links': conn.execute('''
+                SELECT COUNT(*) FROM expense_tags et
+                LEFT JOIN expenses e ON e.id = et.expense_id
+                LEFT JOIN tags t ON t.id = et.tag_id
+                WHERE e.id IS NULL OR t.id IS NULL
+            ''').fetchone()[0],
+            'rollup_count': conn.execute('SELECT COALESCE(SUM(count), 0) FROM expense_daily_rollup').fetchone()[0]
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=200)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before the app modules read their configuration
+        os.environ['DATABASE_PATH'] = os.path.join(tmp, 'stress.db')
+        from app.database import init_db, reset_pool
+        init_db()
+        
+        errors = []
+        threads = [
+            threading.Thread(target=writer, args=(worker, args.writes, errors))
+            for worker in range(args.threads)
+        ]
+        
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        
+        counts = check_consistency()
+        reset_pool()
+    
+    expected = args.threads * args.writes
+    
+    print(json.dumps({
+        'benchmark': 'concurrent_writes',
+        'threads': args.threads,
+        'writes_per_thread': args.writes,
+        'seconds': round(elapsed, 3),
+        'saves_per_second': round(expected * 2 / elapsed, 1),
+        'counts': counts,
+        'errors': errors[:10]
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
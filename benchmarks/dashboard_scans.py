@@ -0,0 +1,107 @@
+"""Count the table scans behind one render of the legacy analytics page.
+
+Usage: python -m benchmarks.dashboard_scans [--rows 20000]
+
+Every statement the page runs is traced and explained with EXPLAIN QUERY
+PLAN; a full scan is a plan step that reads a whole table without an
+index. The limits a render must stay within are checked by
+tests/test_dashboard.py; this script only reports the counts.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import re
+import sqlite3
+import tempfile
+
+PERIODS = ['week', 'month', 'year', 'all']
+
+def load_legacy_app():
+    """Import the legacy app.py, which the app package shadows on sys.path."""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+    spec = importlib.util.spec_from_file_location('legacy_app', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def full_scans(database, statement):
+    """Get the plan steps of a statement that scan a whole table.
+    
+    Scans of a subquery's rows (named by its CO-ROUTINE or MATERIALIZE
+    step) are not table scans and are left out.
+    """
+    with sqlite3.connect(database) as conn:
+        plan = conn.execute(f'EXPLAIN QUERY PLAN {statement}').fetchall()
+    subqueries = {match.group(1) for row in plan for match in [re.match(r'(?:CO-ROUTINE|MATERIALIZE) (\w+)$', row[3])] if match}
+    return [
+        row[3] for row in plan
+        if re.match(r'SCAN \w+$', row[3]) and row[3] != 'SCAN CONSTANT ROW'
+        and row[3].split()[1] not in subqueries
+    ]
+
+def render(client, period):
+    """Render the analytics page once and return the SELECT statements it ran."""
+    from app.cache import get_cache
+    from app.database import get_pool
+    
+    statements = []
+    
+    def trace(statement):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append(statement)
+    
+    # The pool is LIFO, so the request borrows the connection traced here
+    get_cache().clear()
+    pool = get_pool()
+    conn = pool.acquire()
+    conn.set_trace_callback(trace)
+    pool.release(conn)
+    try:
+        response = client.get(f'/analytics?period={period}')
+    finally:
+        conn.set_trace_callback(None)
+    
+    if response.status_code != 200:
+        raise RuntimeError(f'/analytics?period={period} returned {response.status_code}')
+    
+    # The version lookup belongs to the response cache and the once-per-process
+    # exchange rate sync to app.fx, not the dashboard
+    return [statement for statement in statements
+            if 'data_version' not in statement and 'fx_rate_source' not in statement]
+
+def run(rows):
+    """Render every period and count its statements and full scans."""
+    from benchmarks.search import populate
+    
+    database = os.environ['DATABASE_PATH']
+    populate(database, rows)
+    legacy = load_legacy_app()
+    legacy.init_db()
+    legacy.app.config['TESTING'] = True
+    client = legacy.app.test_client()
+    
+    results = []
+    for period in PERIODS:
+        statements = render(client, period)
+        scans = [scan for statement in statements for scan in full_scans(database, statement)]
+        results.append({'period': period, 'statements': len(statements), 'full_scans': scans})
+    
+    return {'benchmark': 'dashboard_scans', 'rows': rows, 'results': results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before the app modules read their configuration
+        os.environ['DATABASE_PATH'] = os.path.join(tmp, 'bench.db')
+        result = run(args.rows)
+        print(json.dumps(result, indent=2))
+        
+        from app.database import reset_pool
+        reset_pool()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Generate a synthetic expense database for benchmarking.
+
+Usage: python -m benchmarks.data PATH [--size small|medium|large | --rows N] [--seed 42]
+
+Sizes are small (10k), medium (1M) and large (10M expenses). Categories
+and tags follow a Zipf-like skew, so a few dominate as in real data; each
+expense has zero to several tags, about 1% are recurring templates and
+every category gets a budget. Rows go through import_expenses, the same
+bulk path as a CSV import, so rollups, search index and change log are
+filled exactly as in production.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks.search import WORDS
+
+SIZES = {'small': 10000, 'medium': 1000000, 'large': 10000000}
+
+# Spending history covered by the generated dates, ending today
+HISTORY_DAYS = 5 * 365
+
+TAG_COUNT = 200
+
+# Probability of 0, 1, 2 and 3 tags on an expense
+TAG_FAN_OUT = [0.4, 0.35, 0.17, 0.08]
+
+RECURRING_SHARE = 0.01
+
+# Typical expense size per category; amounts are log-normal around it
+CATEGORY_SCALE = {
+    'Food': 15, 'Transportation': 12, 'Housing': 600, 'Utilities': 80, 'Entertainment': 30,
+    'Healthcare': 60, 'Education': 120, 'Shopping': 45, 'Travel': 250, 'Miscellaneous': 20
+}
+
+def zipf_weights(count, exponent=1.1):
+    """Weights of ranks 1..count under a Zipf-like distribution."""
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+def generate(rows, seed=42, today=None):
+    """Yield rows expense records in import_expenses format."""
+    from app.config import RECURRING_INTERVALS
+    
+    rng = random.Random(seed)
+    today = today or date.today()
+    first_day = today - timedelta(days=HISTORY_DAYS)
+    
+    categories = list(CATEGORY_SCALE)
+    category_weights = zipf_weights(len(categories))
+    tags = [f'tag-{index:03d}' for index in range(TAG_COUNT)]
+    tag_weights = zipf_weights(TAG_COUNT)
+    
+    for _ in range(rows):
+        category = rng.choices(categories, category_weights)[0]
+        tag_count = rng.choices(range(len(TAG_FAN_OUT)), TAG_FAN_OUT)[0]
+        recurring = rng.random() < RECURRING_SHARE
+        yield {
+            'description': ' '.join(rng.sample(WORDS, 3)),
+            'amount': round(CATEGORY_SCALE[category] * rng.lognormvariate(0, 0.6), 2) or 0.01,
+            'category': category,
+            'date': (first_day + timedelta(days=rng.randrange(HISTORY_DAYS + 1))).isoformat(),
+            'recurring': 1 if recurring else 0,
+            'recurring_interval': rng.choice(RECURRING_INTERVALS) if recurring else None,
+            'tags': sorted(set(rng.choices(tags, tag_weights, k=tag_count)))
+        }
+
+def populate(rows, seed=42):
+    """Create the schema in DATABASE_PATH and fill it with rows synthetic expenses and budgets."""
+    from app.database import init_db
+    from app.importers import import_expenses
+    from app.models.budget import Budget
+    
+    init_db()
+    summary = import_expenses(generate(rows, seed))
+    
+    # Budgets roughly matching the generated monthly spending
+    for category, scale in CATEGORY_SCALE.items():
+        Budget.create_or_update({'category': category, 'amount': scale * 20, 'period': 'monthly'})
+    
+    return summary
+
+def resolve_rows(size, rows):
+    """Get the row count from an explicit --rows or a named --size."""
+    return rows if rows else SIZES[size]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help='Database file to create; must not exist yet.')
+    parser.add_argument('--size', choices=sorted(SIZES), default='small')
+    parser.add_argument('--rows', type=int, help='Exact number of expenses (overrides --size).')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    if os.path.exists(args.path):
+        parser.error(f'{args.path} already exists')
+    
+    # Must be set before the app modules read their configuration
+    os.environ['DATABASE_PATH'] = args.path
+    rows = resolve_rows(args.size, args.rows)
+    
+    start = time.perf_counter()
+    summary = populate(rows, args.seed)
+    print(json.dumps({
+        'database': args.path,
+        'rows': summary['imported'],
+        'seconds': round(time.perf_counter() - start, 2)
+    }, indent=2))
+    
+    from app.database import reset_pool
+    reset_pool()
+
+if __name__ == '__main__':
+    main()
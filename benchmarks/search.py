@@ -0,0 +1,96 @@
+"""Compare description search latency before (LIKE scan) and after (FTS5).
+
+Usage: python -m benchmarks.search [--rows 1000000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+WORDS = [
+    'coffee', 'groceries', 'market', 'lunch', 'dinner', 'taxi', 'train', 'bus',
+    'rent', 'electricity', 'water', 'internet', 'phone', 'cinema', 'concert',
+    'pharmacy', 'doctor', 'books', 'course', 'shoes', 'jacket', 'hotel',
+    'flight', 'gift', 'bakery', 'pizza', 'fuel', 'parking', 'gym', 'netflix'
+]
+
+SEARCH_TERMS = ['coffee', 'groc', 'taxi train', 'netflix', 'zzz-no-match']
+
+def populate(database, rows, seed=42):
+    """Fill a fresh database with synthetic expenses through the app schema."""
+    from app.database import init_db
+    init_db()
+    
+    rng = random.Random(seed)
+    conn = sqlite3.connect(database)
+    conn.executemany(
+        'INSERT INTO expenses (description, amount, category, date) VALUES (?, ?, ?, ?)',
+        (
+            (
+                ' '.join(rng.sample(WORDS, 3)),
+                # Minor units, as the MONEY column stores them
+                rng.randint(100, 50000),
+                rng.choice(['Food', 'Transportation', 'Housing', 'Entertainment']),
+                f'20{rng.randint(15, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+            )
+            for _ in range(rows)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+def best_of(func, repeat):
+    """Run func repeat times and return the fastest wall time in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(min(timings), 3)
+
+def run(rows, repeat):
+    """Time the LIKE scan against the FTS-backed search for each term."""
+    from app.database import get_db_connection
+    from app.models.expense import Expense
+    
+    results = []
+    for term in SEARCH_TERMS:
+        def like_search():
+            with get_db_connection() as conn:
+                conn.execute(
+                    'SELECT * FROM expenses WHERE description LIKE ? ORDER BY date DESC, id DESC LIMIT 50',
+                    (f'%{term}%',)
+                ).fetchall()
+        
+        def fts_search():
+            Expense.get_all({'search': term}, page_size=50)
+        
+        results.append({
+            'term': term,
+            'like_ms': best_of(like_search, repeat),
+            'fts_ms': best_of(fts_search, repeat),
+            'ranked_fts_ms': best_of(lambda: Expense.search(term, limit=50), repeat)
+        })
+    
+    return {'benchmark': 'search', 'rows': rows, 'results': results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before the app modules read their configuration
+        os.environ['DATABASE_PATH'] = os.path.join(tmp, 'bench.db')
+        populate(os.environ['DATABASE_PATH'], args.rows)
+        print(json.dumps(run(args.rows, args.repeat), indent=2))
+        
+        from app.database import reset_pool
+        reset_pool()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""Time the hot model calls and pages against a synthetic dataset.
+
+Usage: python -m benchmarks.suite [--size small|medium|large | --rows N] [--database PATH]
+                                  [--repeat 5] [--output results.json]
+                                  [--baseline baseline.json] [--threshold 0.25]
+
+Without --database a throwaway database is generated (see benchmarks.data);
+with it, an existing file is reused or a new one is generated and kept, so
+large datasets only need to be built once. Pages are rendered through the
+legacy app's Flask test client with the response cache cleared before each
+run, so they are timed cold. Results are printed (and optionally written)
+as JSON; with --baseline, any case whose median is slower than the
+baseline's by more than the threshold is reported and the run exits
+non-zero.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.data import SIZES, populate, resolve_rows
+
+# Slowdowns below this many milliseconds are noise, whatever the ratio
+NOISE_FLOOR_MS = 1.0
+
+def measure(func, repeat):
+    """Run func repeat times (after one warm-up) and return min and median wall time in ms."""
+    func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'min_ms': round(min(timings), 3), 'median_ms': round(statistics.median(timings), 3)}
+
+def model_cases():
+    """Get (name, callable) pairs for the model hot paths."""
+    from datetime import date, timedelta
+    from app.config import EXPENSES_PAGE_SIZE
+    from app.database import get_db_connection
+    from app.models.budget import Budget
+    from app.models.expense import Expense
+    
+    with get_db_connection() as conn:
+        top_tag = conn.execute('''
+            SELECT t.name FROM tags t JOIN expense_tags et ON et.tag_id = t.id
+            GROUP BY t.id ORDER BY COUNT(*) DESC LIMIT 1
+        ''').fetchone()
+        top_category = conn.execute('''
+            SELECT category FROM expense_monthly_rollup
+            GROUP BY category ORDER BY SUM(count) DESC LIMIT 1
+        ''').fetchone()
+    
+    tag_name = top_tag[0] if top_tag else 'tag-000'
+    category = top_category[0] if top_category else 'Food'
+    last_month = {'from_date': (date.today() - timedelta(days=30)).isoformat()}
+    
+    def page(filters):
+        return lambda: Expense.get_all(filters, page_size=EXPENSES_PAGE_SIZE)
+    
+    return [
+        ('get_all', page({})),
+        ('get_all_category', page({'category': category})),
+        ('get_all_date_range', page(last_month)),
+        ('get_all_search', page({'search': 'coffee'})),
+        ('get_all_combined', page(dict(last_month, category=category, search='coffee'))),
+        ('get_by_tag', lambda: Expense.get_by_tag(tag_name, page_size=EXPENSES_PAGE_SIZE)),
+        ('get_category_totals', lambda: Expense.get_category_totals()),
+        ('get_category_totals_month', lambda: Expense.get_category_totals(last_month)),
+        ('get_statistics', lambda: Expense.get_statistics()),
+        ('budget_comparison', lambda: Budget.get_comparison())
+    ]
+
+def page_cases():
+    """Get (name, callable) pairs that render pages through the legacy app's test client."""
+    from app.cache import get_cache
+    from benchmarks.dashboard_scans import load_legacy_app
+    
+    legacy = load_legacy_app()
+    legacy.init_db()
+    legacy.app.config['TESTING'] = True
+    client = legacy.app.test_client()
+    
+    def page(path):
+        def render():
+            get_cache().clear()
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f'{path} returned {response.status_code}')
+        return render
+    
+    return [
+        ('page_index', page('/')),
+        ('page_analytics', page('/analytics?period=year')),
+        ('page_reports', page('/reports')),
+        ('page_forecasts', page('/forecasts'))
+    ]
+
+def run(rows, repeat):
+    """Time every case against the database in DATABASE_PATH."""
+    results = {}
+    for name, func in model_cases() + page_cases():
+        results[name] = measure(func, repeat)
+    
+    return {
+        'benchmark': 'suite',
+        'rows': rows,
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'results': results
+    }
+
+def compare(result, baseline, threshold):
+    """List the cases whose median regressed against the baseline by more than threshold."""
+    regressions = []
+    for name, timing in result['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            continue
+        slower = timing['median_ms'] - before['median_ms']
+        if slower > NOISE_FLOOR_MS and timing['median_ms'] > before['median_ms'] * (1 + threshold):
+            regressions.append({
+                'case': name,
+                'baseline_ms': before['median_ms'],
+                'median_ms': timing['median_ms'],
+                'ratio': round(timing['median_ms'] / before['median_ms'], 2) if before['median_ms'] else None
+            })
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=sorted(SIZES), default='small')
+    parser.add_argument('--rows', type=int, help='Exact number of expenses (overrides --size).')
+    parser.add_argument('--database', help='Reuse or keep the generated database at this path.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Also write the results to this JSON file.')
+    parser.add_argument('--baseline', help='Results JSON to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed slowdown, as a fraction of the baseline.')
+    args = parser.parse_args()
+    
+    rows = resolve_rows(args.size, args.rows)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before the app modules read their configuration
+        os.environ['DATABASE_PATH'] = args.database or os.path.join(tmp, 'bench.db')
+        if not os.path.exists(os.environ['DATABASE_PATH']):
+            populate(rows)
+        else:
+            with sqlite3.connect(os.environ['DATABASE_PATH']) as conn:
+                rows = conn.execute('SELECT COUNT(*) FROM expenses').fetchone()[0]
+        
+        result = run(rows, args.repeat)
+        
+        from app.database import reset_pool
+        reset_pool()
+    
+    if args.baseline:
+        with open(args.baseline) as handle:
+            result['regressions'] = compare(result, json.load(handle), args.threshold)
+    
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    
+    if result.get('regressions'):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Gunicorn settings for the expense tracker; every value comes from app/config.py.
+
+Run with ``gunicorn wsgi:app``; gunicorn picks this file up from the
+working directory. Tune through the environment (WEB_WORKERS, WEB_THREADS,
+WEB_BIND, WEB_KEEPALIVE, WEB_TIMEOUT, WEB_MAX_REQUESTS), e.g.
+``WEB_WORKERS=4 WEB_THREADS=8 gunicorn wsgi:app``.
+"""
+from app.config import (
+    WEB_BIND, WEB_WORKERS, WEB_THREADS, WEB_KEEPALIVE, WEB_TIMEOUT, WEB_MAX_REQUESTS,
+    RECURRING_SCHEDULER_INTERVAL
+)
+
+bind = WEB_BIND
+workers = WEB_WORKERS
+threads = WEB_THREADS
+# Threaded workers share one connection pool and response cache per process
+worker_class = 'gthread' if WEB_THREADS > 1 else 'sync'
+keepalive = WEB_KEEPALIVE
+timeout = WEB_TIMEOUT
+graceful_timeout = WEB_TIMEOUT
+max_requests = WEB_MAX_REQUESTS
+max_requests_jitter = WEB_MAX_REQUESTS // 10
+
+# Build the app (and run init_db) once in the master, then fork
+preload_app = True
+
+def pre_fork(server, worker):
+    """Close the master's pooled connections so no SQLite handle crosses a fork."""
+    from app.database import reset_pool
+    reset_pool()
+
+def post_worker_init(worker):
+    """Start the recurring scheduler in each worker; materialization is idempotent."""
+    if RECURRING_SCHEDULER_INTERVAL > 0:
+        from app.scheduler import start_recurring_scheduler
+        start_recurring_scheduler(RECURRING_SCHEDULER_INTERVAL)
@@ -1,5 +1,6 @@
 from app import create_app
 
+# Development server; use `gunicorn wsgi:app` in production
 if __name__ == '__main__':
     app = create_app()
     app.run(host='0.0.0.0', port=5000) 
\ No newline at end of file
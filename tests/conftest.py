@@ -0,0 +1,94 @@
+"""Shared fixtures: every test gets a fresh, fully migrated database file."""
+import os
+import tempfile
+from contextlib import contextmanager
+
+# Must be set before the app modules read their configuration
+_TMP = tempfile.mkdtemp(prefix='expense-tracker-tests-')
+os.environ['DATABASE_PATH'] = os.path.join(_TMP, 'test.db')
+
+import pytest
+from app.config import DATABASE_PATH
+
+def _remove_database():
+    for suffix in ('', '-wal', '-shm'):
+        try:
+            os.remove(DATABASE_PATH + suffix)
+        except FileNotFoundError:
+            pass
+
+@pytest.fixture
+def db():
+    """Create an empty database for one test and delete it afterwards."""
+    from app import fx
+    from app.cache import get_cache
+    from app.database import init_db, reset_pool
+    
+    reset_pool()
+    _remove_database()
+    get_cache().clear()
+    # The rates are mirrored into each new database on first use
+    fx._rates = None
+    init_db()
+    yield DATABASE_PATH
+    reset_pool()
+    _remove_database()
+
+@pytest.fixture
+def fx_rates(db, tmp_path, monkeypatch):
+    """Get a function that installs the given rates file contents for the test."""
+    from app import fx
+    
+    path = tmp_path / 'fx_rates.csv'
+    monkeypatch.setattr(fx, 'FX_RATES_PATH', str(path))
+    
+    def install(content):
+        path.write_text('date,currency,rate\n' + content)
+        return fx.get_fx_rates()
+    
+    return install
+
+@pytest.fixture
+def traced(db):
+    """Get a context manager that records the SQL statements run inside it.
+    
+    The pool is LIFO, so code outside a request borrows the connection
+    traced here.
+    """
+    from app.database import get_pool
+    
+    @contextmanager
+    def trace():
+        statements = []
+        pool = get_pool()
+        conn = pool.acquire()
+        conn.set_trace_callback(statements.append)
+        pool.release(conn)
+        try:
+            yield statements
+        finally:
+            conn.set_trace_callback(None)
+    
+    return trace
+
+@pytest.fixture(scope='session')
+def legacy_app():
+    """The legacy app.py module, which the app package shadows on sys.path."""
+    from benchmarks.dashboard_scans import load_legacy_app
+    module = load_legacy_app()
+    module.app.config['TESTING'] = True
+    return module
+
+@pytest.fixture
+def legacy_client(db, legacy_app):
+    """A test client for the legacy app on a fresh database."""
+    legacy_app.init_db()
+    return legacy_app.app.test_client()
+
+@pytest.fixture
+def client(db):
+    """A test client for the application factory's app on a fresh database."""
+    from app import create_app
+    app = create_app(start_scheduler=False)
+    app.config['TESTING'] = True
+    return app.test_client()
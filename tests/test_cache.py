@@ -0,0 +1,22 @@
+from app.cache import cached
+from app.controllers import analytics_controller
+
+def test_apps_cache_the_analytics_page_under_different_namespaces(legacy_client, legacy_app, client, monkeypatch):
+    namespaces = {}
+    
+    def recording(module):
+        def record(namespace, params, compute):
+            namespaces.setdefault(module, set()).add(namespace)
+            return cached(namespace, params, compute)
+        return record
+    
+    monkeypatch.setattr(legacy_app, 'cached', recording('legacy'))
+    monkeypatch.setattr(analytics_controller, 'cached', recording('blueprint'))
+    
+    assert legacy_client.get('/analytics?period=month').status_code == 200
+    # The blueprint app ships no templates, so only the data part of its view runs
+    client.application.config['PROPAGATE_EXCEPTIONS'] = False
+    client.get('/analytics?period=month')
+    
+    assert namespaces['legacy'] and namespaces['blueprint']
+    assert not namespaces['legacy'] & namespaces['blueprint']
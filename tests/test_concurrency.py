@@ -0,0 +1,26 @@
+import threading
+from benchmarks.concurrent_writes import check_consistency, writer
+
+THREADS = 4
+WRITES = 25
+
+def test_concurrent_writers_keep_the_database_consistent(db):
+    errors = []
+    threads = [
+        threading.Thread(target=writer, args=(worker, WRITES, errors))
+        for worker in range(THREADS)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    # No 'database is locked' or any other failed save
+    assert errors == []
+    expected = THREADS * WRITES
+    assert check_consistency() == {
+        'expenses': expected,
+        'links': expected * 2,
+        'dangling_links': 0,
+        'rollup_count': expected
+    }
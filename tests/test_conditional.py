@@ -0,0 +1,26 @@
+import os
+from flask import Flask
+from app import conditional
+
+def test_a_new_release_invalidates_cached_pages(legacy_client, monkeypatch):
+    monkeypatch.setattr(conditional, 'APP_VERSION', 'release-1')
+    etag = legacy_client.get('/analytics').headers['ETag']
+    assert legacy_client.get('/analytics', headers={'If-None-Match': etag}).status_code == 304
+    
+    monkeypatch.setattr(conditional, 'APP_VERSION', 'release-2')
+    response = legacy_client.get('/analytics', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_fingerprint_changes_with_the_templates(tmp_path):
+    template = tmp_path / 'templates' / 'page.html'
+    template.parent.mkdir()
+    template.write_text('<p>v1</p>')
+    app = Flask('fingerprint', root_path=str(tmp_path))
+    
+    before = conditional._source_fingerprint(app)
+    assert conditional._source_fingerprint(app) == before
+    
+    template.write_text('<p>version 2</p>')
+    os.utime(template, ns=(0, 0))
+    assert conditional._source_fingerprint(app) != before
@@ -0,0 +1,23 @@
+import pytest
+from benchmarks.dashboard_scans import PERIODS, full_scans, render
+from benchmarks.search import populate
+
+# Per render: dashboard aggregates, top expenses, budget comparison
+MAX_STATEMENTS = 3
+
+# The budgets table in the comparison; the 'all' period also scans the daily rollup
+MAX_FULL_SCANS = {'week': 1, 'month': 1, 'year': 1, 'all': 2}
+
+@pytest.fixture
+def dashboard_client(db, legacy_app):
+    populate(db, 2000)
+    legacy_app.init_db()
+    return legacy_app.app.test_client()
+
+@pytest.mark.parametrize('period', PERIODS)
+def test_analytics_page_stays_within_its_query_budget(db, dashboard_client, period):
+    statements = render(dashboard_client, period)
+    scans = [scan for statement in statements for scan in full_scans(db, statement)]
+    
+    assert len(statements) <= MAX_STATEMENTS, statements
+    assert len(scans) <= MAX_FULL_SCANS[period], scans
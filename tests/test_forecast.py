@@ -0,0 +1,35 @@
+import pytest
+from app.database import get_db_connection
+from app.models.expense import Expense
+from app.models.forecast import ExpenseForecast
+
+@pytest.fixture
+def history(fx_rates):
+    fx_rates('2024-01-01,USD,400\n')
+    for month in range(1, 7):
+        Expense.create({'description': 'Rent', 'amount': '4000', 'category': 'Housing', 'date': f'2024-{month:02d}-05'})
+
+def _recorded_totals():
+    with get_db_connection() as conn:
+        return [row[0] for row in conn.execute('SELECT predicted_amount FROM predictions ORDER BY target_month')]
+
+def test_forecast_is_in_the_requested_currency(history):
+    data = ExpenseForecast.forecast('2024-06', currency='USD')
+    
+    assert data['history'][0]['total'] == pytest.approx(10)
+    assert data['prediction']['total'] == pytest.approx(10)
+
+def test_predictions_are_recorded_in_the_default_currency(history):
+    ExpenseForecast.forecast('2024-06', currency='USD')
+    
+    assert _recorded_totals() and all(total == pytest.approx(4000) for total in _recorded_totals())
+
+def test_forecasts_page_is_cached_per_currency(history, legacy_client):
+    assert b'4000.0' in legacy_client.get('/forecasts?month=2024-06').data
+    
+    with legacy_client.session_transaction() as session:
+        session['currency'] = 'USD'
+    page = legacy_client.get('/forecasts?month=2024-06').data
+    
+    assert b'$10.0' in page
+    assert b'4000.0' not in page
@@ -0,0 +1,96 @@
+import sqlite3
+from datetime import date
+import pytest
+from app.models.budget import Budget
+from app.models.expense import Expense
+from app.models.snapshot import ExpenseSnapshot
+from app.money import Money
+
+def _add(amount, currency, day='2024-03-10', category='Food'):
+    return Expense.create({'description': 'x', 'amount': amount, 'currency': currency,
+                           'category': category, 'date': day})
+
+def _statistics(filters):
+    """Statistics from the rollup and from the snapshot, which must agree."""
+    snapshot = ExpenseSnapshot()
+    snapshot.refresh()
+    return Expense.get_statistics(filters), snapshot.get_statistics(filters)
+
+def test_quoted_amounts_convert_at_their_months_rate(fx_rates):
+    fx_rates('2024-03-01,USD,400\n')
+    _add('10', 'USD')
+    _add('1000', 'HUF')
+    
+    for stats in _statistics({'currency': 'HUF'}):
+        assert stats['total'] == Money(500000, 'HUF')
+        assert stats['count'] == 2
+        assert stats['average'] == Money(250000, 'HUF')
+
+@pytest.mark.parametrize('rates', ['', '2024-03-01,EUR,390\n'])
+def test_amounts_without_a_rate_convert_at_face_value(fx_rates, rates):
+    fx_rates(rates)
+    _add('10', 'USD')
+    _add('500', 'JPY')
+    _add('1000', 'HUF')
+    
+    # Nothing is dropped from the total while still being counted
+    for stats in _statistics({'currency': 'HUF'}):
+        assert stats['total'] == Money(151000, 'HUF')
+        assert stats['count'] == 3
+        assert stats['average'] == Money(50333, 'HUF')
+    
+    for stats in _statistics({'currency': 'JPY'}):
+        assert stats['total'] == Money(1510, 'JPY')
+
+def test_budget_comparison_in_a_currency_without_a_rate(fx_rates):
+    fx_rates('2024-03-01,EUR,390\n')
+    Budget.create_or_update({'category': 'Food', 'amount': '2000', 'period': 'monthly'})
+    _add('10', 'USD', day='2024-03-10')
+    
+    comparison = Budget.get_comparison(today=date(2024, 3, 15), currency='USD')
+    
+    assert comparison[0]['budget'] == Money(200000, 'USD')
+    assert comparison[0]['spent'] == Money(1000, 'USD')
+    assert comparison[0]['percentage'] == 0
+
+@pytest.mark.parametrize('currency', ['HUF', 'USD'])
+def test_top_expenses_rank_by_converted_amount(fx_rates, currency):
+    fx_rates('2024-03-01,USD,400\n')
+    dollars = _add('10', 'USD')
+    forints = _add('1000', 'HUF')
+    small = _add('5', 'HUF')
+    filters = {'currency': currency}
+    
+    snapshot = ExpenseSnapshot()
+    snapshot.refresh()
+    
+    assert [expense['id'] for expense in Expense.top_n(filters, 3)] == [dollars, forints, small]
+    assert snapshot.get_top_ids(3, filters) == [dollars, forints, small]
+    assert snapshot.get_top_ids(1, filters) == [dollars]
+
+@pytest.mark.parametrize('filters, index', [
+    ({}, 'idx_expenses_currency_amount (currency=?)'),
+    ({'category': 'Food'}, 'idx_expenses_category_currency_amount (category=? AND currency=?)')
+])
+def test_top_expenses_in_the_report_currency_walk_the_amount_index(db, traced, filters, index):
+    _add('10', 'HUF')
+    
+    with traced() as statements:
+        Expense.top_n(filters, 5)
+    
+    with sqlite3.connect(db) as conn:
+        plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {statements[-1]}')]
+    assert f'SEARCH expenses USING INDEX {index}' in plan
+    assert not any(step.startswith('SCAN expenses') for step in plan)
+
+def test_top_expenses_apply_the_filters_to_both_currencies(fx_rates):
+    fx_rates('2024-03-01,USD,400\n')
+    _add('10', 'USD', category='Travel')
+    food_dollars = _add('1', 'USD')
+    food_forints = _add('100', 'HUF')
+    _add('100', 'HUF', day='2023-01-01')
+    
+    top = Expense.top_n({'category': 'Food', 'from_date': '2024-01-01', 'currency': 'HUF'}, 5)
+    
+    assert [expense['id'] for expense in top] == [food_dollars, food_forints]
+    assert top[0]['amount'] == Money(100, 'USD')
@@ -0,0 +1,35 @@
+import io
+from app.models.expense import Expense
+
+def _upload(client, content, filename='expenses.csv'):
+    return client.post('/import', data={'file': (io.BytesIO(content), filename)},
+                       content_type='multipart/form-data')
+
+def _flashes(client):
+    with client.session_transaction() as session:
+        return session.get('_flashes', [])
+
+def test_imports_a_csv_upload(legacy_client):
+    response = _upload(legacy_client, b'date,description,amount,category\n2024-01-02,Lunch,12.50,Food\n')
+    assert response.status_code == 302
+    assert [expense['description'] for expense in Expense.get_all()] == ['Lunch']
+
+def test_undecodable_upload_is_reported_not_a_server_error(legacy_client):
+    response = _upload(legacy_client, b'date,description,amount\n2024-01-02,Caf\xe9,3.00\n')
+    assert response.status_code == 302
+    assert any('not UTF-8' in message for category, message in _flashes(legacy_client))
+    assert Expense.get_all() == []
+
+def test_malformed_csv_upload_is_reported_not_a_server_error(legacy_client):
+    oversized_field = b'"' + b'x' * 200_000 + b'"'
+    response = _upload(legacy_client, b'date,description,amount\n2024-01-02,' + oversized_field + b',3.00\n')
+    assert response.status_code == 302
+    assert any('not valid CSV' in message for category, message in _flashes(legacy_client))
+    assert Expense.get_all() == []
+
+def test_bad_ofx_rows_are_skipped(legacy_client):
+    statement = (b'<OFX><CURDEF>HUF<STMTTRN><TRNAMT>-12.00<DTPOSTED>2024XX01<NAME>Lunch</STMTTRN>'
+                 b'<STMTTRN><TRNAMT>-5.00<DTPOSTED>20240102<NAME>Coffee</STMTTRN></OFX>\n')
+    response = _upload(legacy_client, statement, 'statement.ofx')
+    assert response.status_code == 302
+    assert [expense['description'] for expense in Expense.get_all()] == ['Coffee']
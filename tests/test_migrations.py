@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+import pytest
+from app.database import init_db, reset_pool
+from app.migrations import MIGRATIONS, get_schema_version, migrate
+
+def _plan(database, query, params=()):
+    with sqlite3.connect(database) as conn:
+        return ' | '.join(row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params))
+
+@pytest.mark.parametrize('query, params, index', [
+    ('SELECT * FROM expenses WHERE date >= ? AND date <= ? ORDER BY date DESC, id DESC',
+     ('2024-01-01', '2024-01-31'), 'idx_expenses_date'),
+    ('SELECT * FROM expenses WHERE category = ? AND date >= ?', ('Food', '2024-01-01'),
+     'idx_expenses_category_date'),
+    ('SELECT expense_id FROM expense_tags WHERE tag_id = ?', (1,), 'idx_expense_tags_tag'),
+])
+def test_filter_queries_use_the_secondary_indexes(db, query, params, index):
+    assert index in _plan(db, query, params)
+
+def test_migrate_is_a_no_op_when_up_to_date(db):
+    with sqlite3.connect(db) as conn:
+        assert migrate(conn) == len(MIGRATIONS)
+        assert get_schema_version(conn) == len(MIGRATIONS)
+
+def test_concurrent_startups_apply_each_migration_once(db):
+    # Start over from an empty file, as several workers booting together would
+    reset_pool()
+    with sqlite3.connect(db) as conn:
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'").fetchall():
+            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+        conn.execute('PRAGMA user_version = 0')
+    
+    errors = []
+    
+    def start():
+        try:
+            init_db()
+        except Exception as exc:
+            errors.append(exc)
+    
+    threads = [threading.Thread(target=start) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == []
+    with sqlite3.connect(db) as conn:
+        assert get_schema_version(conn) == len(MIGRATIONS)
+
+# The schema and float amounts of a database from before amounts were stored in minor units
+_LEGACY_SCHEMA = '''
+    CREATE TABLE expenses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        description TEXT NOT NULL,
+        amount REAL NOT NULL,
+        category TEXT NOT NULL,
+        date TEXT NOT NULL,
+        recurring INTEGER DEFAULT 0,
+        recurring_interval TEXT
+    );
+    CREATE TABLE budgets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category TEXT NOT NULL UNIQUE,
+        amount REAL NOT NULL,
+        period TEXT NOT NULL
+    );
+    CREATE TABLE tags (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE);
+    CREATE TABLE expense_tags (expense_id INTEGER, tag_id INTEGER, PRIMARY KEY (expense_id, tag_id));
+'''
+_LEGACY_AMOUNTS = [('Food', '2024-01-05', 12.34), ('Food', '2024-01-20', 0.1 + 0.2), ('Travel', '2024-02-01', 1999.99)]
+
+@pytest.fixture
+def legacy_database(db):
+    """The test database emptied and recreated with the pre-migration schema and data."""
+    reset_pool()
+    with sqlite3.connect(db) as conn:
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'").fetchall():
+            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+        conn.execute('PRAGMA user_version = 0')
+        conn.executescript(_LEGACY_SCHEMA)
+        conn.executemany('INSERT INTO expenses (description, category, date, amount) VALUES (?, ?, ?, ?)',
+                         [('Legacy', *row) for row in _LEGACY_AMOUNTS])
+        conn.execute("INSERT INTO budgets (category, amount, period) VALUES ('Food', 150.5, 'monthly')")
+    return db
+
+def _amounts(conn):
+    return {
+        'expenses': [row[0] for row in conn.execute('SELECT amount FROM expenses ORDER BY id')],
+        'budgets': [row[0] for row in conn.execute('SELECT amount FROM budgets')],
+        'monthly': conn.execute('SELECT month, category, currency, total, count, max_amount FROM expense_monthly_rollup ORDER BY month').fetchall(),
+        'daily_total': conn.execute('SELECT SUM(total) FROM expense_daily_rollup').fetchone()[0]
+    }
+
+@pytest.mark.parametrize('currency, expected, budget', [
+    # Floats are rounded to the nearest minor unit, halves away from zero
+    ('HUF', [1234, 30, 199999], 15050),
+    ('JPY', [12, 0, 2000], 151)
+])
+def test_float_amounts_migrate_to_minor_units_of_the_default_currency(legacy_database, monkeypatch, currency, expected, budget):
+    from app import migrations
+    monkeypatch.setattr(migrations, 'DEFAULT_CURRENCY', currency)
+    
+    with sqlite3.connect(legacy_database) as conn:
+        migrate(conn)
+        migrated = _amounts(conn)
+        
+        assert migrated['expenses'] == expected
+        assert all(isinstance(amount, int) for amount in migrated['expenses'])
+        assert migrated['budgets'] == [budget]
+        assert migrated['monthly'] == [
+            ('2024-01', 'Food', currency, expected[0] + expected[1], 2, max(expected[:2])),
+            ('2024-02', 'Travel', currency, expected[2], 1, expected[2])
+        ]
+        assert migrated['daily_total'] == sum(expected)
+        
+        # Running the conversion again, or migrating again, changes nothing
+        migrations._store_amounts_in_minor_units(conn)
+        conn.commit()
+        assert migrate(conn) == len(MIGRATIONS)
+        assert _amounts(conn) == migrated
@@ -0,0 +1,66 @@
+import threading
+from datetime import date
+import pytest
+from app.models.expense import Expense
+from app.models.recurring import RecurringExpense
+from app.utils import get_recurring_date
+
+@pytest.mark.parametrize('base, interval, expected', [
+    # Month ends clamp to shorter months and return to the 31st afterwards
+    (date(2023, 1, 31), 'monthly', [date(2023, 2, 28), date(2023, 3, 31), date(2023, 4, 30), date(2023, 5, 31)]),
+    (date(2024, 1, 31), 'monthly', [date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30), date(2024, 5, 31)]),
+    (date(2023, 12, 31), 'monthly', [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)]),
+    # A leap day comes back only in leap years
+    (date(2024, 2, 29), 'yearly', [date(2025, 2, 28), date(2026, 2, 28), date(2027, 2, 28), date(2028, 2, 29)]),
+    (date(2024, 12, 30), 'weekly', [date(2025, 1, 6), date(2025, 1, 13), date(2025, 1, 20), date(2025, 1, 27)])
+])
+def test_recurring_dates_count_from_the_first_occurrence(base, interval, expected):
+    assert [get_recurring_date(base, interval, occurrence) for occurrence in range(1, 5)] == expected
+
+def test_unknown_interval_has_no_dates():
+    assert get_recurring_date(date(2024, 1, 1), 'daily', 1) is None
+
+@pytest.fixture
+def rent(db):
+    return Expense.create({'description': 'Rent', 'amount': '500', 'category': 'Housing', 'date': '2024-01-31',
+                           'recurring': 1, 'recurring_interval': 'monthly', 'tags': ['home']})
+
+def _copies(template_id):
+    return [expense for expense in Expense.get_all(order_by='date ASC') if expense['id'] != template_id]
+
+def test_materialize_creates_due_copies_with_tags(rent):
+    assert RecurringExpense.materialize(date(2024, 5, 1)) == {'templates': 1, 'generated': 3}
+    
+    copies = _copies(rent)
+    assert [expense['date'] for expense in copies] == ['2024-02-29', '2024-03-31', '2024-04-30']
+    assert all(expense['recurring'] == 0 and expense['description'] == 'Rent' for expense in copies)
+    assert all(tags == ['home'] for tags in Expense.get_tags_bulk(expense['id'] for expense in copies).values())
+
+def test_materializing_again_does_not_duplicate(rent):
+    RecurringExpense.materialize(date(2024, 5, 1))
+    
+    assert RecurringExpense.materialize(date(2024, 5, 1)) == {'templates': 0, 'generated': 0}
+    assert len(_copies(rent)) == 3
+    
+    # Only the occurrence that became due since is added
+    assert RecurringExpense.materialize(date(2024, 6, 15)) == {'templates': 1, 'generated': 1}
+    assert [expense['date'] for expense in _copies(rent)][-1] == '2024-05-31'
+
+def test_concurrent_runs_generate_each_occurrence_once(rent):
+    errors = []
+    
+    def run():
+        try:
+            RecurringExpense.materialize(date(2024, 12, 31))
+        except Exception as exc:
+            errors.append(exc)
+    
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == []
+    dates = [expense['date'] for expense in _copies(rent)]
+    assert len(dates) == len(set(dates)) == 11
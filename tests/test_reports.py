@@ -0,0 +1,49 @@
+import pytest
+from app.models.expense import Expense
+from app.models.report import ExpenseReport, REPORT_DIMENSIONS, REPORT_LABELS
+
+@pytest.fixture
+def expenses(db):
+    Expense.create({'description': 'Lunch', 'amount': 12, 'category': 'Food', 'date': '2024-01-02', 'tags': ['work']})
+    Expense.create({'description': 'Train', 'amount': 30, 'category': 'Transportation', 'date': '2024-02-10'})
+
+def test_report_groups_by_month_with_a_grand_total(expenses):
+    report = ExpenseReport.run(['month'], subtotals=True)
+    
+    rows = ExpenseReport.rows(report, level=1)
+    assert [(row['period'], row['total'].minor, row['count']) for row in rows] == [('2024-01', 1200, 1), ('2024-02', 3000, 1)]
+    assert ExpenseReport.summary(report)['grand_total'].minor == 4200
+
+@pytest.mark.parametrize('dimensions, error', [
+    (['month', 'vendor'], 'Unknown dimension: vendor'),
+    (['category', 'category'], 'Repeated dimension: category'),
+    (['month', 'week'], 'Only one time bucket per report: week')
+])
+def test_invalid_specs_are_rejected(db, dimensions, error):
+    assert ExpenseReport.validate(dimensions) == [error]
+    with pytest.raises(ValueError, match=error):
+        ExpenseReport.run(dimensions)
+
+def test_every_dimension_has_a_page_label():
+    assert list(REPORT_LABELS) == REPORT_DIMENSIONS
+
+@pytest.mark.parametrize('app_client', ['legacy_client', 'client'])
+@pytest.mark.parametrize('query, error', [
+    ('dimensions=month,vendor', 'Unknown dimension: vendor'),
+    ('dimensions=month&currency=XYZ', 'Unknown currency: XYZ')
+])
+def test_api_answers_an_invalid_report_with_400(request, app_client, query, error):
+    response = request.getfixturevalue(app_client).get(f'/api/reports?{query}')
+    
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [error]
+    assert response.get_json()['dimensions'] == REPORT_DIMENSIONS
+
+def test_tag_report_page_is_titled_by_tag(expenses, legacy_client):
+    response = legacy_client.get('/reports?grouping=tag')
+    
+    assert response.status_code == 200
+    assert b'Tag Report' in response.data
+    assert b'<th>Tag</th>' in response.data
+    assert b'>work</span>' in response.data
+    assert b'Untagged' in response.data
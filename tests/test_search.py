@@ -0,0 +1,21 @@
+import pytest
+from app.models.expense import Expense, SEARCH_MAX_RESULTS
+
+@pytest.fixture
+def lunches(db):
+    lunch = {'description': 'Team lunch', 'amount': '10', 'category': 'Food', 'date': '2024-01-02'}
+    for _ in range(SEARCH_MAX_RESULTS + 5):
+        Expense.create(lunch)
+
+@pytest.mark.parametrize('limit, expected', [
+    ('3', 3),
+    ('100000000', SEARCH_MAX_RESULTS),
+    ('-5', 1),
+    ('0', 1),
+    ('many', 20)
+])
+def test_search_limit_is_clamped(lunches, client, limit, expected):
+    response = client.get(f'/api/search?q=lunch&limit={limit}')
+    
+    assert response.status_code == 200
+    assert len(response.get_json()) == expected
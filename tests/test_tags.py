@@ -0,0 +1,42 @@
+from app.models.expense import Expense
+
+def _create(count, start=0):
+    for index in range(start, start + count):
+        Expense.create({
+            'description': f'Expense {index}',
+            'amount': '10.00',
+            'category': 'Food',
+            'date': '2024-01-01',
+            'tags': [f'tag-{index}', 'shared']
+        })
+
+def test_with_tags_runs_a_constant_number_of_queries(traced):
+    _create(3)
+    with traced() as few:
+        Expense.with_tags(Expense.get_all())
+    
+    _create(60, start=3)
+    with traced() as many:
+        expenses = Expense.with_tags(Expense.get_all())
+    
+    assert len(expenses) == 63
+    assert len(many) == len(few) <= 3
+    assert all(expense['tags'] == ','.join(sorted([f"tag-{expense['description'].split()[1]}", 'shared']))
+               for expense in expenses)
+
+def test_legacy_add_and_edit_write_tags_in_batches(legacy_client):
+    response = legacy_client.post('/add', data={
+        'description': 'Groceries', 'amount': '12.50', 'category': 'Food',
+        'date': '2024-03-01', 'tags': 'market, weekly, market'
+    })
+    assert response.status_code == 302
+    
+    expense = Expense.get_all()[0]
+    assert Expense.get_tags(expense['id']) == ['market', 'weekly']
+    
+    response = legacy_client.post(f"/edit/{expense['id']}", data={
+        'description': 'Groceries', 'amount': '12.50', 'category': 'Food',
+        'date': '2024-03-01', 'tags': 'weekly, organic'
+    })
+    assert response.status_code == 302
+    assert Expense.get_tags(expense['id']) == ['organic', 'weekly']
@@ -0,0 +1,58 @@
+import pytest
+from app.models.expense import Expense
+from app.models.timeseries import ExpenseTimeSeries, MAX_CHART_POINTS
+
+def _add(day, amount, category='Food'):
+    Expense.create({'description': 'x', 'amount': amount, 'category': category, 'date': day})
+
+def test_buckets_are_gap_filled(db):
+    _add('2024-01-03', 10)
+    _add('2024-03-20', 5, 'Travel')
+    
+    data = ExpenseTimeSeries.get({}, 'month')
+    
+    assert data['labels'] == ['2024-01', '2024-02', '2024-03']
+    assert [value.minor for value in data['totals']] == [1000, 0, 500]
+    assert data['group_size'] == 1
+
+@pytest.mark.parametrize('bucket', ['day', 'week', 'month', 'quarter'])
+def test_widest_range_is_downsampled_without_filling_every_bucket(db, bucket):
+    _add('0001-01-01', 1)
+    _add('2024-06-15', 2)
+    _add('9999-12-31', 3)
+    
+    data = ExpenseTimeSeries.get({'from_date': '0001-01-01', 'to_date': '9999-12-31'}, bucket)
+    
+    assert len(data['labels']) <= MAX_CHART_POINTS
+    assert data['labels'][0] == {'day': '0001-01-01', 'week': '0001-01-01', 'month': '0001-01', 'quarter': '0001-Q1'}[bucket]
+    assert sum(value.minor for value in data['totals']) == 600
+    assert data['totals'][-1].minor == 300
+
+def test_downsampling_keeps_totals_and_labels_runs_by_their_first_bucket(db):
+    for day in range(1, 11):
+        _add(f'2024-01-{day:02d}', day)
+    
+    data = ExpenseTimeSeries.get({'from_date': '2024-01-01', 'to_date': '2024-01-10'}, 'day', max_points=4)
+    
+    assert data['group_size'] == 3
+    assert data['labels'] == ['2024-01-01', '2024-01-04', '2024-01-07', '2024-01-10']
+    assert [value.minor for value in data['totals']] == [600, 1500, 2400, 1000]
+
+def test_unknown_bucket_is_rejected(db):
+    with pytest.raises(ValueError):
+        ExpenseTimeSeries.get({}, 'fortnight')
+
+@pytest.mark.parametrize('app_client', ['legacy_client', 'client'])
+def test_api_rejects_an_unknown_bucket(request, app_client):
+    response = request.getfixturevalue(app_client).get('/api/timeseries?bucket=fortnight')
+    
+    assert response.status_code == 400
+    assert response.get_json()['buckets'] == ['day', 'week', 'month', 'quarter']
+
+@pytest.mark.parametrize('app_client', ['legacy_client', 'client'])
+def test_api_answers_the_widest_daily_range(request, app_client):
+    response = request.getfixturevalue(app_client).get(
+        '/api/timeseries?bucket=day&from_date=0001-01-01&to_date=9999-12-31')
+    
+    assert response.status_code == 200
+    assert len(response.get_json()['labels']) <= MAX_CHART_POINTS
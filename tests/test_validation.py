@@ -0,0 +1,27 @@
+import pytest
+from app.models.expense import Expense
+
+def _form(**values):
+    return dict({'description': 'Sushi', 'amount': '0.4', 'category': 'Food', 'date': '2024-01-02'}, **values)
+
+@pytest.mark.parametrize('form, errors', [
+    (_form(currency='USD'), []),
+    (_form(currency='JPY'), ['Amount must be greater than zero']),
+    (_form(currency='JPY', amount='1'), []),
+    (_form(currency='XYZ'), ['Unknown currency']),
+    (_form(currency='XYZ', amount='oops'), ['Unknown currency']),
+    (_form(currency='EUR', amount='oops'), ['Amount must be a valid number'])
+])
+def test_amount_is_validated_in_its_own_currency(form, errors):
+    assert Expense.validate(form) == errors
+
+def test_amount_falls_back_to_the_given_currency():
+    assert Expense.validate(_form(), 'JPY') == ['Amount must be greater than zero']
+    assert Expense.validate(_form(), 'USD') == []
+
+def test_legacy_add_rejects_an_amount_that_rounds_to_zero(legacy_client):
+    response = legacy_client.post('/add', data=_form(currency='JPY'))
+    
+    assert response.status_code == 200
+    assert b'Amount must be greater than zero' in response.data
+    assert Expense.get_all() == []
@@ -0,0 +1,13 @@
+"""WSGI entry point for production servers.
+
+    gunicorn wsgi:app              # settings from gunicorn.conf.py
+    waitress-serve --port=8000 wsgi:app
+
+The app is created once at import. With gunicorn's preload_app that is in
+the master, so the schema and migrations are applied once rather than by
+every worker; the recurring scheduler is started per worker by
+gunicorn.conf.py.
+"""
+from app import create_app
+
+app = create_app(start_scheduler=False)